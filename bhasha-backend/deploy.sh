@@ -58,8 +58,29 @@ S3_BUCKET="bhasha-ai-audio-arjit"
 MAIN_TABLE="BhashaAIMain"
 CONV_TABLE="BhashaAIConversations"
 CALL_TABLE="BhashaAICallStatus"
+CACHE_TABLE="BhashaAI_Cache"
 API_BASE="https://4zu47eekcg.execute-api.ap-south-1.amazonaws.com/Prod"
 
+# Background work queue (created by setup_infra.sh). Empty → tasks run inline.
+WORK_QUEUE_URL=$(aws sqs get-queue-url --queue-name bhasha-post-process \
+  --region "$REGION" --query QueueUrl --output text 2>/dev/null || true)
+
+# ── Helper: zip lambda_function.py + the shared/ package ──────────────────────
+# Run from inside lambdas/<folder>/ — shared/ lands next to lambda_function.py.
+
+bundle_zip() {
+  python -c "
+import os, zipfile
+z = zipfile.ZipFile('$1', 'w', zipfile.ZIP_DEFLATED)
+z.write('lambda_function.py')
+for d, _, files in os.walk('../shared'):
+    if '__pycache__' in d:
+        continue
+    for f in files:
+        z.write(os.path.join(d, f), os.path.relpath(os.path.join(d, f), '..'))
+z.close()"
+}
+
 # ── Helper: deploy one Lambda ─────────────────────────────────────────────────
 
 deploy_lambda() {
@@ -69,7 +90,7 @@ deploy_lambda() {
   echo "▶ $FUNC_NAME"
 
   cd "lambdas/$FOLDER"
-  python -c "import zipfile; z=zipfile.ZipFile('../../${FUNC_NAME}.zip','w',zipfile.ZIP_DEFLATED); z.write('lambda_function.py'); z.close()"
+  bundle_zip "../../${FUNC_NAME}.zip"
   cd ../..
 
   # Try update first; only create if function truly doesn't exist
@@ -120,7 +141,7 @@ set_env() {
 # 1. voice-process
 deploy_lambda "voice-process" "voice_process"
 set_env "voice-process" \
-  "AWS_REGION_NAME=$REGION,DYNAMODB_CONVERSATIONS_TABLE=$CONV_TABLE"
+  "AWS_REGION_NAME=$REGION,DYNAMODB_CONVERSATIONS_TABLE=$CONV_TABLE,WORK_QUEUE_URL=$WORK_QUEUE_URL"
 
 # 2. medication-crud
 deploy_lambda "medication-crud" "medication_crud"
@@ -165,7 +186,21 @@ set_env "health-log" \
 # 10. voice-transcribe
 deploy_lambda "voice-transcribe" "voice_transcribe"
 set_env "voice-transcribe" \
-  "AWS_REGION_NAME=$REGION,S3_BUCKET=$S3_BUCKET"
+  "AWS_REGION_NAME=$REGION,S3_BUCKET=$S3_BUCKET,CACHE_TABLE=$CACHE_TABLE"
+# Async mode: Transcribe job state changes → voice-transcribe (completes the job record)
+TRANSCRIBE_FN_ARN=$(aws lambda get-function --function-name voice-transcribe \
+  --region "$REGION" --query Configuration.FunctionArn --output text)
+RULE_ARN=$(aws events put-rule --name bhasha-transcribe-done \
+  --event-pattern '{"source":["aws.transcribe"],"detail-type":["Transcribe Job State Change"],"detail":{"TranscriptionJobStatus":["COMPLETED","FAILED"]}}' \
+  --region "$REGION" --query RuleArn --output text)
+aws lambda add-permission --function-name voice-transcribe \
+  --statement-id bhasha-transcribe-done --action lambda:InvokeFunction \
+  --principal events.amazonaws.com --source-arn "$RULE_ARN" \
+  --region "$REGION" > /dev/null 2>&1 || true
+aws events put-targets --rule bhasha-transcribe-done \
+  --targets "Id=voice-transcribe,Arn=$TRANSCRIBE_FN_ARN" \
+  --region "$REGION" > /dev/null
+echo "  EventBridge rule bhasha-transcribe-done → voice-transcribe"
 
 # 11. medicine-check
 deploy_lambda "medicine-check" "medicine_check"
@@ -193,14 +228,17 @@ set_env "profile-crud" \
 # 15. medical-history
 deploy_lambda "medical-history" "medical_history"
 set_env "medical-history" \
-  "APP_REGION=$REGION,BEDROCK_REGION=us-east-1,DYNAMODB_MAIN_TABLE=$MAIN_TABLE,S3_BUCKET=$S3_BUCKET"
+  "APP_REGION=$REGION,BEDROCK_REGION=us-east-1,DYNAMODB_MAIN_TABLE=$MAIN_TABLE,S3_BUCKET=$S3_BUCKET,WORK_QUEUE_URL=$WORK_QUEUE_URL"
 
 # 16. deep_analysis
 deploy_lambda "deep_analysis" "deep_analysis"
-DEEP_ENV="DYNAMODB_MAIN_TABLE=$MAIN_TABLE,BEDROCK_REGION=us-east-1,APP_REGION=$REGION"
+DEEP_ENV="DYNAMODB_MAIN_TABLE=$MAIN_TABLE,BEDROCK_REGION=us-east-1,APP_REGION=$REGION,WORK_QUEUE_URL=$WORK_QUEUE_URL,CIRCUIT_TABLE=$CACHE_TABLE,CACHE_TABLE=$CACHE_TABLE"
 if [ -n "$KNOWLEDGE_BASE_ID" ]; then
   DEEP_ENV="$DEEP_ENV,KNOWLEDGE_BASE_ID=${KNOWLEDGE_BASE_ID}"
 fi
+if [ -n "$LOCAL_KB_DIR" ]; then
+  DEEP_ENV="$DEEP_ENV,LOCAL_KB_DIR=${LOCAL_KB_DIR}"
+fi
 set_env "deep_analysis" "$DEEP_ENV"
 
 # 17. multi_agent  (legacy custom tool-use loop — kept for fallback)
@@ -209,7 +247,7 @@ aws lambda update-function-configuration \
   --function-name "multi-agent" \
   --timeout 90 \
   --region "$REGION" > /dev/null
-AGENT_ENV="DYNAMODB_MAIN_TABLE=$MAIN_TABLE,BEDROCK_REGION=us-east-1,APP_REGION=$REGION"
+AGENT_ENV="DYNAMODB_MAIN_TABLE=$MAIN_TABLE,BEDROCK_REGION=us-east-1,APP_REGION=$REGION,WORK_QUEUE_URL=$WORK_QUEUE_URL,CIRCUIT_TABLE=$CACHE_TABLE,CACHE_TABLE=$CACHE_TABLE"
 if [ -n "$GOOGLE_MAPS_API_KEY" ]; then
   AGENT_ENV="$AGENT_ENV,GOOGLE_MAPS_API_KEY=${GOOGLE_MAPS_API_KEY}"
 fi
@@ -220,7 +258,7 @@ set_env "multi-agent" "$AGENT_ENV"
 BEDROCK_AGENT_REGION="${BEDROCK_AGENT_REGION:-us-east-1}"
 echo "▶ bedrock-agent-action  (region: $BEDROCK_AGENT_REGION)"
 cd "lambdas/bedrock_agent_action"
-python -c "import zipfile; z=zipfile.ZipFile('../../bedrock-agent-action.zip','w',zipfile.ZIP_DEFLATED); z.write('lambda_function.py'); z.close()"
+bundle_zip "../../bedrock-agent-action.zip"
 cd ../..
 if ACTION_UPDATE=$(aws lambda update-function-code \
   --function-name "bedrock-agent-action" \
@@ -246,7 +284,7 @@ else
   exit 1
 fi
 rm -f bedrock-agent-action.zip
-ACTION_ENV="DYNAMODB_MAIN_TABLE=$MAIN_TABLE,APP_REGION=$REGION,BEDROCK_REGION=$BEDROCK_AGENT_REGION"
+ACTION_ENV="DYNAMODB_MAIN_TABLE=$MAIN_TABLE,APP_REGION=$REGION,BEDROCK_REGION=$BEDROCK_AGENT_REGION,CACHE_TABLE=$CACHE_TABLE"
 if [ -n "$GOOGLE_MAPS_API_KEY" ]; then
   ACTION_ENV="$ACTION_ENV,GOOGLE_MAPS_API_KEY=${GOOGLE_MAPS_API_KEY}"
 fi
@@ -262,15 +300,39 @@ aws lambda update-function-configuration \
   --function-name "bedrock-agent-invoker" \
   --timeout 120 \
   --region "$REGION" > /dev/null
-INVOKER_ENV="DYNAMODB_MAIN_TABLE=$MAIN_TABLE,APP_REGION=$REGION,BEDROCK_AGENT_REGION=$BEDROCK_AGENT_REGION"
+INVOKER_ENV="DYNAMODB_MAIN_TABLE=$MAIN_TABLE,APP_REGION=$REGION,BEDROCK_AGENT_REGION=$BEDROCK_AGENT_REGION,WORK_QUEUE_URL=$WORK_QUEUE_URL,CIRCUIT_TABLE=$CACHE_TABLE,CACHE_TABLE=$CACHE_TABLE"
 if [ -n "$BEDROCK_AGENT_ID" ]; then
   INVOKER_ENV="$INVOKER_ENV,BEDROCK_AGENT_ID=${BEDROCK_AGENT_ID}"
 fi
 if [ -n "$BEDROCK_AGENT_ALIAS_ID" ]; then
   INVOKER_ENV="$INVOKER_ENV,BEDROCK_AGENT_ALIAS_ID=${BEDROCK_AGENT_ALIAS_ID}"
 fi
+if [ -n "$LOCAL_KB_DIR" ]; then
+  INVOKER_ENV="$INVOKER_ENV,LOCAL_KB_DIR=${LOCAL_KB_DIR}"
+fi
 set_env "bedrock-agent-invoker" "$INVOKER_ENV"
 
+# 20. post-process-worker  (SQS consumer for background writes / SMS / uploads)
+if [ -n "$WORK_QUEUE_URL" ]; then
+  deploy_lambda "post-process-worker" "post_process_worker"
+  set_env "post-process-worker" "APP_REGION=$REGION"
+  QUEUE_ARN=$(aws sqs get-queue-attributes --queue-url "$WORK_QUEUE_URL" \
+    --attribute-names QueueArn --region "$REGION" \
+    --query Attributes.QueueArn --output text)
+  if ! aws lambda list-event-source-mappings \
+      --function-name post-process-worker --event-source-arn "$QUEUE_ARN" \
+      --region "$REGION" --query 'EventSourceMappings[0].UUID' --output text | grep -qv None; then
+    aws lambda create-event-source-mapping \
+      --function-name post-process-worker --event-source-arn "$QUEUE_ARN" \
+      --batch-size 10 --function-response-types ReportBatchItemFailures \
+      --region "$REGION" > /dev/null
+    echo "  SQS trigger created"
+  fi
+else
+  echo "⚠️  bhasha-post-process queue not found — background tasks run inline."
+  echo "   Run scripts/setup_infra.sh to create it."
+fi
+
 # ── Done ──────────────────────────────────────────────────────────────────────
 
 echo ""
@@ -293,6 +355,8 @@ echo "  3. POST /bedrock-agent      → Lambda: bedrock-agent-invoker  (timeout:
 echo "     GET  /bedrock-agent      → Lambda: bedrock-agent-invoker"
 echo "     Enable CORS on all routes, deploy to Prod"
 echo ""
+echo "  4. GET /voice/transcribe/{jobId} → Lambda: voice-transcribe  (async results: short poll, ?wait= up to TRANSCRIBE_WAIT_MAX_S, then follow Retry-After)"
+echo ""
 echo "  IMPORTANT: API Gateway integration timeout is max 29s."
 echo "  For bedrock-agent (takes 60-90s), use a Lambda Function URL:"
 echo "    Console → Lambda → bedrock-agent-invoker → Configuration → Function URL"
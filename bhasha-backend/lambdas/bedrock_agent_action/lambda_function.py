@@ -33,6 +33,8 @@ import urllib.request
 import urllib.parse
 from datetime import datetime, timezone
 
+from shared import gazetteer, ner
+
 # ── Config ─────────────────────────────────────────────────────────────────────
 
 APP_REGION     = os.environ.get('APP_REGION',          'ap-south-1')
@@ -71,22 +73,13 @@ def diagnose_symptoms(symptoms: str, lang: str, user_conditions: list,
     Comprehend Medical NER + optional Nova Lite image analysis + Nova Pro
     structured clinical reasoning.
     """
-    # Step A: Comprehend Medical NER
-    entities = {'symptoms': [], 'conditions': [], 'medications': [], 'body_parts': []}
+    # Step A: Comprehend Medical NER (cached by text — shared/ner.py)
+    entities = {'symptoms': [], 'conditions': [], 'medications': [], 'body_parts': [], 'durations': []}
     try:
-        resp = _comprehend().detect_entities_v2(Text=symptoms[:20000])
-        for e in resp.get('Entities', []):
-            if e.get('Score', 0) < 0.6:
-                continue
-            cat, val = e.get('Category', ''), e.get('Text', '')
-            if   cat == 'SIGN_OR_SYMPTOM':   entities['symptoms'].append(val)
-            elif cat == 'MEDICAL_CONDITION': entities['conditions'].append(val)
-            elif cat == 'MEDICATION':        entities['medications'].append(val)
-            elif cat == 'ANATOMY':           entities['body_parts'].append(val)
-        for k in entities:
-            entities[k] = list(dict.fromkeys(entities[k]))
+        entities = ner.detect_entities(symptoms, _comprehend)
     except Exception as e:
         print(f'[comprehend] error (non-fatal): {e}')
+        entities = gazetteer.extract(symptoms)
 
     # Step B: Image analysis (optional)
     image_context = ''
@@ -15,11 +15,21 @@ Env vars:
   DYNAMODB_MAIN_TABLE  -- BhashaAIMain
   GOOGLE_MAPS_API_KEY  -- optional
   NOVA_MODEL_ID        -- amazon.nova-pro-v1:0
+  WORK_QUEUE_URL       -- optional, SQS queue for background writes
+  LOCAL_KB_DIR         -- optional, in-process vector index (shared/local_kb.py);
+                          replaces the Bedrock KB Retrieve call when set
+
+Every network call runs against the invocation deadline (shared/deadline.py).
+Stages that run out of time degrade — no RAG context, hospitals cached in this
+container, templated ranking — and are listed in the response under `degraded`.
 """
 
 import json, boto3, os, math, time, urllib.request, urllib.parse
 from datetime import datetime, timezone
 
+from shared import circuit, gazetteer, local_kb, ner, prompt_cache, rag_cache, work_queue
+from shared.deadline import Deadline, boto_config
+
 CORS = {
     'Content-Type': 'application/json',
     'Access-Control-Allow-Origin': '*',
@@ -41,28 +51,74 @@ LANG_MAP = {
     'kn': 'Kannada', 'ml': 'Malayalam', 'pa': 'Punjabi',
 }
 
-def _bedrock():
-    return boto3.client('bedrock-runtime', region_name=BEDROCK_REGION)
+def _bedrock(timeout=None):
+    return boto3.client('bedrock-runtime', region_name=BEDROCK_REGION,
+                        config=boto_config(timeout) if timeout else None)
 
-def _comprehend():
-    return boto3.client('comprehendmedical', region_name='us-east-1')
+def _comprehend(timeout=None):
+    return boto3.client('comprehendmedical', region_name='us-east-1',
+                        config=boto_config(timeout) if timeout else None)
 
 def _dynamo():
     return boto3.resource('dynamodb', region_name=APP_REGION).Table(TABLE_NAME)
 
-def retrieve_medical_context(query: str, num_results: int = 5) -> str:
-    """Query Bedrock Knowledge Base and return relevant medical context chunks."""
+def _ner_client(deadline: Deadline):
+    """Comprehend client bounded by the deadline — only built on a NER cache miss."""
+    timeout = deadline.budget(0.15, cap=5)
+    if timeout is None:
+        raise TimeoutError('no time left')
+    return _comprehend(timeout)
+
+def _embed_client(deadline: Deadline):
+    """Titan embeddings client for a local-KB query whose embedding is not cached."""
+    timeout = deadline.budget(0.1, cap=3)
+    if timeout is None:
+        raise TimeoutError('no time left')
+    return boto3.client('bedrock-runtime', region_name=local_kb.EMBED_REGION,
+                        config=boto_config(timeout))
+
+def retrieve_medical_context(query: str, deadline: Deadline, num_results: int = 5) -> str:
+    """
+    Relevant medical context chunks — from the in-process index when one is
+    configured (shared/local_kb.py), otherwise from the Bedrock Knowledge Base.
+    Ranked chunks are cached per canonical query (shared/rag_cache.py).
+    """
+    if local_kb.available():
+        try:
+            chunks = rag_cache.cached('local', query,
+                                      lambda: _local_chunks(query, deadline, num_results),
+                                      str(num_results))
+            return '\n\n---\n\n'.join(chunks)
+        except Exception as e:
+            print(f'[rag] local index failed, trying Knowledge Base: {e}')
     if not KB_ID:
         return ''
+    chunks = rag_cache.cached(KB_ID, query, lambda: _kb_chunks(query, deadline, num_results),
+                              str(num_results))
+    return '\n\n---\n\n'.join(chunks)
+
+def _local_chunks(query: str, deadline: Deadline, num_results: int) -> list:
+    hits   = local_kb.retrieve(query, num_results, lambda: _embed_client(deadline))
+    chunks = [f"[Relevance: {h['score']:.2f}] {h['text']}" for h in hits if h['text']]
+    print(f'[rag] local index: {len(chunks)} chunks for query: {query[:60]}')
+    return chunks
+
+def _kb_chunks(query: str, deadline: Deadline, num_results: int) -> list:
+    timeout = deadline.budget(0.2, cap=6)
+    if timeout is None:
+        deadline.degrade('rag', 'no time left')
+        return []
     try:
-        client = boto3.client('bedrock-agent-runtime', region_name=KB_REGION)
-        resp = client.retrieve(
-            knowledgeBaseId=KB_ID,
-            retrievalQuery={'text': query},
-            retrievalConfiguration={
-                'vectorSearchConfiguration': {'numberOfResults': num_results}
-            },
-        )
+        client = boto3.client('bedrock-agent-runtime', region_name=KB_REGION,
+                              config=boto_config(timeout))
+        with circuit.guard('kb'):
+            resp = client.retrieve(
+                knowledgeBaseId=KB_ID,
+                retrievalQuery={'text': query},
+                retrievalConfiguration={
+                    'vectorSearchConfiguration': {'numberOfResults': num_results}
+                },
+            )
         chunks = []
         for r in resp.get('retrievalResults', []):
             text = r.get('content', {}).get('text', '').strip()
@@ -70,12 +126,12 @@ def retrieve_medical_context(query: str, num_results: int = 5) -> str:
             source = r.get('location', {}).get('s3Location', {}).get('uri', '')
             if text:
                 chunks.append(f'[Relevance: {score:.2f}] {text}')
-        context = '\n\n---\n\n'.join(chunks)
         print(f'[rag] retrieved {len(chunks)} chunks for query: {query[:60]}')
-        return context
+        return chunks
     except Exception as e:
         print(f'[rag] FAILED: {e}')
-        return ''
+        deadline.degrade('rag', str(e))
+        return []
 
 
 # ── Tool definitions (exposed to Nova Pro) ────────────────────────────────────
@@ -169,25 +225,21 @@ TOOLS = [
 
 # ── Tool implementations ───────────────────────────────────────────────────────
 
-def diagnose(symptoms: str, lang: str, user_conditions: list) -> dict:
+def diagnose(symptoms: str, lang: str, user_conditions: list, deadline: Deadline) -> dict:
     """Comprehend Medical NER + RAG context + Nova diagnosis JSON."""
-    entities = {'symptoms': [], 'conditions': [], 'medications': [], 'body_parts': []}
+    entities = {'symptoms': [], 'conditions': [], 'medications': [], 'body_parts': [], 'durations': []}
     try:
-        for e in _comprehend().detect_entities_v2(Text=symptoms[:20000]).get('Entities', []):
-            if e.get('Score', 0) < 0.6: continue
-            cat, val = e['Category'], e['Text']
-            if   cat == 'SIGN_OR_SYMPTOM':   entities['symptoms'].append(val)
-            elif cat == 'MEDICAL_CONDITION': entities['conditions'].append(val)
-            elif cat == 'MEDICATION':        entities['medications'].append(val)
-            elif cat == 'ANATOMY':           entities['body_parts'].append(val)
-        for k in entities: entities[k] = list(dict.fromkeys(entities[k]))
+        entities = ner.detect_entities(symptoms, lambda: _ner_client(deadline))
     except Exception as e:
         print(f'[comprehend] {e}')
+        deadline.degrade('comprehend', str(e))
+        entities = gazetteer.extract(symptoms)
 
     # RAG: pull relevant clinical guidelines
-    rag_query = ', '.join(entities['symptoms'][:5]) if entities['symptoms'] else symptoms
-    if user_conditions: rag_query += ' ' + ' '.join(user_conditions[:3])
-    rag_context = retrieve_medical_context(rag_query)
+    # Term lists sorted so the same symptoms/conditions give one RAG cache key
+    rag_query = ', '.join(sorted(entities['symptoms'][:5])) if entities['symptoms'] else symptoms
+    if user_conditions: rag_query += ' ' + ' '.join(sorted(user_conditions[:3]))
+    rag_context = retrieve_medical_context(rag_query, deadline)
 
     ctx = ''
     if entities['symptoms']:   ctx += f"\nSymptoms: {', '.join(entities['symptoms'])}"
@@ -218,11 +270,15 @@ def diagnose(symptoms: str, lang: str, user_conditions: list) -> dict:
         '}'
     )
     try:
-        resp = _bedrock().converse(
-            modelId=MODEL_ID,
-            messages=[{'role': 'user', 'content': [{'text': prompt}]}],
-            inferenceConfig={'maxTokens': 400, 'temperature': 0.1},
-        )
+        timeout = deadline.budget(0.5, cap=15, floor=2)
+        if timeout is None:
+            raise TimeoutError('no time left')
+        with circuit.guard(f'bedrock:{MODEL_ID}'):
+            resp = _bedrock(timeout).converse(
+                modelId=MODEL_ID,
+                messages=[{'role': 'user', 'content': [{'text': prompt}]}],
+                inferenceConfig={'maxTokens': 400, 'temperature': 0.1},
+            )
         raw = resp['output']['message']['content'][0]['text'].strip()
         if '```json' in raw: raw = raw.split('```json')[1].split('```')[0].strip()
         elif '```' in raw:   raw = raw.split('```')[1].split('```')[0].strip()
@@ -232,6 +288,7 @@ def diagnose(symptoms: str, lang: str, user_conditions: list) -> dict:
         return result
     except Exception as e:
         print(f'[diagnose] FAILED: {e}')
+        deadline.degrade('diagnosis', str(e))
         return {
             'condition': 'Requires evaluation', 'severity': 'moderate',
             'specialty_needed': 'General Physician', 'urgency': 'routine',
@@ -306,36 +363,42 @@ def _facility_type(tags: dict, name: str) -> tuple:
         ftype, emergency = 'clinic', False
     return ftype, emergency, osm_spec.lower()
 
-def _overpass_query(query: str) -> list:
+def _overpass_query(query: str, deadline: Deadline) -> list:
+    timeout = deadline.budget(0.4, cap=16, floor=2)
+    if timeout is None:
+        deadline.degrade('overpass', 'no time left'); return []
+    query = query.replace('[timeout:SERVER]', f'[timeout:{int(timeout)}]')
     try:
         req = urllib.request.Request(
             'https://overpass-api.de/api/interpreter',
             data=urllib.parse.urlencode({'data': query}).encode(),
             headers={'User-Agent': 'BhashaAI/1.0'}, method='POST',
         )
-        with urllib.request.urlopen(req, timeout=16) as r:
-            return json.loads(r.read().decode()).get('elements', [])
+        with circuit.guard('overpass'):
+            with urllib.request.urlopen(req, timeout=timeout) as r:
+                return json.loads(r.read().decode()).get('elements', [])
     except Exception as e:
-        print(f'[overpass] {e}'); return []
+        print(f'[overpass] {e}')
+        deadline.degrade('overpass', str(e)); return []
 
-def _overpass_specialty(lat, lng, radius_m, osm_tag: str) -> list:
+def _overpass_specialty(lat, lng, radius_m, osm_tag: str, deadline: Deadline) -> list:
     if not osm_tag: return []
-    q = (f'[out:json][timeout:12];'
+    q = (f'[out:json][timeout:SERVER];'
          f'(node["healthcare:speciality"~"{osm_tag}"](around:{radius_m},{lat},{lng});'
          f'way["healthcare:speciality"~"{osm_tag}"](around:{radius_m},{lat},{lng});'
          f'node["speciality"~"{osm_tag}"](around:{radius_m},{lat},{lng});'
          f'node["amenity"="doctors"]["healthcare:speciality"~"{osm_tag}"](around:{radius_m},{lat},{lng});'
          f');out center tags;')
-    return _overpass_query(q)
+    return _overpass_query(q, deadline)
 
-def _overpass(lat, lng, radius_m):
-    q = (f'[out:json][timeout:18];'
+def _overpass(lat, lng, radius_m, deadline: Deadline):
+    q = (f'[out:json][timeout:SERVER];'
          f'(node["amenity"~"^(hospital|clinic|doctors)$"](around:{radius_m},{lat},{lng});'
          f'way["amenity"~"^(hospital|clinic|doctors)$"](around:{radius_m},{lat},{lng});'
          f'node["healthcare"~"^(hospital|clinic|centre|doctor)$"](around:{radius_m},{lat},{lng});'
          f'way["healthcare"~"^(hospital|clinic|centre|doctor)$"](around:{radius_m},{lat},{lng});'
          f');out center tags;')
-    elements = _overpass_query(q)
+    elements = _overpass_query(q, deadline)
     results, seen = [], set()
     for el in elements:
         tags = el.get('tags', {})
@@ -358,24 +421,29 @@ def _overpass(lat, lng, radius_m):
         })
     return sorted(results, key=lambda h: h['distance_km'])
 
-def _google_search(lat, lng, radius_m, keyword, place_type):
+def _google_search(lat, lng, radius_m, keyword, place_type, deadline: Deadline):
+    timeout = deadline.budget(0.25, cap=8)
+    if timeout is None:
+        deadline.degrade('google_places', 'no time left'); return []
     url = (f'https://maps.googleapis.com/maps/api/place/nearbysearch/json'
            f'?location={lat},{lng}&radius={radius_m}&type={place_type}'
            f'&keyword={urllib.parse.quote(keyword)}&key={GOOGLE_KEY}')
     try:
-        with urllib.request.urlopen(url, timeout=8) as r:
-            return json.loads(r.read().decode()).get('results', [])
+        with circuit.guard('google_places'):
+            with urllib.request.urlopen(url, timeout=timeout) as r:
+                return json.loads(r.read().decode()).get('results', [])
     except Exception as e:
-        print(f'[google:{place_type}] {e}'); return []
+        print(f'[google:{place_type}] {e}')
+        deadline.degrade('google_places', str(e)); return []
 
-def _google(lat, lng, radius_m, specialty):
+def _google(lat, lng, radius_m, specialty, deadline: Deadline):
     if not GOOGLE_KEY: return []
     is_general = specialty.lower() in ('general physician', 'gp', '')
     kw = specialty if not is_general else 'hospital clinic'
-    places = _google_search(lat, lng, radius_m, kw, 'hospital')
+    places = _google_search(lat, lng, radius_m, kw, 'hospital', deadline)
     if not is_general:
         seen_ids = {p.get('place_id') for p in places}
-        for p in _google_search(lat, lng, radius_m, kw, 'doctor'):
+        for p in _google_search(lat, lng, radius_m, kw, 'doctor', deadline):
             if p.get('place_id') not in seen_ids:
                 places.append(p)
                 seen_ids.add(p.get('place_id'))
@@ -419,7 +487,12 @@ def _score_hospital(h: dict, specialty_lower: str, osm_tag: str, name_kws: list,
     h['specialty_match'] = tier <= 1
     return (tier, h['distance_km'])
 
-def find_hospitals(specialty: str, urgency: str, lat: float, lng: float) -> dict:
+# Last successful searches in this container, keyed by rounded location
+# (~1 km). Served when the live search runs out of time.
+HOSPITAL_CACHE_TTL_S = 6 * 3600
+_hospital_cache = {}
+
+def find_hospitals(specialty: str, urgency: str, lat: float, lng: float, deadline: Deadline) -> dict:
     radius = 5000 if urgency in ('emergency', 'urgent') else 10000
     specialty_lower = specialty.lower()
     osm_tag, name_kws = '', []
@@ -429,16 +502,16 @@ def find_hospitals(specialty: str, urgency: str, lat: float, lng: float) -> dict
             name_kws = SPECIALTY_NAME_KEYWORDS.get(key, [])
             break
 
-    hospitals = _google(lat, lng, radius, specialty)
+    hospitals = _google(lat, lng, radius, specialty, deadline)
     existing_names = {h['name'] for h in hospitals}
 
-    for h in _overpass(lat, lng, radius):
+    for h in _overpass(lat, lng, radius, deadline):
         if h['name'] not in existing_names:
             hospitals.append(h)
             existing_names.add(h['name'])
 
     if osm_tag:
-        for el in _overpass_specialty(lat, lng, radius * 2, osm_tag):
+        for el in _overpass_specialty(lat, lng, radius * 2, osm_tag, deadline):
             tags = el.get('tags', {})
             name = (tags.get('name') or tags.get('amenity', 'Specialist')).strip()
             if name in existing_names: continue
@@ -457,13 +530,34 @@ def find_hospitals(specialty: str, urgency: str, lat: float, lng: float) -> dict
             })
 
     if not hospitals:
-        hospitals = _overpass(lat, lng, 25000)
+        hospitals = _overpass(lat, lng, 25000, deadline)
+
+    cache_key = (round(lat, 2), round(lng, 2))
+    if hospitals:
+        _hospital_cache[cache_key] = (time.time(), hospitals)
+    else:
+        hit = _hospital_cache.get(cache_key)
+        if hit and time.time() - hit[0] < HOSPITAL_CACHE_TTL_S:
+            hospitals = hit[1]
+            deadline.degrade('hospital_search', f'served {len(hospitals)} cached results')
 
     hospitals.sort(key=lambda h: _score_hospital(h, specialty_lower, osm_tag, name_kws, urgency))
     print(f'[find_hospitals] specialty={specialty} osm_tag={osm_tag} found={len(hospitals)}')
     return {'hospitals': hospitals[:10], 'count': len(hospitals), 'specialty': specialty}
 
-def rank_hospitals(hospitals: list, diagnosis: dict, lang: str) -> dict:
+def _templated_ranking(hospitals: list, diagnosis: dict) -> dict:
+    return {
+        'recommended_hospital': hospitals[0], 'ranked_list': hospitals[:5],
+        'ranking_reason': 'Nearest hospital selected.',
+        'visit_prep': {
+            'urgency_note': diagnosis.get('urgency_reason',''),
+            'questions_to_ask': diagnosis.get('questions_for_doctor',[]),
+            'what_to_bring': ['Government ID (Aadhaar)','Previous prescriptions','Insurance card'],
+            'transport_tip': '',
+        },
+    }
+
+def rank_hospitals(hospitals: list, diagnosis: dict, lang: str, deadline: Deadline) -> dict:
     if not hospitals:
         return {
             'recommended_hospital': None, 'ranked_list': [],
@@ -492,11 +586,15 @@ def rank_hospitals(hospitals: list, diagnosis: dict, lang: str) -> dict:
         '"transport_tip":"tip","ranked_order":[0,1,2]}'
     )
     try:
-        resp = _bedrock().converse(
-            modelId=MODEL_ID,
-            messages=[{'role': 'user', 'content': [{'text': prompt}]}],
-            inferenceConfig={'maxTokens': 600, 'temperature': 0.1},
-        )
+        timeout = deadline.budget(0.6, cap=15, floor=2)
+        if timeout is None:
+            raise TimeoutError('no time left')
+        with circuit.guard(f'bedrock:{MODEL_ID}'):
+            resp = _bedrock(timeout).converse(
+                modelId=MODEL_ID,
+                messages=[{'role': 'user', 'content': [{'text': prompt}]}],
+                inferenceConfig={'maxTokens': 600, 'temperature': 0.1},
+            )
         raw = resp['output']['message']['content'][0]['text'].strip()
         if '```json' in raw: raw = raw.split('```json')[1].split('```')[0].strip()
         elif '```' in raw:   raw = raw.split('```')[1].split('```')[0].strip()
@@ -517,16 +615,8 @@ def rank_hospitals(hospitals: list, diagnosis: dict, lang: str) -> dict:
         }
     except Exception as e:
         print(f'[rank] {e}')
-        return {
-            'recommended_hospital': hospitals[0], 'ranked_list': hospitals[:5],
-            'ranking_reason': 'Nearest hospital selected.',
-            'visit_prep': {
-                'urgency_note': diagnosis.get('urgency_reason',''),
-                'questions_to_ask': diagnosis.get('questions_for_doctor',[]),
-                'what_to_bring': ['Government ID (Aadhaar)','Previous prescriptions','Insurance card'],
-                'transport_tip': '',
-            },
-        }
+        deadline.degrade('ranker', str(e))
+        return _templated_ranking(hospitals, diagnosis)
 
 
 # ── DynamoDB helpers ──────────────────────────────────────────────────────────
@@ -541,24 +631,21 @@ def get_past(user_id):
     except: return []
 
 def save_consult(user_id, symptoms, diagnosis, rec_hosp, lang):
-    try:
-        ts = datetime.now(timezone.utc).isoformat()
-        item = {
-            'userId': user_id, 'recordId': f'consult#{ts}', 'timestamp': ts,
-            'symptoms': symptoms[:500], 'diagnosedCondition': diagnosis.get('condition',''),
-            'specialtyNeeded': diagnosis.get('specialty_needed',''),
-            'urgency': diagnosis.get('urgency','routine'), 'language': lang,
-        }
-        if rec_hosp:
-            item.update({
-                'recommendedHospital': rec_hosp.get('name',''),
-                'hospitalPhone': rec_hosp.get('phone',''),
-                'hospitalLat': str(rec_hosp.get('lat','')),
-                'hospitalLng': str(rec_hosp.get('lng','')),
-            })
-        _dynamo().put_item(Item=item)
-    except Exception as e:
-        print(f'[save] {e}')
+    ts = datetime.now(timezone.utc).isoformat()
+    item = {
+        'userId': user_id, 'recordId': f'consult#{ts}', 'timestamp': ts,
+        'symptoms': symptoms[:500], 'diagnosedCondition': diagnosis.get('condition',''),
+        'specialtyNeeded': diagnosis.get('specialty_needed',''),
+        'urgency': diagnosis.get('urgency','routine'), 'language': lang,
+    }
+    if rec_hosp:
+        item.update({
+            'recommendedHospital': rec_hosp.get('name',''),
+            'hospitalPhone': rec_hosp.get('phone',''),
+            'hospitalLat': str(rec_hosp.get('lat','')),
+            'hospitalLng': str(rec_hosp.get('lng','')),
+        })
+    work_queue.enqueue('ddb.put_item', table=TABLE_NAME, item=item, region=APP_REGION)
 
 def check_return_visit(past, specialty):
     if not past or not specialty: return {'found': False}
@@ -599,8 +686,13 @@ Your decision logic:
 - Be realistic and reassuring — most symptoms are treatable without emergency services"""
 
 
-def run_agent(symptoms: str, lat: float, lng: float, lang: str, user_conditions: list) -> dict:
-    """Run the real tool-use agent loop. Nova Pro decides which tools to call."""
+def run_agent(symptoms: str, lat: float, lng: float, lang: str, user_conditions: list,
+              deadline: Deadline) -> dict:
+    """
+    Run the real tool-use agent loop. Nova Pro decides which tools to call.
+    If the deadline cannot cover another iteration, the remaining tools run
+    directly (see _complete_pipeline).
+    """
     lang_name = LANG_MAP.get(lang, 'English')
 
     messages = [{
@@ -621,6 +713,7 @@ def run_agent(symptoms: str, lat: float, lng: float, lang: str, user_conditions:
         'ranking': None,
         'final_text': '',
         'tool_calls': [],
+        'searched': False,
         'skipped_hospital_search': False,
     }
 
@@ -628,17 +721,25 @@ def run_agent(symptoms: str, lat: float, lng: float, lang: str, user_conditions:
 
     for iteration in range(MAX_ITERATIONS):
         print(f'[agent] iteration={iteration} messages_len={len(messages)}')
+        timeout = deadline.budget(0.4, cap=20, floor=3)
+        if timeout is None:
+            deadline.degrade('agent', f'no time left for iteration {iteration}')
+            break
         try:
-            response = _bedrock().converse(
-                modelId=MODEL_ID,
-                system=[{'text': SYSTEM_PROMPT}],
-                messages=messages,
-                toolConfig={'tools': TOOLS},
-                inferenceConfig={'maxTokens': 1000, 'temperature': 0.2},
-            )
+            # TOOLS + SYSTEM_PROMPT are identical on every iteration — cached prefix
+            with circuit.guard(f'bedrock:{MODEL_ID}'):
+                response = _bedrock(timeout).converse(
+                    modelId=MODEL_ID,
+                    system=prompt_cache.cached_system(SYSTEM_PROMPT, model_id=MODEL_ID, tools=TOOLS),
+                    messages=messages,
+                    toolConfig={'tools': prompt_cache.cached_tools(TOOLS, MODEL_ID)},
+                    inferenceConfig={'maxTokens': 1000, 'temperature': 0.2},
+                )
+            prompt_cache.record_usage('bedrock_agent_invoker.run_agent', response)
         except Exception as e:
             print(f'[agent] converse FAILED: {e}')
-            raise
+            deadline.degrade('agent', str(e))
+            break
 
         stop_reason = response.get('stopReason', '')
         output_msg  = response['output']['message']
@@ -675,20 +776,22 @@ def run_agent(symptoms: str, lat: float, lng: float, lang: str, user_conditions:
                             symptoms=tool_input.get('symptoms', symptoms),
                             lang=lang,
                             user_conditions=tool_input.get('user_conditions', user_conditions),
+                            deadline=deadline,
                         )
                         state['diagnosis'] = result
 
                     elif tool_name == 'find_hospitals':
                         specialty = tool_input.get('specialty', 'General Physician')
                         urgency   = tool_input.get('urgency', 'routine')
-                        hosp_res  = find_hospitals(specialty, urgency, lat, lng)
+                        hosp_res  = find_hospitals(specialty, urgency, lat, lng, deadline)
                         state['hospitals']      = hosp_res['hospitals']
                         state['hospital_count'] = hosp_res['count']
+                        state['searched']       = True
                         result = hosp_res
 
                     elif tool_name == 'rank_hospitals':
                         dx = state['diagnosis'] or {}
-                        result = rank_hospitals(state['hospitals'], dx, lang)
+                        result = rank_hospitals(state['hospitals'], dx, lang, deadline)
                         state['ranking'] = result
 
                     else:
@@ -718,9 +821,30 @@ def run_agent(symptoms: str, lat: float, lng: float, lang: str, user_conditions:
             print(f'[agent] unexpected stopReason: {stop_reason}')
             break
 
+    if not state['final_text']:
+        _complete_pipeline(state, symptoms, lat, lng, lang, user_conditions, deadline)
     return state
 
 
+def _complete_pipeline(state: dict, symptoms: str, lat: float, lng: float, lang: str,
+                       user_conditions: list, deadline: Deadline):
+    """Run the tools the agent never reached, following SYSTEM_PROMPT's decision logic."""
+    if state['diagnosis'] is None:
+        state['diagnosis'] = diagnose(symptoms, lang, user_conditions, deadline)
+    dx = state['diagnosis']
+    if dx.get('urgency') == 'emergency':
+        state['skipped_hospital_search'] = True
+        return
+    if not state['searched']:
+        hosp_res = find_hospitals(dx.get('specialty_needed', 'General Physician'),
+                                  dx.get('urgency', 'routine'), lat, lng, deadline)
+        state['hospitals']      = hosp_res['hospitals']
+        state['hospital_count'] = hosp_res['count']
+        state['searched']       = True
+    if state['ranking'] is None:
+        state['ranking'] = rank_hospitals(state['hospitals'], dx, lang, deadline)
+
+
 # ── Lambda handler ────────────────────────────────────────────────────────────
 
 def lambda_handler(event, context):
@@ -755,9 +879,10 @@ def lambda_handler(event, context):
         return {'statusCode': 400, 'headers': CORS, 'body': json.dumps({'error': 'Provide symptoms'})}
 
     print(f'[handler] START | symptoms={symptoms[:80]} | lat={lat} lng={lng} | lang={lang}')
+    deadline = Deadline.from_context(context)
 
     try:
-        state = run_agent(symptoms, lat, lng, lang, user_conditions)
+        state = run_agent(symptoms, lat, lng, lang, user_conditions, deadline)
     except Exception as e:
         print(f'[handler] agent FAILED: {e}')
         return {'statusCode': 500, 'headers': CORS, 'body': json.dumps({'error': str(e)})}
@@ -777,7 +902,7 @@ def lambda_handler(event, context):
     hosp_part        = ('Best hospital: ' + rec_hosp['name'] + ' (' + str(rec_hosp['distance_km']) + 'km away).') if rec_hosp else 'No nearby hospitals found.'
     summary          = state['final_text'] or (emergency_prefix + 'Diagnosed as ' + dx.get('condition', 'unknown') + '. ' + hosp_part)
 
-    print(f'[handler] DONE | tool_calls={[t["tool"] for t in state["tool_calls"]]} | urgency={urgency}')
+    print(f'[handler] DONE | tool_calls={[t["tool"] for t in state["tool_calls"]]} | urgency={urgency} | degraded={deadline.degraded}')
 
     return {
         'statusCode': 200,
@@ -816,5 +941,6 @@ def lambda_handler(event, context):
                 'past_consultations_count': len(past),
                 'return_visit_suggested':   past_visit.get('found', False),
             },
+            'degraded': deadline.degraded,
         }, default=str),
     }
@@ -3,10 +3,26 @@ deep_analysis/lambda_function.py
 
 Full deep-analysis pipeline:
   1. Amazon Comprehend Medical  → extract symptoms / ICD-10 codes
-  2. Amazon Bedrock KB          → RAG over medical textbooks (optional)
-  3. Amazon Nova Pro (Bedrock)  → structured clinical JSON
-  4. Amazon DynamoDB            → save health log per user
-  5. Amazon SNS                 → SMS summary to user's phone
+  2. Amazon Bedrock KB          → retrieve medical textbook passages (optional)
+  3. Amazon Nova Pro (Bedrock)  → structured clinical JSON + cited answer
+  4. Amazon DynamoDB            → save health log per user   (background queue)
+  5. Amazon SNS                 → SMS summary to user's phone (background queue)
+
+Stages run concurrently (Stages below): vision, NER and ICD-10 start
+together, and KB retrieval starts on the raw question without waiting for
+NER. If NER then finds symptoms / body parts while the KB call is still in
+flight, a refined KB query is started and preferred when it succeeds.
+Synthesis waits for NER + KB only; vision and ICD-10 are joined at the end.
+Latency is roughly the slowest path rather than the sum of every stage.
+ICD-10 codes normally come from the offline index (shared/icd10.py), which
+resolves the extracted entities in microseconds; the Comprehend ICD-10
+stage only runs with ICD10_MODE=comprehend or when no index is bundled.
+
+RAG is retrieve-then-synthesize: the KB's Retrieve API (or the local index)
+returns numbered passages, and the one synthesis call writes both the
+structured JSON and the patient-facing answer citing them. KB_RAG_MODE=
+generate restores the old RetrieveAndGenerate call, which costs a second
+full Nova Pro generation per request.
 
 POST /deep-analysis
 Body: {
@@ -20,16 +36,31 @@ Body: {
 
 Env vars:
   KNOWLEDGE_BASE_ID     — Bedrock KB ID (optional; enables RAG mode)
+  LOCAL_KB_DIR          — in-process vector index (optional, shared/local_kb.py);
+                          when set, RAG retrieves locally instead of calling the KB
   DYNAMODB_MAIN_TABLE   — defaults to BhashaAiMain
   BEDROCK_REGION        — defaults to us-east-1
+  WORK_QUEUE_URL        — optional, SQS queue for the log write + SMS
+  KB_REFINE_WAIT_S      — how long KB waits for NER before starting on the
+                          raw question (default 0.3 — enough for a NER cache hit)
+  KB_RAG_MODE           — retrieve (default) | generate (RetrieveAndGenerate)
+
+Each stage gets its share of the invocation deadline (shared/deadline.py).
+A stage that runs out of time is skipped — no RAG, fallback analysis — and
+listed in the response under `degraded`.
 """
 
 import json
 import boto3
 import os
 import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
+from shared import circuit, gazetteer, local_kb, ner, prompt_cache, rag_cache, work_queue
+from shared.deadline import Deadline, boto_config
+
 CORS = {
     'Content-Type': 'application/json',
     'Access-Control-Allow-Origin': '*',
@@ -47,6 +78,10 @@ KB_MODEL_ARN    = (
     'amazon.nova-pro-v1:0'
 )
 
+REFINE_WAIT_S = float(os.environ.get('KB_REFINE_WAIT_S', '0.3'))
+RAG_MODE      = os.environ.get('KB_RAG_MODE', 'retrieve')
+KB_PASSAGES   = 6
+
 LANG_MAP = {
     'hi': 'Hindi',   'te': 'Telugu',  'ta': 'Tamil',    'en': 'English',
     'mr': 'Marathi', 'bn': 'Bengali', 'gu': 'Gujarati',
@@ -56,74 +91,167 @@ LANG_MAP = {
 
 # ── AWS clients ────────────────────────────────────────────────────────────────
 
-def _clients():
-    bedrock       = boto3.client('bedrock-runtime',       region_name=BEDROCK_REGION)
-    bedrock_agent = boto3.client('bedrock-agent-runtime', region_name=BEDROCK_REGION)
-    comprehend    = boto3.client('comprehendmedical',     region_name=BEDROCK_REGION)
-    dynamo        = boto3.resource('dynamodb',            region_name=APP_REGION)
-    sns           = boto3.client('sns',                   region_name=APP_REGION)
-    return bedrock, bedrock_agent, comprehend, dynamo, sns
+# boto3's default session is not safe to create clients from concurrently
+_client_lock = threading.Lock()
+
+
+def _client(service: str, timeout: float):
+    """bedrock-runtime / bedrock-agent-runtime / comprehendmedical, bounded to `timeout`."""
+    with _client_lock:
+        return boto3.client(service, region_name=BEDROCK_REGION, config=boto_config(timeout))
+
+
+def _embed_client(deadline: Deadline):
+    """Titan embeddings client for a local-KB query whose embedding is not cached."""
+    timeout = deadline.budget(0.1, cap=3)
+    if timeout is None:
+        raise TimeoutError('no time left')
+    with _client_lock:
+        return boto3.client('bedrock-runtime', region_name=local_kb.EMBED_REGION,
+                            config=boto_config(timeout))
+
+
+def _comprehend_client(deadline: Deadline):
+    """Comprehend client for a NER/ICD cache miss, bounded by the deadline."""
+    timeout = deadline.budget(0.15, cap=6)
+    if timeout is None:
+        raise TimeoutError('no time left')
+    return _client('comprehendmedical', timeout)
 
 
 # ── Step 1: Comprehend Medical ─────────────────────────────────────────────────
 
-def extract_medical_entities(comprehend, text: str) -> dict:
+EMPTY_ENTITIES = {'symptoms': [], 'conditions': [], 'medications': [],
+                  'body_parts': [], 'durations': [], 'icd_map': {}}
+
+
+def extract_medical_entities(comprehend, text: str, deadline: Deadline) -> dict:
+    """
+    NER, cached by text (shared/ner.py). `comprehend` returns a client and is
+    only called on a cache miss; when Comprehend fails the gazetteer result
+    stands in. icd_map is filled in by infer_icd_codes().
+    """
     try:
-        result   = comprehend.detect_entities_v2(Text=text[:20000])
-        entities = result.get('Entities', [])
-
-        symptoms, conditions, medications, body_parts, durations = [], [], [], [], []
-
-        for e in entities:
-            if e.get('Score', 0) < 0.6:
-                continue
-            cat = e.get('Category', '')
-            val = e.get('Text', '')
-            if cat == 'SIGN_OR_SYMPTOM':    symptoms.append(val)
-            elif cat == 'MEDICAL_CONDITION': conditions.append(val)
-            elif cat == 'MEDICATION':        medications.append(val)
-            elif cat == 'ANATOMY':           body_parts.append(val)
-            elif cat == 'TIME_EXPRESSION':   durations.append(val)
-
-        icd_map = {}
-        if conditions:
-            try:
-                icd_resp = comprehend.infer_icd10_cm(Text=text[:10000])
-                for entity in icd_resp.get('Entities', []):
-                    if entity.get('Score', 0) > 0.7 and entity.get('ICD10CMConcepts'):
-                        icd_map[entity['Text']] = {
-                            'code': entity['ICD10CMConcepts'][0]['Code'],
-                            'description': entity['ICD10CMConcepts'][0]['Description'],
-                        }
-            except Exception:
-                pass
-
-        return {
-            'symptoms':    list(dict.fromkeys(symptoms)),
-            'conditions':  list(dict.fromkeys(conditions)),
-            'medications': list(dict.fromkeys(medications)),
-            'body_parts':  list(dict.fromkeys(body_parts)),
-            'durations':   list(dict.fromkeys(durations)),
-            'icd_map':     icd_map,
-        }
+        entities = ner.detect_entities(text, comprehend)
     except Exception as e:
         print(f'[comprehend_medical] error: {e}')
-        return {'symptoms': [], 'conditions': [], 'medications': [],
-                'body_parts': [], 'durations': [], 'icd_map': {}}
+        deadline.degrade('comprehend', str(e))
+        entities = gazetteer.extract(text)
+    entities['icd_map'] = {}
+    return entities
+
+
+def infer_icd_codes(comprehend, text: str, deadline: Deadline) -> dict:
+    """
+    High-precision ICD-10 codes from Comprehend (ICD10_MODE=comprehend, or no
+    bundled index) — runs alongside NER instead of after it. By default the
+    extracted entities are resolved offline by ner.resolve_icd10() instead.
+    """
+    try:
+        return ner.infer_icd10(text, comprehend)
+    except Exception as e:
+        print(f'[comprehend_medical] icd10 error: {e}')
+        return {}
 
 
 # ── Step 2: Bedrock Knowledge Base (RAG) ──────────────────────────────────────
 
-def query_knowledge_base(bedrock_agent, kb_id: str, question: str,
-                          entities: dict, lang_name: str,
-                          user_conditions: list) -> dict:
+def refines_query(entities: dict) -> bool:
+    """True when NER output would change the KB query built from the raw question."""
+    return bool(entities['symptoms'] or entities['body_parts'])
+
+
+def kb_query(question: str, entities: dict, user_conditions: list) -> str:
+    # Term lists sorted so the same entities give one RAG cache key
     enriched = question
     if entities['symptoms']:
-        enriched += '. Symptoms: ' + ', '.join(entities['symptoms'])
+        enriched += '. Symptoms: ' + ', '.join(sorted(entities['symptoms']))
     if entities['body_parts']:
-        enriched += '. Affected areas: ' + ', '.join(entities['body_parts'])
+        enriched += '. Affected areas: ' + ', '.join(sorted(entities['body_parts']))
     if user_conditions:
-        enriched += '. Patient history: ' + ', '.join(user_conditions)
+        enriched += '. Patient history: ' + ', '.join(sorted(user_conditions))
+    return enriched
+
+
+def _source_name(uri: str) -> str:
+    return uri.split('/')[-1].replace('.txt', '').replace('_', ' ')
+
+
+def passages(hits: list) -> dict:
+    """
+    Retrieved chunks as numbered passages for synthesis. `passage_sources[i]`
+    is the source of passage i + 1, so cited numbers map back to sources;
+    there is no KB-generated answer, so `text` stays empty.
+    """
+    return {
+        'text':            '',
+        'context':         '\n\n'.join(f'[{i}] ({h["source"]}) {h["text"]}'
+                                       for i, h in enumerate(hits, 1)),
+        'sources':         list(dict.fromkeys(h['source'] for h in hits)),
+        'passage_sources': [h['source'] for h in hits],
+    }
+
+
+def retrieve_local_context(question: str, entities: dict, user_conditions: list,
+                           deadline: Deadline, stage: str = 'rag') -> dict:
+    """In-process retrieval (shared/local_kb.py)."""
+    query = kb_query(question, entities, user_conditions)
+
+    def fetch():
+        hits = local_kb.retrieve(query, KB_PASSAGES, lambda: _embed_client(deadline))
+        return passages(hits) if hits else None
+
+    try:
+        return rag_cache.cached('local', query, fetch, 'passages', str(KB_PASSAGES)) or \
+            {'text': '', 'context': '', 'sources': []}
+    except Exception as e:
+        print(f'[local_kb] error: {e}')
+        deadline.degrade(stage, str(e))
+        return {'text': '', 'context': '', 'sources': []}
+
+
+def retrieve_kb_passages(bedrock_agent, kb_id: str, question: str, entities: dict,
+                         user_conditions: list, deadline: Deadline,
+                         stage: str = 'rag') -> dict:
+    """KB Retrieve only — no generation; synthesis answers from the passages."""
+    query = kb_query(question, entities, user_conditions)
+
+    def fetch():
+        with circuit.guard('kb'):
+            resp = bedrock_agent.retrieve(
+                knowledgeBaseId=kb_id,
+                retrievalQuery={'text': query},
+                retrievalConfiguration={
+                    'vectorSearchConfiguration': {'numberOfResults': KB_PASSAGES},
+                },
+            )
+        hits = []
+        for r in resp.get('retrievalResults', []):
+            text = r.get('content', {}).get('text', '').strip()
+            uri  = r.get('location', {}).get('s3Location', {}).get('uri', '')
+            if text:
+                hits.append({'source': _source_name(uri) if uri else 'Knowledge Base',
+                             'text': text})
+        return passages(hits) if hits else None
+
+    try:
+        return rag_cache.cached(kb_id, query, fetch, 'passages', str(KB_PASSAGES)) or \
+            {'text': '', 'context': '', 'sources': []}
+    except Exception as e:
+        print(f'[kb_retrieve] error: {e}')
+        deadline.degrade(stage, str(e))
+        return {'text': '', 'context': '', 'sources': []}
+
+
+def query_knowledge_base(bedrock_agent, kb_id: str, question: str,
+                          entities: dict, lang_name: str,
+                          user_conditions: list, deadline: Deadline,
+                          stage: str = 'rag') -> dict:
+    """
+    RetrieveAndGenerate answer + cited sources. Answers are cached per
+    canonical query and reply language (shared/rag_cache.py).
+    """
+    enriched = kb_query(question, entities, user_conditions)
 
     conditions_ctx = (
         f'Patient has: {", ".join(user_conditions)}. ' if user_conditions else ''
@@ -136,83 +264,75 @@ def query_knowledge_base(bedrock_agent, kb_id: str, question: str,
         'Retrieved context:\n$search_results$\n\nPatient: $query$'
     )
 
-    try:
-        resp = bedrock_agent.retrieve_and_generate(
-            input={'text': enriched},
-            retrieveAndGenerateConfiguration={
-                'type': 'KNOWLEDGE_BASE',
-                'knowledgeBaseConfiguration': {
-                    'knowledgeBaseId': kb_id,
-                    'modelArn': KB_MODEL_ARN,
-                    'retrievalConfiguration': {
-                        'vectorSearchConfiguration': {'numberOfResults': 6},
-                    },
-                    'generationConfiguration': {
-                        'promptTemplate': {'textPromptTemplate': prompt_template},
-                        'inferenceConfig': {
-                            'textInferenceConfig': {'maxTokens': 1500, 'temperature': 0.2}
+    def fetch():
+        with circuit.guard('kb'):
+            resp = bedrock_agent.retrieve_and_generate(
+                input={'text': enriched},
+                retrieveAndGenerateConfiguration={
+                    'type': 'KNOWLEDGE_BASE',
+                    'knowledgeBaseConfiguration': {
+                        'knowledgeBaseId': kb_id,
+                        'modelArn': KB_MODEL_ARN,
+                        'retrievalConfiguration': {
+                            'vectorSearchConfiguration': {'numberOfResults': 6},
+                        },
+                        'generationConfiguration': {
+                            'promptTemplate': {'textPromptTemplate': prompt_template},
+                            'inferenceConfig': {
+                                'textInferenceConfig': {'maxTokens': 1500, 'temperature': 0.2}
+                            },
                         },
                     },
                 },
-            },
-        )
+            )
 
         sources = []
         for citation in resp.get('citations', []):
             for ref in citation.get('retrievedReferences', []):
                 uri = ref.get('location', {}).get('s3Location', {}).get('uri', '')
                 if uri:
-                    fname = uri.split('/')[-1].replace('.txt', '').replace('_', ' ')
+                    fname = _source_name(uri)
                     if fname not in sources:
                         sources.append(fname)
 
-        return {'text': resp['output']['text'], 'sources': sources}
+        text = resp['output']['text']
+        return {'text': text, 'sources': sources} if text else None
+
+    try:
+        return rag_cache.cached(kb_id, enriched, fetch, lang_name) or {'text': '', 'sources': []}
     except Exception as e:
         print(f'[kb_query] error: {e}')
+        deadline.degrade(stage, str(e))
         return {'text': '', 'sources': []}
 
 
 # ── Step 3: Claude 3.5 Sonnet structured synthesis ────────────────────────────
 
-def synthesize_analysis(bedrock, question: str, entities: dict,
-                         kb_text: str, lang_name: str, user_conditions: list) -> dict:
-    entity_ctx = ''
-    if entities['symptoms']:
-        entity_ctx += f"\nDetected symptoms: {', '.join(entities['symptoms'])}"
-    if entities['body_parts']:
-        entity_ctx += f"\nAffected areas: {', '.join(entities['body_parts'])}"
-    if entities['durations']:
-        entity_ctx += f"\nDuration: {', '.join(entities['durations'])}"
-    if entities['medications']:
-        entity_ctx += f"\nCurrent medications: {', '.join(entities['medications'])}"
-    if user_conditions:
-        entity_ctx += f"\nKnown conditions: {', '.join(user_conditions)}"
-
-    kb_section = f'\n\nMedical reference:\n{kb_text[:2500]}' if kb_text else ''
-
-    system_prompt = f"""You are a senior clinical decision support system. Reply in {lang_name}.
+# Static prefix sits behind a prompt-cache checkpoint; the reply language is
+# appended after it so every language shares one cache entry.
+SYNTHESIS_SYSTEM_PROMPT = """You are a senior clinical decision support system.
 
 Produce ONLY valid JSON. No markdown, no explanation, just the JSON object.
 
 Required structure:
-{{
+{
   "summary": "One clear sentence summarising the clinical picture",
   "possible_conditions": [
-    {{"name": "Condition", "likelihood": "high|moderate|low", "brief": "One sentence why"}}
+    {"name": "Condition", "likelihood": "high|moderate|low", "brief": "One sentence why"}
   ],
   "urgency": "emergency|urgent|routine",
   "urgency_reason": "Brief reason",
-  "doctor_roadmap": {{
+  "doctor_roadmap": {
     "see_first": "Doctor type",
     "timeframe": "e.g. Within 24 hours",
     "if_referred": "Specialist if needed"
-  }},
+  },
   "action_steps": ["Step 1", "Step 2", "Step 3", "Step 4", "Step 5"],
   "tests_to_ask": ["Test name"],
   "red_flags": ["Call 112 if you notice this"],
   "self_care": ["Safe home care step"],
   "questions_for_doctor": ["Question to ask"]
-}}
+}
 
 Rules:
 - possible_conditions: 2-4 entries ordered by likelihood
@@ -221,16 +341,75 @@ Rules:
 - urgency=routine: can wait a few days
 - Output ONLY the JSON object"""
 
+# Appended (still inside the cached prefix) when synthesis gets retrieved
+# passages instead of a KB-generated answer — the narrative answer is
+# written here, in the same call.
+RAG_SYNTHESIS_RULES = """
+
+The patient message includes numbered medical reference passages. Add two keys to the JSON object:
+  "answer": "4-8 sentences for the patient, in the reply language, based ONLY on the passages; cite them inline as [1], [2]; end with '⚠️ Always consult a qualified doctor.'",
+  "citations": [1, 2]
+"citations" lists the passage numbers the answer relies on. If the passages do not cover the question, say so in "answer" and cite nothing."""
+
+
+def fallback_analysis(question: str) -> dict:
+    return {
+        'summary': question[:200],
+        'possible_conditions': [],
+        'urgency': 'routine',
+        'urgency_reason': 'Could not analyse — please consult a doctor.',
+        'doctor_roadmap': {
+            'see_first': 'General Physician',
+            'timeframe': 'At your convenience',
+            'if_referred': '',
+        },
+        'action_steps': ['Please consult a General Physician for proper evaluation.'],
+        'tests_to_ask': [],
+        'red_flags': [],
+        'self_care': [],
+        'questions_for_doctor': [],
+    }
+
+
+def synthesize_analysis(bedrock, question: str, entities: dict,
+                         kb_text: str, lang_name: str, user_conditions: list,
+                         deadline: Deadline, cited: bool = False) -> dict:
+    """
+    Structured clinical JSON. With `cited`, kb_text holds numbered
+    retrieved passages and the JSON also carries the cited `answer` and
+    `citations` (RAG_SYNTHESIS_RULES).
+    """
+    entity_ctx = ''
+    if entities['symptoms']:
+        entity_ctx += f"\nDetected symptoms: {', '.join(entities['symptoms'])}"
+    if entities['body_parts']:
+        entity_ctx += f"\nAffected areas: {', '.join(entities['body_parts'])}"
+    if entities['durations']:
+        entity_ctx += f"\nDuration: {', '.join(entities['durations'])}"
+    if entities['medications']:
+        entity_ctx += f"\nCurrent medications: {', '.join(entities['medications'])}"
+    if user_conditions:
+        entity_ctx += f"\nKnown conditions: {', '.join(user_conditions)}"
+
+    if cited:
+        kb_section = f'\n\nMedical reference passages:\n{kb_text[:8000]}'
+        system     = SYNTHESIS_SYSTEM_PROMPT + RAG_SYNTHESIS_RULES
+    else:
+        kb_section = f'\n\nMedical reference:\n{kb_text[:2500]}' if kb_text else ''
+        system     = SYNTHESIS_SYSTEM_PROMPT
+
     user_msg = f'Patient says: "{question}"{entity_ctx}{kb_section}'
 
     raw = ''
     try:
-        resp = bedrock.converse(
-            modelId=SYNTHESIS_MODEL,
-            system=[{'text': system_prompt}],
-            messages=[{'role': 'user', 'content': [{'text': user_msg}]}],
-            inferenceConfig={'maxTokens': 1800, 'temperature': 0.2},
-        )
+        with circuit.guard(f'bedrock:{SYNTHESIS_MODEL}'):
+            resp = bedrock.converse(
+                modelId=SYNTHESIS_MODEL,
+                system=prompt_cache.cached_system(system, f'Reply in {lang_name}.'),
+                messages=[{'role': 'user', 'content': [{'text': user_msg}]}],
+                inferenceConfig={'maxTokens': 2400 if cited else 1800, 'temperature': 0.2},
+            )
+        prompt_cache.record_usage('deep_analysis.synthesis', resp)
         raw = resp['output']['message']['content'][0]['text'].strip()
 
         # Strip markdown fences if present
@@ -254,22 +433,18 @@ Rules:
 
     except Exception as e:
         print(f'[nova_synthesis] error: {e} | raw: {raw[:300]}')
-        return {
-            'summary': question[:200],
-            'possible_conditions': [],
-            'urgency': 'routine',
-            'urgency_reason': 'Could not analyse — please consult a doctor.',
-            'doctor_roadmap': {
-                'see_first': 'General Physician',
-                'timeframe': 'At your convenience',
-                'if_referred': '',
-            },
-            'action_steps': ['Please consult a General Physician for proper evaluation.'],
-            'tests_to_ask': [],
-            'red_flags': [],
-            'self_care': [],
-            'questions_for_doctor': [],
-        }
+        deadline.degrade('synthesis', str(e))
+        return fallback_analysis(question)
+
+
+def cited_sources(cited, passage_sources: list) -> list:
+    """Sources of the passage numbers the answer cited, in citation order."""
+    out = []
+    for n in cited if isinstance(cited, list) else []:
+        if isinstance(n, int) and 1 <= n <= len(passage_sources):
+            if passage_sources[n - 1] not in out:
+                out.append(passage_sources[n - 1])
+    return out
 
 
 # ── Step 4: Image analysis (Nova Lite vision) ─────────────────────────────────
@@ -291,50 +466,100 @@ def analyze_image(bedrock, image_b64: str, question: str, lang_name: str) -> str
         f"User question: {question or 'Please analyse this image.'}"
     )
 
-    resp = bedrock.converse(
-        modelId=VISION_MODEL,
-        messages=[{
-            'role': 'user',
-            'content': [
-                {'image': {'format': fmt, 'source': {'bytes': base64.b64decode(image_b64)}}},
-                {'text': prompt},
-            ],
-        }],
-        inferenceConfig={'maxTokens': 1200, 'temperature': 0.3},
-    )
+    with circuit.guard(f'bedrock:{VISION_MODEL}'):
+        resp = bedrock.converse(
+            modelId=VISION_MODEL,
+            messages=[{
+                'role': 'user',
+                'content': [
+                    {'image': {'format': fmt, 'source': {'bytes': base64.b64decode(image_b64)}}},
+                    {'text': prompt},
+                ],
+            }],
+            inferenceConfig={'maxTokens': 1200, 'temperature': 0.3},
+        )
     return resp['output']['message']['content'][0]['text']
 
 
+def vision_stage(bedrock, image_b64: str, question: str, lang_name: str,
+                 deadline: Deadline):
+    try:
+        return analyze_image(bedrock, image_b64, question, lang_name)
+    except Exception as e:
+        print(f'[vision] error: {e}')
+        deadline.degrade('vision', str(e))
+        return None
+
+
+# ── Stage scheduler ────────────────────────────────────────────────────────────
+
+class Stages:
+    """
+    Runs independent pipeline stages on a thread pool and hands their results
+    back by name. Stage functions catch their own errors and return a
+    fallback, so result() only returns `default` for a stage that was never
+    started or did not finish in time.
+    """
+
+    def __init__(self, deadline: Deadline, max_workers: int = 5):
+        self.deadline = deadline
+        self.futures  = {}
+        self._pool    = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='stage')
+
+    def start(self, name: str, fn, *args):
+        self.futures[name] = self._pool.submit(fn, *args)
+
+    def started(self, name: str) -> bool:
+        return name in self.futures
+
+    def done(self, name: str) -> bool:
+        return name in self.futures and self.futures[name].done()
+
+    def result(self, name: str, default=None, timeout: float = None):
+        """Wait up to `timeout` (default: the rest of the deadline) for a stage."""
+        future = self.futures.get(name)
+        if future is None:
+            return default
+        try:
+            return future.result(self.deadline.remaining() if timeout is None else timeout)
+        except Exception:
+            return default
+
+    def close(self):
+        # Never block the response on a stage nobody is waiting for (e.g. the
+        # raw KB query once the refined one has answered); each call is
+        # already bounded by its client's read timeout.
+        self._pool.shutdown(wait=False)
+
+
 # ── Step 5: DynamoDB health log ────────────────────────────────────────────────
 
-def save_health_log(dynamo, user_id: str, question: str,
+def save_health_log(user_id: str, question: str,
                      entities: dict, structured: dict, lang: str):
-    try:
-        table_name = os.environ.get('DYNAMODB_MAIN_TABLE', 'BhashaAiMain')
-        table = dynamo.Table(table_name)
-        ts    = datetime.now(timezone.utc).isoformat()
-        table.put_item(Item={
-            'userId':      user_id,
-            'recordType':  f'health_log#{ts}',
-            'timestamp':   ts,
-            'language':    lang,
-            'question':    question[:500],
-            'symptoms':    entities.get('symptoms', []),
-            'conditions':  entities.get('conditions', []),
-            'medications': entities.get('medications', []),
-            'urgency':     structured.get('urgency', 'routine'),
-            'summary':     structured.get('summary', ''),
-            'doctor':      structured.get('doctor_roadmap', {}).get('see_first', ''),
-            'icd_map':     json.dumps(entities.get('icd_map', {})),
-            'model':       'nova-pro',
-        })
-    except Exception as e:
-        print(f'[dynamo_save] error (non-fatal): {e}')
+    table_name = os.environ.get('DYNAMODB_MAIN_TABLE', 'BhashaAiMain')
+    ts         = datetime.now(timezone.utc).isoformat()
+    work_queue.enqueue('ddb.put_item', table=table_name, region=APP_REGION, item={
+        'userId':      user_id,
+        'recordType':  f'health_log#{ts}',
+        'timestamp':   ts,
+        'language':    lang,
+        'question':    question[:500],
+        'symptoms':    entities.get('symptoms', []),
+        'conditions':  entities.get('conditions', []),
+        'medications': entities.get('medications', []),
+        'urgency':     structured.get('urgency', 'routine'),
+        'summary':     structured.get('summary', ''),
+        'doctor':      structured.get('doctor_roadmap', {}).get('see_first', ''),
+        'icd_map':     json.dumps(entities.get('icd_map', {})),
+        'model':       'nova-pro',
+    })
 
 
 # ── Step 6: SNS SMS ───────────────────────────────────────────────────────────
 
-def send_sms(sns_client, phone: str, structured: dict, entities: dict):
+def send_sms(phone: str, structured: dict, entities: dict) -> bool:
+    """Queue the SMS summary. Returns True once it is accepted for delivery."""
     urgency   = structured.get('urgency', 'routine').upper()
     doctor    = structured.get('doctor_roadmap', {}).get('see_first', 'GP')
     timeframe = structured.get('doctor_roadmap', {}).get('timeframe', '')
@@ -351,25 +576,122 @@ def send_sms(sns_client, phone: str, structured: dict, entities: dict):
         f'⚠️ Not a diagnosis. Consult a doctor.'
     )[:1400]
 
-    try:
-        if not phone.startswith('+'):
-            phone = '+91' + phone.lstrip('0')
-        sns_client.publish(
-            PhoneNumber=phone,
-            Message=sms,
-            MessageAttributes={
-                'AWS.SNS.SMS.SMSType': {
-                    'DataType': 'String', 'StringValue': 'Transactional',
-                },
-            },
-        )
+    if not phone.startswith('+'):
+        phone = '+91' + phone.lstrip('0')
+    return work_queue.enqueue('sns.sms', phone=phone, message=sms, region=APP_REGION)
+
+
+# ── Lambda handler ─────────────────────────────────────────────────────────────
+
+def _start_kb(stages: Stages, name: str, kb_id: str, question: str, entities: dict,
+              lang_name: str, user_conditions: list, deadline: Deadline) -> bool:
+    """Start a KB query as stage `name`; False when there is no time left for one."""
+    stage = 'rag' if name == 'kb' else 'rag_refine'
+    if local_kb.available():
+        stages.start(name, retrieve_local_context, question, entities,
+                     user_conditions, deadline, stage)
         return True
-    except Exception as e:
-        print(f'[sns_sms] error (non-fatal): {e}')
+    if RAG_MODE == 'generate':
+        timeout = deadline.budget(0.35, cap=12, floor=2)
+        if timeout is None:
+            return False
+        stages.start(name, query_knowledge_base, _client('bedrock-agent-runtime', timeout),
+                     kb_id, question, entities, lang_name, user_conditions, deadline, stage)
+        return True
+    timeout = deadline.budget(0.2, cap=6, floor=1)
+    if timeout is None:
         return False
+    stages.start(name, retrieve_kb_passages, _client('bedrock-agent-runtime', timeout),
+                 kb_id, question, entities, user_conditions, deadline, stage)
+    return True
 
 
-# ── Lambda handler ─────────────────────────────────────────────────────────────
+def _run_pipeline(stages: Stages, deadline: Deadline, result: dict, question: str,
+                  image_b64: str, kb_id: str, lang_name: str, user_conditions: list,
+                  user_id: str, phone: str):
+    # ── Fan out: vision, NER and ICD-10 start together ──────────────────────
+    if image_b64:
+        # Vision runs beside the text branch, so it no longer eats into the
+        # time synthesis needs; without a question it is the whole answer.
+        timeout = deadline.budget(0.7 if question else 0.9, cap=20, floor=3)
+        if timeout is None:
+            deadline.degrade('vision', 'no time left')
+        else:
+            stages.start('vision', vision_stage, _client('bedrock-runtime', timeout),
+                         image_b64, question, lang_name, deadline)
+
+    if question:
+        comprehend = lambda: _comprehend_client(deadline)
+        stages.start('ner', extract_medical_entities, comprehend, question, deadline)
+        if not ner.icd10_local():
+            stages.start('icd', infer_icd_codes, comprehend, question, deadline)
+
+        # KB (if configured) — a NER cache hit lands within REFINE_WAIT_S and
+        # enriches the first query; otherwise it starts on the raw question.
+        early = None
+        if kb_id or local_kb.available():
+            early = stages.result('ner', timeout=REFINE_WAIT_S)
+            if not _start_kb(stages, 'kb', kb_id, question, early or EMPTY_ENTITIES,
+                             lang_name, user_conditions, deadline):
+                deadline.degrade('rag', 'no time left')
+
+        entities = stages.result('ner') or dict(EMPTY_ENTITIES)
+        result['symptoms_detected'] = entities['symptoms']
+        result['entities'] = {k: v for k, v in entities.items() if k != 'icd_map'}
+
+        # Refine: entities arrived after the raw KB query went out
+        if (early is None and stages.started('kb') and not stages.done('kb')
+                and refines_query(entities)):
+            _start_kb(stages, 'kb_refined', kb_id, question, entities,
+                      lang_name, user_conditions, deadline)
+
+        # ── Fan in: synthesis needs NER + KB ─────────────────────────────────
+        kb_text = kb_context = ''
+        kb_result = {}
+        if stages.started('kb'):
+            kb_result = stages.result('kb_refined')
+            if not (kb_result and (kb_result['text'] or kb_result.get('context'))):
+                kb_result = stages.result('kb', {'text': '', 'sources': []})
+            kb_text           = kb_result['text']
+            kb_context        = kb_result.get('context') or kb_text
+            result['sources'] = kb_result['sources']
+            result['mode']    = ('local-rag+claude' if local_kb.available()
+                                 else 'rag+claude' if RAG_MODE == 'generate'
+                                 else 'retrieve+claude')
+        else:
+            result['mode'] = 'claude-direct'
+
+        timeout = deadline.budget(0.9, cap=25, floor=2)
+        if timeout is None:
+            deadline.degrade('synthesis', 'no time left')
+            structured = fallback_analysis(question)
+        else:
+            structured = synthesize_analysis(
+                _client('bedrock-runtime', timeout),
+                question, entities, kb_context, lang_name, user_conditions, deadline,
+                cited=bool(kb_context and not kb_text),
+            )
+        answer = structured.pop('answer', '') if isinstance(structured.get('answer'), str) else ''
+        cited  = structured.pop('citations', [])
+        if answer and kb_result.get('passage_sources'):
+            result['sources'] = cited_sources(cited, kb_result['passage_sources']) or result['sources']
+        result['structured'] = structured
+        result['answer']     = kb_text or answer or structured.get('summary', '')
+
+        # Step 4 + 5: health log and SMS go to the background queue
+        entities['icd_map'] = (ner.resolve_icd10(entities) if ner.icd10_local()
+                               else stages.result('icd', {}))
+        save_health_log(user_id, question, entities, structured, lang_name)
+        if phone:
+            result['sms_sent'] = send_sms(phone, structured, entities)
+
+    result['imageAnalysis'] = stages.result('vision')
+    if stages.started('vision') and not stages.done('vision'):
+        deadline.degrade('vision', 'no time left')
+    if result['imageAnalysis'] and not question:
+        result['answer'] = result['imageAnalysis']
+        result['mode']   = 'vision'
+
 
 def lambda_handler(event, context):
     if event.get('httpMethod') == 'OPTIONS':
@@ -394,8 +716,7 @@ def lambda_handler(event, context):
 
     lang_name = LANG_MAP.get(lang_code, 'English')
     kb_id     = os.environ.get('KNOWLEDGE_BASE_ID', '').strip()
-
-    bedrock, bedrock_agent, comprehend, dynamo, sns_client = _clients()
+    deadline  = Deadline.from_context(context)
 
     result = {
         'language':          lang_name,
@@ -407,50 +728,15 @@ def lambda_handler(event, context):
         'imageAnalysis':     None,
         'mode':              None,
         'sms_sent':          False,
+        'degraded':          deadline.degraded,
     }
 
-    # ── Image branch ────────────────────────────────────────────────────────
-    if image_b64:
-        try:
-            result['imageAnalysis'] = analyze_image(bedrock, image_b64, question, lang_name)
-            if not question:
-                result['answer'] = result['imageAnalysis']
-                result['mode']   = 'vision'
-        except Exception as e:
-            print(f'[vision] error: {e}')
-
-    # ── Text branch ─────────────────────────────────────────────────────────
-    if question:
-        # Step 1: Comprehend Medical
-        entities = extract_medical_entities(comprehend, question)
-        result['symptoms_detected'] = entities['symptoms']
-        result['entities'] = {k: v for k, v in entities.items() if k != 'icd_map'}
-
-        # Step 2: RAG (if KB configured)
-        kb_text = ''
-        if kb_id:
-            kb_result         = query_knowledge_base(
-                bedrock_agent, kb_id, question, entities, lang_name, user_conditions
-            )
-            kb_text           = kb_result['text']
-            result['sources'] = kb_result['sources']
-            result['mode']    = 'rag+claude'
-        else:
-            result['mode'] = 'claude-direct'
-
-        # Step 3: Claude structured synthesis
-        structured       = synthesize_analysis(
-            bedrock, question, entities, kb_text, lang_name, user_conditions
-        )
-        result['structured'] = structured
-        result['answer']     = kb_text or structured.get('summary', '')
-
-        # Step 4: Save to DynamoDB
-        save_health_log(dynamo, user_id, question, entities, structured, lang_name)
-
-        # Step 5: SMS
-        if phone:
-            result['sms_sent'] = send_sms(sns_client, phone, structured, entities)
+    stages = Stages(deadline)
+    try:
+        _run_pipeline(stages, deadline, result, question, image_b64, kb_id,
+                      lang_name, user_conditions, user_id, phone)
+    finally:
+        stages.close()
 
     if not result['answer'] and not result['imageAnalysis']:
         return {'statusCode': 500, 'headers': CORS,
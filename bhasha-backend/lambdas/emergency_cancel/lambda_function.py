@@ -3,6 +3,8 @@ import boto3
 import os
 from datetime import datetime
 
+from shared import records
+
 CORS = {
     'Content-Type': 'application/json',
     'Access-Control-Allow-Origin': '*',
@@ -27,16 +29,12 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'emergencyId is required'})
             }
 
-        dynamodb = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME'])
-        table = dynamodb.Table(os.environ['DYNAMODB_MAIN_TABLE'])
+        table = records.table()
 
         # Mark as cancelled
         now = datetime.utcnow().isoformat()
         table.update_item(
-            Key={
-                'userId': user_id,
-                'recordId': f"emergency#{emergency_id}",
-            },
+            Key=records.key(user_id, 'emergency', emergency_id),
             UpdateExpression='SET #s = :cancelled, cancelledAt = :now',
             ExpressionAttributeNames={'#s': 'status'},
             ExpressionAttributeValues={
@@ -49,12 +47,9 @@ def lambda_handler(event, context):
         # but we log the cancellation so the contact flow can check and stop.
         # The 30-second cancellation window on the frontend handles UX.
 
-        # Notify contacts of cancellation via SNS
-        from boto3.dynamodb.conditions import Attr
-        contacts_response = table.scan(
-            FilterExpression=Attr('userId').eq(user_id) & Attr('recordType').eq('emergency_contact')
-        )
-        contacts = contacts_response.get('Items', [])
+        # Notify contacts of cancellation via SNS — they live on the profile
+        profile = records.get(user_id, 'profile', 'main', attributes=['emergencyContacts']) or {}
+        contacts = profile.get('emergencyContacts', [])
 
         sns = boto3.client('sns', region_name=os.environ['AWS_REGION_NAME'])
         for contact in contacts:
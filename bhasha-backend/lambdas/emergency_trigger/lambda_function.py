@@ -8,6 +8,8 @@ import urllib.error
 import base64
 from datetime import datetime
 
+from shared import writes
+
 CORS = {
     'Content-Type': 'application/json',
     'Access-Control-Allow-Origin': '*',
@@ -16,6 +18,7 @@ CORS = {
 }
 
 
+@writes.flush_on_exit
 def lambda_handler(event, context):
     if event.get('httpMethod') == 'OPTIONS':
         return {'statusCode': 200, 'headers': CORS, 'body': ''}
@@ -32,14 +35,12 @@ def lambda_handler(event, context):
         emergency_id = str(uuid.uuid4())
         now = datetime.utcnow().isoformat()
 
-        dynamodb   = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME'])
-        main_table = dynamodb.Table(os.environ['DYNAMODB_MAIN_TABLE'])
+        main_table_name        = os.environ['DYNAMODB_MAIN_TABLE']
         call_status_table_name = os.environ.get('DYNAMODB_CALL_STATUS_TABLE', '')
-        call_table = dynamodb.Table(call_status_table_name) if call_status_table_name else None
 
-        # ── Save emergency record ─────────────────────────────────────────────
+        # ── Emergency record + call records, written as one batch ─────────────
         # Store location as a JSON string — boto3 DynamoDB doesn't support floats
-        main_table.put_item(Item={
+        emergency_item = {
             'userId':      user_id,
             'recordId':    f"emergency#{emergency_id}",
             'recordType':  'emergency',
@@ -48,7 +49,42 @@ def lambda_handler(event, context):
             'location':    json.dumps(location),
             'status':      'active',
             'createdAt':   now,
-        })
+        }
+        writes.put(main_table_name, emergency_item)
+
+        targets = []
+        for contact in contacts:
+            phone = contact.get('phone', '').strip()
+            if not phone:
+                continue
+            target = {'name': contact.get('name', 'Emergency Contact'), 'phone': phone,
+                      'callId': str(uuid.uuid4())}
+            targets.append(target)
+            # Call record for exoml_applet (only if table configured)
+            if call_status_table_name:
+                writes.put(call_status_table_name, {
+                    'callId':       target['callId'],
+                    'callType':     'emergency',
+                    'emergencyId':  emergency_id,
+                    'userId':       user_id,
+                    'patientName':  patient_name,
+                    'patientPhone': patient_phone,
+                    'contactName':  target['name'],
+                    'contactPhone': phone,
+                    'symptoms':     symptoms,
+                    'location':     json.dumps(location),
+                    'status':       'initiating',
+                    'createdAt':    now,
+                })
+
+        # Flushed before dialling — the applet reads the call record on pickup
+        try:
+            writes.flush()
+        except Exception as db_err:
+            # Call records are best-effort; the emergency record is not
+            print(f'DynamoDB batch write warning: {db_err}')
+            boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME']) \
+                .Table(main_table_name).put_item(Item=emergency_item)
 
         # ── Build location text for messages ──────────────────────────────────
         location_text = location.get('address', 'Unknown location') if isinstance(location, dict) else 'Unknown location'
@@ -60,33 +96,8 @@ def lambda_handler(event, context):
         api_base        = os.environ.get('API_BASE_URL', '').rstrip('/')
         calls_initiated = []
 
-        for contact in contacts:
-            phone = contact.get('phone', '').strip()
-            name  = contact.get('name', 'Emergency Contact')
-            if not phone:
-                continue
-
-            call_id = str(uuid.uuid4())
-
-            # Store call record so exoml_applet can read it (only if table configured)
-            if call_table:
-                try:
-                    call_table.put_item(Item={
-                        'callId':       call_id,
-                        'callType':     'emergency',
-                        'emergencyId':  emergency_id,
-                        'userId':       user_id,
-                        'patientName':  patient_name,
-                        'patientPhone': patient_phone,
-                        'contactName':  name,
-                        'contactPhone': phone,
-                        'symptoms':     symptoms,
-                        'location':     json.dumps(location),
-                        'status':       'initiating',
-                        'createdAt':    now,
-                    })
-                except Exception as db_err:
-                    print(f'DynamoDB write warning for {phone}: {db_err}')
+        for target in targets:
+            phone, name, call_id = target['phone'], target['name'], target['callId']
 
             # Trigger Exotel outbound call (only if all Exotel env vars are set)
             if api_base and os.environ.get('EXOTEL_ACCOUNT_SID'):
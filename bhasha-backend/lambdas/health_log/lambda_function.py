@@ -1,9 +1,9 @@
 import json
-import boto3
-import os
 import uuid
 from datetime import datetime
 
+from shared import records
+
 CORS = {
     'Content-Type': 'application/json',
     'Access-Control-Allow-Origin': '*',
@@ -22,8 +22,7 @@ def lambda_handler(event, context):
         if method == 'GET':
             query_params = event.get('queryStringParameters') or {}
             user_id = query_params.get('userId', 'demo-user-123')
-            limit = int(query_params.get('limit', 50))
-            return get_health_logs(user_id, limit)
+            return get_health_logs(user_id, query_params)
 
         elif method == 'POST':
             body = json.loads(event.get('body', '{}'))
@@ -45,32 +44,29 @@ def lambda_handler(event, context):
         }
 
 
-def get_health_logs(user_id: str, limit: int = 50):
-    dynamodb = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME'])
-    table = dynamodb.Table(os.environ['DYNAMODB_MAIN_TABLE'])
-
-    from boto3.dynamodb.conditions import Attr
-    response = table.scan(
-        FilterExpression=Attr('userId').eq(user_id) & Attr('recordType').eq('health_log'),
-        Limit=limit
-    )
-
-    logs = response.get('Items', [])
-
-    # Sort by timestamp descending (newest first)
-    logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+def get_health_logs(user_id: str, params: dict):
+    """
+    GET /health/logs?userId=&limit=&cursor=&since=&until=
+    Newest first, one page at a time; pass nextCursor back as cursor.
+    """
+    try:
+        logs, next_cursor = records.page(user_id, 'health_log', params, default_limit=50)
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': CORS,
+            'body': json.dumps({'error': str(e)})
+        }
 
     return {
         'statusCode': 200,
         'headers': CORS,
-        'body': json.dumps({'logs': logs, 'count': len(logs)})
+        'body': json.dumps({'logs': logs, 'count': len(logs), 'nextCursor': next_cursor},
+                           default=records.json_default)
     }
 
 
 def create_health_log(body: dict):
-    dynamodb = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME'])
-    table = dynamodb.Table(os.environ['DYNAMODB_MAIN_TABLE'])
-
     log_id = str(uuid.uuid4())
     now = datetime.utcnow().isoformat()
     user_id = body.get('userId', 'demo-user-123')
@@ -81,7 +77,7 @@ def create_health_log(body: dict):
 
     item = {
         'userId': user_id,
-        'recordId': f"log#{log_id}",
+        'recordId': records.record_id('health_log', now, log_id),
         'recordType': 'health_log',
         'logId': log_id,
         'type': body.get('type', 'symptom'),
@@ -97,7 +93,7 @@ def create_health_log(body: dict):
         item['flagged'] = True
         item['flagReason'] = 'High severity symptom logged'
 
-    table.put_item(Item=item)
+    records.table().put_item(Item=item)
 
     return {
         'statusCode': 201,
@@ -4,7 +4,9 @@ medical_history/lambda_function.py
 Medical history CRUD + AI doctor summary.
 
 Routes:
-  GET  /history?userId=xxx                → fetch timeline
+  GET  /history?userId=xxx                → fetch timeline, newest first
+                                            (&limit=&cursor=&since=&until=;
+                                            nextCursor continues the page)
   POST /history                           → add entry (+ optional doc upload)
   POST /history/summary?userId=xxx        → generate doctor-ready AI summary
   DELETE /history?userId=xxx&ts=xxx       → remove one entry
@@ -25,16 +27,17 @@ Env vars:
   DYNAMODB_MAIN_TABLE   — defaults to BhashaAiMain
   S3_BUCKET             — defaults to bhasha-ai-audio-arjit
   BEDROCK_REGION        — defaults to us-east-1
+  WORK_QUEUE_URL        — optional, SQS queue for doc uploads + entry summaries
 """
 
 import json
 import re
 import boto3
 import os
-import base64
 import uuid
 from datetime import datetime, timezone
-from boto3.dynamodb.conditions import Key
+
+from shared import records, work_queue
 
 CORS = {
     'Content-Type': 'application/json',
@@ -53,9 +56,6 @@ SUMMARY_MODEL  = 'us.amazon.nova-pro-v1:0'
 def _dynamo():
     return boto3.resource('dynamodb', region_name=APP_REGION).Table(TABLE_NAME)
 
-def _s3():
-    return boto3.client('s3', region_name=APP_REGION)
-
 def _bedrock():
     return boto3.client('bedrock-runtime', region_name=BEDROCK_REGION)
 
@@ -63,14 +63,13 @@ def _bedrock():
 # ── GET /history ───────────────────────────────────────────────────────────────
 
 def get_history(user_id: str) -> list:
-    table = _dynamo()
-    resp  = table.query(
-        KeyConditionExpression=Key('userId').eq(user_id) & Key('recordId').begins_with('history#'),
-    )
-    items = resp.get('Items', [])
-    # Sort newest first
-    items.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-    return items
+    """The whole timeline, newest first (the doctor summary reads all of it)."""
+    return records.query_all(user_id, 'history', newest_first=True, table_name=TABLE_NAME)
+
+
+def get_history_page(user_id: str, params: dict) -> tuple:
+    """(entries, next_cursor) — one newest-first page; limit / cursor / since / until."""
+    return records.page(user_id, 'history', params, default_limit=50, table_name=TABLE_NAME)
 
 
 # ── Voice field extraction ─────────────────────────────────────────────────────
@@ -149,29 +148,19 @@ def add_entry(body: dict) -> dict:
 
     ts = datetime.now(timezone.utc).isoformat()
 
-    # Upload document to S3 if provided
+    # Document upload runs in the background — the key is decided here so the
+    # entry can reference it straight away
     doc_s3_key = ''
     doc_url    = ''
     if doc_b64:
-        try:
-            # Strip data URL prefix if present
-            if ',' in doc_b64:
-                doc_b64 = doc_b64.split(',', 1)[1]
-            doc_bytes  = base64.b64decode(doc_b64)
-            safe_name  = doc_name.replace(' ', '_')
-            doc_s3_key = f'history/{user_id}/{uuid.uuid4().hex[:8]}_{safe_name}'
-            _s3().put_object(
-                Bucket=S3_BUCKET,
-                Key=doc_s3_key,
-                Body=doc_bytes,
-                ContentType='application/octet-stream',
-            )
-            doc_url = f's3://{S3_BUCKET}/{doc_s3_key}'
-        except Exception as e:
-            print(f'[s3_upload] error (non-fatal): {e}')
-
-    # Generate brief AI summary for this entry
-    ai_summary = generate_entry_summary(condition, year, doctor, hospital, notes, lang)
+        # Strip data URL prefix if present
+        if ',' in doc_b64:
+            doc_b64 = doc_b64.split(',', 1)[1]
+        safe_name  = doc_name.replace(' ', '_')
+        doc_s3_key = f'history/{user_id}/{uuid.uuid4().hex[:8]}_{safe_name}'
+        doc_url    = f's3://{S3_BUCKET}/{doc_s3_key}'
+        work_queue.enqueue('s3.put_object', bucket=S3_BUCKET, key=doc_s3_key,
+                           body_b64=doc_b64, region=APP_REGION)
 
     item = {
         'userId':     user_id,
@@ -184,38 +173,42 @@ def add_entry(body: dict) -> dict:
         'notes':      notes[:1000],
         'docS3Key':   doc_s3_key,
         'docUrl':     doc_url,
-        'aiSummary':  ai_summary,
+        'aiSummary':  fallback_entry_summary(condition, year, doctor),
         'language':   lang,
     }
 
     _dynamo().put_item(Item=item)
+
+    # The AI summary replaces the templated one once the worker gets to it
+    work_queue.enqueue(
+        'bedrock.summarize_into',
+        table=TABLE_NAME, key={'userId': user_id, 'recordId': item['recordId']},
+        attribute='aiSummary',
+        prompt=entry_summary_prompt(condition, year, doctor, hospital, notes, lang),
+        model_id=SUMMARY_MODEL, max_tokens=120,
+        region=APP_REGION, bedrock_region=BEDROCK_REGION,
+    )
     return item
 
 
-def generate_entry_summary(condition, year, doctor, hospital, notes, lang='en') -> str:
-    """Generate a 1-2 sentence AI summary for a single history entry."""
+def entry_summary_prompt(condition, year, doctor, hospital, notes, lang='en') -> str:
+    """Prompt for the 1-2 sentence AI summary of a single history entry."""
     lang_name = {'hi': 'Hindi', 'te': 'Telugu', 'ta': 'Tamil', 'en': 'English',
                  'mr': 'Marathi', 'bn': 'Bengali'}.get(lang, 'English')
-    prompt = (
+    return (
         f'Summarise this health event in 1-2 sentences for a medical record. Reply in {lang_name}.\n'
         f'Condition: {condition}\nYear: {year}\n'
         f'Doctor: {doctor or "unknown"}\nHospital: {hospital or "unknown"}\n'
         f'Notes: {notes or "none"}\n'
         'Be concise and clinical. No disclaimers.'
     )
-    try:
-        resp = _bedrock().converse(
-            modelId=SUMMARY_MODEL,
-            messages=[{'role': 'user', 'content': [{'text': prompt}]}],
-            inferenceConfig={'maxTokens': 120, 'temperature': 0.1},
-        )
-        return resp['output']['message']['content'][0]['text'].strip()
-    except Exception as e:
-        print(f'[entry_summary] error: {e}')
-        parts = [condition]
-        if year:   parts.append(f'({year})')
-        if doctor: parts.append(f'— Dr. {doctor}')
-        return ' '.join(parts)
+
+
+def fallback_entry_summary(condition, year, doctor) -> str:
+    parts = [condition]
+    if year:   parts.append(f'({year})')
+    if doctor: parts.append(f'— Dr. {doctor}')
+    return ' '.join(parts)
 
 
 # ── POST /history/summary ─────────────────────────────────────────────────────
@@ -300,13 +293,18 @@ def lambda_handler(event, context):
     params = event.get('queryStringParameters') or {}
 
     try:
-        # GET /history — fetch timeline
+        # GET /history — fetch timeline (?limit=&cursor=&since=&until=)
         if method == 'GET':
             user_id = params.get('userId', 'anonymous')
-            items   = get_history(user_id)
+            try:
+                items, next_cursor = get_history_page(user_id, params)
+            except ValueError as e:
+                return {'statusCode': 400, 'headers': CORS,
+                        'body': json.dumps({'error': str(e)})}
             return {
                 'statusCode': 200, 'headers': CORS,
-                'body': json.dumps({'entries': items, 'count': len(items)}),
+                'body': json.dumps({'entries': items, 'count': len(items),
+                                    'nextCursor': next_cursor}, default=records.json_default),
             }
 
         # DELETE /history
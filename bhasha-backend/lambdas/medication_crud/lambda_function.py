@@ -1,10 +1,10 @@
 import json
-import boto3
-import os
 import uuid
 from decimal import Decimal
 from datetime import datetime, date
 
+from shared import adherence, records, writes
+
 CORS = {
     'Content-Type': 'application/json',
     'Access-Control-Allow-Origin': '*',
@@ -22,10 +22,15 @@ class DecimalEncoder(json.JSONEncoder):
 
 
 def get_dynamodb_table():
-    region = os.environ.get('AWS_REGION_NAME', os.environ.get('AWS_DEFAULT_REGION', 'ap-south-1'))
-    table_name = os.environ.get('DYNAMODB_MAIN_TABLE', 'BhashaAI_Main')
-    dynamodb = boto3.resource('dynamodb', region_name=region)
-    return dynamodb.Table(table_name)
+    return records.table()
+
+
+def _not_found():
+    return {
+        'statusCode': 404,
+        'headers': CORS,
+        'body': json.dumps({'error': 'Medication not found'})
+    }
 
 
 def lambda_handler(event, context):
@@ -37,8 +42,18 @@ def lambda_handler(event, context):
     path_params = event.get('pathParameters') or {}
 
     try:
+        # GET /medications/adherence?userId=xxx       → aggregates for every medication
+        # GET /medications/{id}/adherence?userId=xxx  → aggregates for one
+        if method == 'GET' and path.rstrip('/').endswith('/adherence'):
+            query_params = event.get('queryStringParameters') or {}
+            user_id = query_params.get('userId', 'demo-user-123')
+            med_id = path_params.get('id') or path.rstrip('/').split('/')[-2]
+            if med_id in ('medications', 'adherence'):
+                med_id = None
+            return get_adherence(user_id, med_id)
+
         # GET /medications?userId=xxx  → list all medications for user
-        if method == 'GET' and '/medications' in path:
+        elif method == 'GET' and '/medications' in path:
             query_params = event.get('queryStringParameters') or {}
             user_id = query_params.get('userId', 'demo-user-123')
             return list_medications(user_id)
@@ -74,14 +89,10 @@ def lambda_handler(event, context):
 
 
 def list_medications(user_id: str):
-    table = get_dynamodb_table()
-    from boto3.dynamodb.conditions import Key, Attr
-
-    response = table.scan(
-        FilterExpression=Attr('userId').eq(user_id) & Attr('recordType').eq('medication')
-    )
-
-    medications = response.get('Items', [])
+    medications = records.query_all(user_id, 'medication', attributes=[
+        'medicationId', 'name', 'dosage', 'times', 'active',
+        'createdAt', 'lastTakenDate', 'lastTakenAt',
+    ])
     today = date.today().isoformat()
 
     # Check if taken today
@@ -104,10 +115,11 @@ def create_medication(body: dict):
 
     med_id = str(uuid.uuid4())
     now = datetime.utcnow().isoformat()
+    today = date.today().isoformat()
 
     item = {
         'userId': body.get('userId', 'demo-user-123'),
-        'recordId': f"med#{med_id}",
+        'recordId': records.record_id('medication', med_id),
         'recordType': 'medication',
         'medicationId': med_id,
         'name': body.get('name', ''),
@@ -115,6 +127,8 @@ def create_medication(body: dict):
         'times': body.get('times', []),
         'active': True,
         'createdAt': now,
+        'adherence': adherence.empty(today),
+        'adherenceVersion': 0,
         # DynamoDB cannot store None — omit lastTakenDate until first taken
     }
 
@@ -131,73 +145,112 @@ def create_medication(body: dict):
     }
 
 
+MARK_TAKEN_ATTEMPTS = 3
+
+
 def mark_taken(med_id: str, body: dict):
-    table = get_dynamodb_table()
     user_id = body.get('userId', 'demo-user-123')
     taken_at = body.get('takenAt', datetime.utcnow().isoformat())
     today = date.today().isoformat()
 
-    # Find the medication record
-    from boto3.dynamodb.conditions import Attr
-    response = table.scan(
-        FilterExpression=Attr('medicationId').eq(med_id) & Attr('userId').eq(user_id)
-    )
-
-    items = response.get('Items', [])
-    if not items:
+    for _ in range(MARK_TAKEN_ATTEMPTS):
+        med = records.get(user_id, 'medication', med_id,
+                          attributes=['times', 'adherence', 'adherenceVersion'])
+        if not med:
+            return _not_found()
+        version = int(med.get('adherenceVersion', 0))
+        state = adherence.record_dose(med.get('adherence'), today,
+                                      adherence.expected_per_day(med.get('times')))
+
+        # The dose, the aggregates and the adherence row land together; the
+        # version condition makes a concurrent dose retry on fresh state
+        try:
+            writes.transact([
+                {'Update': {
+                    'TableName': records.TABLE_NAME,
+                    'Key': records.key(user_id, 'medication', med_id),
+                    'UpdateExpression': (
+                        'SET lastTakenDate = :today, lastTakenAt = :taken_at, '
+                        'adherence = :state, adherenceVersion = :next'
+                    ),
+                    'ConditionExpression': (
+                        'attribute_exists(recordId) AND '
+                        '(adherenceVersion = :version OR attribute_not_exists(adherenceVersion))'
+                    ),
+                    'ExpressionAttributeValues': {
+                        ':today': today, ':taken_at': taken_at, ':state': state,
+                        ':version': version, ':next': version + 1,
+                    },
+                }},
+                {'Put': {
+                    'TableName': records.TABLE_NAME,
+                    'Item': {
+                        'userId': user_id,
+                        'recordId': records.record_id('adherence', med_id, today),
+                        'recordType': 'adherence',
+                        'medicationId': med_id,
+                        'status': 'taken',
+                        'takenAt': taken_at,
+                        'date': today,
+                        'doses': state['counts'][0],
+                    },
+                }},
+            ], region=records.REGION)
+        except writes.ConditionFailed:
+            continue
+        break
+    else:
         return {
-            'statusCode': 404,
+            'statusCode': 409,
             'headers': CORS,
-            'body': json.dumps({'error': 'Medication not found'})
+            'body': json.dumps({'error': 'Medication is being updated, try again'})
         }
 
-    item = items[0]
+    return {
+        'statusCode': 200,
+        'headers': CORS,
+        'body': json.dumps({
+            'message': 'Marked as taken', 'date': today,
+            'adherence': adherence.summary(state, today, med.get('times')),
+        }, cls=DecimalEncoder)
+    }
 
-    # Update the record
-    table.update_item(
-        Key={'userId': item['userId'], 'recordId': item['recordId']},
-        UpdateExpression='SET lastTakenDate = :today, lastTakenAt = :taken_at',
-        ExpressionAttributeValues={':today': today, ':taken_at': taken_at}
-    )
 
-    # Log adherence
-    adherence_table = get_dynamodb_table()
+def get_adherence(user_id: str, med_id: str = None):
+    """Aggregates only — one GetItem (or one projected Query), no history rows."""
+    attributes = ['medicationId', 'name', 'times', 'adherence']
+    if med_id:
+        med = records.get(user_id, 'medication', med_id, attributes=attributes)
+        if not med:
+            return _not_found()
+        meds = [med]
+    else:
+        meds = records.query_all(user_id, 'medication', attributes=attributes)
 
-    adherence_table.put_item(Item={
-        'userId': user_id,
-        'recordId': f"adherence#{med_id}#{today}",
-        'recordType': 'adherence',
-        'medicationId': med_id,
-        'status': 'taken',
-        'takenAt': taken_at,
-        'date': today,
-    })
+    today = date.today().isoformat()
+    result = [{
+        'medicationId': med.get('medicationId'),
+        'name': med.get('name', ''),
+        **adherence.summary(med.get('adherence'), today, med.get('times')),
+    } for med in meds]
 
+    body = {'adherence': result[0]} if med_id else {'adherence': result}
     return {
         'statusCode': 200,
         'headers': CORS,
-        'body': json.dumps({'message': 'Marked as taken', 'date': today})
+        'body': json.dumps(body, cls=DecimalEncoder)
     }
 
 
 def delete_medication(med_id: str, user_id: str):
     table = get_dynamodb_table()
-    from boto3.dynamodb.conditions import Attr
-
-    response = table.scan(
-        FilterExpression=Attr('medicationId').eq(med_id) & Attr('userId').eq(user_id)
-    )
-
-    items = response.get('Items', [])
-    if not items:
-        return {
-            'statusCode': 404,
-            'headers': CORS,
-            'body': json.dumps({'error': 'Medication not found'})
-        }
-
-    item = items[0]
-    table.delete_item(Key={'userId': item['userId'], 'recordId': item['recordId']})
+    try:
+        table.delete_item(
+            Key=records.key(user_id, 'medication', med_id),
+            ConditionExpression='attribute_exists(recordId)',
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return _not_found()
 
     return {
         'statusCode': 200,
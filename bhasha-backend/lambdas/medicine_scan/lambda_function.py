@@ -3,6 +3,8 @@ import boto3
 import os
 import base64
 
+from shared import prompt_cache
+
 CORS = {
     'Content-Type': 'application/json',
     'Access-Control-Allow-Origin': '*',
@@ -101,7 +103,7 @@ def scan_prescription(image_b64: str, image_type: str, user_conditions: list):
 
         response = bedrock.converse(
             modelId=MODEL_ID,
-            system=[{'text': VISION_SYSTEM_PROMPT}],
+            system=prompt_cache.cached_system(VISION_SYSTEM_PROMPT),
             messages=[
                 {
                     'role': 'user',
@@ -124,6 +126,7 @@ def scan_prescription(image_b64: str, image_type: str, user_conditions: list):
             }
         )
 
+        prompt_cache.record_usage('medicine_scan.vision', response)
         raw_text = response['output']['message']['content'][0]['text'].strip()
 
         # Parse JSON from response
@@ -14,7 +14,7 @@ Memory Layer (DynamoDB):
 
 Routes:
   POST /multi-agent         — run full pipeline
-  GET  /multi-agent/history — past consultations (?userId=)
+  GET  /multi-agent/history — past consultations (?userId=&limit=&cursor=&since=&until=)
 
 POST body:
 {
@@ -32,6 +32,12 @@ Env vars:
   APP_REGION           — defaults to ap-south-1
   BEDROCK_REGION       — defaults to us-east-1
   GOOGLE_MAPS_API_KEY  — optional, improves hospital search
+  WORK_QUEUE_URL       — optional, SQS queue for background writes (shared/work_queue.py)
+
+Every network stage runs against the invocation deadline (shared/deadline.py).
+Stages that run out of time fall back to degraded output — fallback diagnosis,
+hospitals cached in this container, templated ranking — and are listed in the
+response under `degraded`.
 """
 
 import json
@@ -39,11 +45,15 @@ import boto3
 import os
 import base64
 import math
+import time
 import urllib.request
 import urllib.parse
 from datetime import datetime, timezone
 from boto3.dynamodb.conditions import Key
 
+from shared import circuit, gazetteer, ner, prompt_cache, records, work_queue
+from shared.deadline import Deadline, boto_config
+
 # ── Config ─────────────────────────────────────────────────────────────────────
 
 CORS = {
@@ -76,66 +86,75 @@ LANG_MAP = {
 
 # ── AWS clients ────────────────────────────────────────────────────────────────
 
-def _bedrock():
-    return boto3.client('bedrock-runtime', region_name=BEDROCK_REGION)
+def _bedrock(timeout: float = None):
+    return boto3.client('bedrock-runtime', region_name=BEDROCK_REGION,
+                        config=boto_config(timeout) if timeout else None)
 
-def _comprehend():
-    return boto3.client('comprehendmedical', region_name=BEDROCK_REGION)
+def _comprehend(timeout: float = None):
+    return boto3.client('comprehendmedical', region_name=BEDROCK_REGION,
+                        config=boto_config(timeout) if timeout else None)
 
 def _dynamo():
     return boto3.resource('dynamodb', region_name=APP_REGION).Table(TABLE_NAME)
 
+def _ner_client(deadline: Deadline):
+    """Comprehend client bounded by the deadline — only built on a NER cache miss."""
+    timeout = deadline.budget(0.15, cap=5)
+    if timeout is None:
+        raise TimeoutError('no time left')
+    return _comprehend(timeout)
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # AGENT 1 — Diagnosis
 # ═══════════════════════════════════════════════════════════════════════════════
 
 def diagnose_agent(symptoms: str, user_conditions: list,
-                   image_b64: str = None, lang: str = 'en') -> dict:
+                   image_b64: str = None, lang: str = 'en',
+                   deadline: Deadline = None) -> dict:
     """
     Runs Comprehend Medical NER + optional image analysis + Nova Pro structured
-    clinical reasoning.
+    clinical reasoning. Each step gets its share of the remaining deadline;
+    skipped steps are recorded on the deadline.
     Returns: condition, severity, specialty_needed, urgency, red_flags,
              action_steps, questions_for_doctor, entities, image_context
     """
-    # Step A: Comprehend Medical NER
-    entities = {'symptoms': [], 'conditions': [], 'medications': [], 'body_parts': []}
+    deadline = deadline or Deadline.from_context(None)
+
+    # Step A: Comprehend Medical NER (cached by text — shared/ner.py)
+    entities = {'symptoms': [], 'conditions': [], 'medications': [], 'body_parts': [], 'durations': []}
     try:
-        resp = _comprehend().detect_entities_v2(Text=symptoms[:20000])
-        for e in resp.get('Entities', []):
-            if e.get('Score', 0) < 0.6:
-                continue
-            cat, val = e.get('Category', ''), e.get('Text', '')
-            if   cat == 'SIGN_OR_SYMPTOM':    entities['symptoms'].append(val)
-            elif cat == 'MEDICAL_CONDITION':  entities['conditions'].append(val)
-            elif cat == 'MEDICATION':         entities['medications'].append(val)
-            elif cat == 'ANATOMY':            entities['body_parts'].append(val)
-        # Deduplicate
-        for k in entities:
-            entities[k] = list(dict.fromkeys(entities[k]))
+        entities = ner.detect_entities(symptoms, lambda: _ner_client(deadline))
     except Exception as e:
         print(f'[comprehend] error (non-fatal): {e}')
+        deadline.degrade('comprehend', str(e))
+        entities = gazetteer.extract(symptoms)
 
     # Step B: Image analysis if provided
     image_context = ''
     if image_b64:
         try:
+            timeout = deadline.budget(0.25, cap=12, floor=2)
+            if timeout is None:
+                raise TimeoutError('no time left')
             img, fmt = image_b64, 'jpeg'
             if img.startswith('data:'):
                 header, img = img.split(',', 1)
                 if 'png' in header:  fmt = 'png'
                 elif 'webp' in header: fmt = 'webp'
-            resp = _bedrock().converse(
-                modelId=VISION_MODEL,
-                messages=[{'role': 'user', 'content': [
-                    {'image': {'format': fmt, 'source': {'bytes': base64.b64decode(img)}}},
-                    {'text': 'Analyze this medical image in 2-3 concise clinical sentences. Note any visible abnormalities, skin conditions, or relevant findings.'},
-                ]}],
-                inferenceConfig={'maxTokens': 350, 'temperature': 0.2},
-            )
+            with circuit.guard(f'bedrock:{VISION_MODEL}'):
+                resp = _bedrock(timeout).converse(
+                    modelId=VISION_MODEL,
+                    messages=[{'role': 'user', 'content': [
+                        {'image': {'format': fmt, 'source': {'bytes': base64.b64decode(img)}}},
+                        {'text': 'Analyze this medical image in 2-3 concise clinical sentences. Note any visible abnormalities, skin conditions, or relevant findings.'},
+                    ]}],
+                    inferenceConfig={'maxTokens': 350, 'temperature': 0.2},
+                )
             image_context = resp['output']['message']['content'][0]['text']
         except Exception as e:
             print(f'[vision] error (non-fatal): {e}')
+            deadline.degrade('vision', str(e))
 
     # Step C: Nova Pro structured clinical reasoning
     lang_name  = LANG_MAP.get(lang, 'English')
@@ -164,11 +183,15 @@ def diagnose_agent(symptoms: str, user_conditions: list,
 
     raw = ''
     try:
-        resp = _bedrock().converse(
-            modelId=SYNTHESIS_MODEL,
-            messages=[{'role': 'user', 'content': [{'text': prompt}]}],
-            inferenceConfig={'maxTokens': 700, 'temperature': 0.1},
-        )
+        timeout = deadline.budget(0.5, cap=15, floor=2)
+        if timeout is None:
+            raise TimeoutError('no time left')
+        with circuit.guard(f'bedrock:{SYNTHESIS_MODEL}'):
+            resp = _bedrock(timeout).converse(
+                modelId=SYNTHESIS_MODEL,
+                messages=[{'role': 'user', 'content': [{'text': prompt}]}],
+                inferenceConfig={'maxTokens': 700, 'temperature': 0.1},
+            )
         raw = resp['output']['message']['content'][0]['text'].strip()
         if '```json' in raw: raw = raw.split('```json')[1].split('```')[0].strip()
         elif '```' in raw:   raw = raw.split('```')[1].split('```')[0].strip()
@@ -178,6 +201,7 @@ def diagnose_agent(symptoms: str, user_conditions: list,
         return result
     except Exception as e:
         print(f'[diagnose_agent] error: {e} | raw: {raw[:200]}')
+        deadline.degrade('diagnosis', str(e))
         return {
             'condition':            'Requires doctor evaluation',
             'severity':             'moderate',
@@ -227,22 +251,49 @@ CONDITION_TO_SPECIALTY = {
 }
 
 
-def hospital_agent(specialty: str, lat: float, lng: float, urgency: str = 'routine') -> dict:
+# Last successful searches in this container, keyed by rounded location
+# (~1 km). Served when the live search runs out of time.
+HOSPITAL_CACHE_TTL_S = 6 * 3600
+_hospital_cache = {}
+
+
+def _cache_key(lat: float, lng: float) -> tuple:
+    return (round(lat, 2), round(lng, 2))
+
+
+def _cached_hospitals(lat: float, lng: float) -> list:
+    hit = _hospital_cache.get(_cache_key(lat, lng))
+    if hit and time.time() - hit[0] < HOSPITAL_CACHE_TTL_S:
+        return hit[1]
+    return []
+
+
+def hospital_agent(specialty: str, lat: float, lng: float, urgency: str = 'routine',
+                   deadline: Deadline = None) -> dict:
     """
     Searches for hospitals/clinics matching the given specialty near the user.
     Emergency cases use a tighter radius (5km) to find the fastest option.
+    Falls back to this container's cached results when the deadline runs out.
     Returns: { hospitals: [...], specialty, count, radius_km }
     """
+    deadline = deadline or Deadline.from_context(None)
     radius_m = 5000 if urgency == 'emergency' else 10000
     hospitals = []
 
     # Try Google Places if key available — better quality, includes ratings + phone
     if GOOGLE_KEY:
-        hospitals = _google_search(lat, lng, radius_m, specialty)
+        hospitals = _google_search(lat, lng, radius_m, specialty, deadline)
 
     # Fallback: OpenStreetMap Overpass
     if not hospitals:
-        hospitals = _overpass_search(lat, lng, radius_m)
+        hospitals = _overpass_search(lat, lng, radius_m, deadline)
+
+    if hospitals:
+        _hospital_cache[_cache_key(lat, lng)] = (time.time(), hospitals)
+    else:
+        hospitals = _cached_hospitals(lat, lng)
+        if hospitals:
+            deadline.degrade('hospital_search', f'served {len(hospitals)} cached results')
 
     # For emergency: prioritise 24/7 hospitals
     if urgency == 'emergency':
@@ -258,7 +309,11 @@ def hospital_agent(specialty: str, lat: float, lng: float, urgency: str = 'routi
     }
 
 
-def _google_search(lat, lng, radius_m, specialty):
+def _google_search(lat, lng, radius_m, specialty, deadline: Deadline):
+    timeout = deadline.budget(0.3, cap=8)
+    if timeout is None:
+        deadline.degrade('google_places', 'no time left')
+        return []
     keyword = urllib.parse.quote(f'{specialty} doctor clinic hospital')
     url = (
         f'https://maps.googleapis.com/maps/api/place/nearbysearch/json'
@@ -266,10 +321,12 @@ def _google_search(lat, lng, radius_m, specialty):
         f'&type=doctor|hospital&rankby=prominence&key={GOOGLE_KEY}'
     )
     try:
-        with urllib.request.urlopen(url, timeout=8) as r:
-            data = json.loads(r.read().decode())
+        with circuit.guard('google_places'):
+            with urllib.request.urlopen(url, timeout=timeout) as r:
+                data = json.loads(r.read().decode())
     except Exception as e:
         print(f'[google_places] error: {e}')
+        deadline.degrade('google_places', str(e))
         return []
 
     results = []
@@ -278,14 +335,17 @@ def _google_search(lat, lng, radius_m, specialty):
         plng = place['geometry']['location']['lng']
         pid  = place.get('place_id', '')
         phone = ''
-        if pid:
+        # Phone lookups are extras — stop making them once time runs short
+        detail_timeout = deadline.budget(0.1, cap=6)
+        if pid and detail_timeout:
             try:
                 det = (
                     f'https://maps.googleapis.com/maps/api/place/details/json'
                     f'?place_id={pid}&fields=formatted_phone_number&key={GOOGLE_KEY}'
                 )
-                with urllib.request.urlopen(det, timeout=6) as r:
-                    phone = json.loads(r.read().decode()).get('result', {}).get('formatted_phone_number', '')
+                with circuit.guard('google_places'):
+                    with urllib.request.urlopen(det, timeout=detail_timeout) as r:
+                        phone = json.loads(r.read().decode()).get('result', {}).get('formatted_phone_number', '')
             except Exception:
                 pass
         results.append({
@@ -305,9 +365,13 @@ def _google_search(lat, lng, radius_m, specialty):
     return results
 
 
-def _overpass_search(lat, lng, radius_m):
+def _overpass_search(lat, lng, radius_m, deadline: Deadline):
+    timeout = deadline.budget(0.5, cap=16, floor=2)
+    if timeout is None:
+        deadline.degrade('overpass', 'no time left')
+        return []
     query = (
-        f'[out:json][timeout:18];'
+        f'[out:json][timeout:{int(timeout)}];'
         f'(node["amenity"~"^(hospital|clinic|doctors)$"](around:{radius_m},{lat},{lng});'
         f'way["amenity"~"^(hospital|clinic|doctors)$"](around:{radius_m},{lat},{lng});'
         f'node["healthcare"~"^(hospital|clinic|centre|doctor)$"](around:{radius_m},{lat},{lng});'
@@ -319,10 +383,12 @@ def _overpass_search(lat, lng, radius_m):
             'https://overpass-api.de/api/interpreter', data=enc,
             headers={'User-Agent': 'BhashaAI/1.0'}, method='POST',
         )
-        with urllib.request.urlopen(req, timeout=16) as r:
-            data = json.loads(r.read().decode())
+        with circuit.guard('overpass'):
+            with urllib.request.urlopen(req, timeout=timeout) as r:
+                data = json.loads(r.read().decode())
     except Exception as e:
         print(f'[overpass] error: {e}')
+        deadline.degrade('overpass', str(e))
         return []
 
     results, seen = [], set()
@@ -368,13 +434,31 @@ def _haversine(lat1, lng1, lat2, lng2):
 # AGENT 3 — Hospital Ranker + Visit Prep
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def _templated_ranking(hospitals: list, diagnosis: dict) -> dict:
+    """Distance-ordered ranking used when Nova Pro is unavailable or out of time."""
+    return {
+        'recommended_hospital': hospitals[0],
+        'ranked_list':          hospitals[:5],
+        'ranking_reason':       'Closest available hospital for your condition.',
+        'visit_prep': {
+            'urgency_note':     diagnosis.get('urgency_reason', ''),
+            'questions_to_ask': diagnosis.get('questions_for_doctor', []),
+            'what_to_bring':    ['Government ID (Aadhaar)', 'Previous prescriptions', 'Insurance card'],
+            'transport_tip':    '',
+        },
+    }
+
+
 def ranker_agent(hospitals: list, diagnosis: dict,
-                 past_visit: dict, lang: str = 'en') -> dict:
+                 past_visit: dict, lang: str = 'en',
+                 deadline: Deadline = None) -> dict:
     """
     Uses Nova Pro to intelligently rank hospitals for the patient's specific
-    condition and generate a tailored visit preparation guide.
+    condition and generate a tailored visit preparation guide. Falls back to
+    the templated (nearest-first) ranking when the deadline runs out.
     Returns: { recommended_hospital, ranked_list, ranking_reason, visit_prep }
     """
+    deadline = deadline or Deadline.from_context(None)
     if not hospitals:
         return {
             'recommended_hospital': None,
@@ -428,11 +512,15 @@ def ranker_agent(hospitals: list, diagnosis: dict,
 
     raw = ''
     try:
-        resp = _bedrock().converse(
-            modelId=SYNTHESIS_MODEL,
-            messages=[{'role': 'user', 'content': [{'text': prompt}]}],
-            inferenceConfig={'maxTokens': 700, 'temperature': 0.1},
-        )
+        timeout = deadline.budget(0.6, cap=15, floor=2)
+        if timeout is None:
+            raise TimeoutError('no time left')
+        with circuit.guard(f'bedrock:{SYNTHESIS_MODEL}'):
+            resp = _bedrock(timeout).converse(
+                modelId=SYNTHESIS_MODEL,
+                messages=[{'role': 'user', 'content': [{'text': prompt}]}],
+                inferenceConfig={'maxTokens': 700, 'temperature': 0.1},
+            )
         raw = resp['output']['message']['content'][0]['text'].strip()
         if '```json' in raw: raw = raw.split('```json')[1].split('```')[0].strip()
         elif '```' in raw:   raw = raw.split('```')[1].split('```')[0].strip()
@@ -455,17 +543,8 @@ def ranker_agent(hospitals: list, diagnosis: dict,
         }
     except Exception as e:
         print(f'[ranker_agent] error: {e} | raw: {raw[:200]}')
-        return {
-            'recommended_hospital': hospitals[0],
-            'ranked_list':          hospitals[:5],
-            'ranking_reason':       'Closest available hospital for your condition.',
-            'visit_prep': {
-                'urgency_note':     diagnosis.get('urgency_reason', ''),
-                'questions_to_ask': diagnosis.get('questions_for_doctor', []),
-                'what_to_bring':    ['Government ID (Aadhaar)', 'Previous prescriptions', 'Insurance card'],
-                'transport_tip':    '',
-            },
-        }
+        deadline.degrade('ranker', str(e))
+        return _templated_ranking(hospitals, diagnosis)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -526,27 +605,25 @@ def find_return_visit(past: list, specialty: str) -> dict:
 
 def save_consultation(user_id: str, symptoms: str, diagnosis: dict,
                       recommended_hospital: dict, lang: str):
-    try:
-        ts = datetime.now(timezone.utc).isoformat()
-        item = {
-            'userId':              user_id,
-            'recordId':            f'consult#{ts}',
-            'timestamp':           ts,
-            'symptoms':            symptoms[:500],
-            'diagnosedCondition':  diagnosis.get('condition', ''),
-            'specialtyNeeded':     diagnosis.get('specialty_needed', ''),
-            'urgency':             diagnosis.get('urgency', 'routine'),
-            'language':            lang,
-            'consultType':         'multi_agent',
-        }
-        if recommended_hospital:
-            item['recommendedHospital'] = recommended_hospital.get('name', '')
-            item['hospitalPhone']       = recommended_hospital.get('phone', '')
-            item['hospitalLat']         = str(recommended_hospital.get('lat', ''))
-            item['hospitalLng']         = str(recommended_hospital.get('lng', ''))
-        _dynamo().put_item(Item=item)
-    except Exception as e:
-        print(f'[save_consultation] error (non-fatal): {e}')
+    """Queue the consultation write — the response never depends on it."""
+    ts = datetime.now(timezone.utc).isoformat()
+    item = {
+        'userId':              user_id,
+        'recordId':            f'consult#{ts}',
+        'timestamp':           ts,
+        'symptoms':            symptoms[:500],
+        'diagnosedCondition':  diagnosis.get('condition', ''),
+        'specialtyNeeded':     diagnosis.get('specialty_needed', ''),
+        'urgency':             diagnosis.get('urgency', 'routine'),
+        'language':            lang,
+        'consultType':         'multi_agent',
+    }
+    if recommended_hospital:
+        item['recommendedHospital'] = recommended_hospital.get('name', '')
+        item['hospitalPhone']       = recommended_hospital.get('phone', '')
+        item['hospitalLat']         = str(recommended_hospital.get('lat', ''))
+        item['hospitalLng']         = str(recommended_hospital.get('lng', ''))
+    work_queue.enqueue('ddb.put_item', table=TABLE_NAME, item=item, region=APP_REGION)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -620,13 +697,30 @@ TOOLS = [
 ]
 
 
+# Static orchestrator prompt — cached together with TOOLS; the reply language
+# goes after the checkpoint.
+ORCHESTRATOR_SYSTEM_PROMPT = (
+    'You are a compassionate medical AI orchestrator.\n\n'
+    'Your job: help the patient find the right doctor for their symptoms.\n\n'
+    'Follow this sequence STRICTLY:\n'
+    '1. Call diagnose_symptoms → analyze what the patient has\n'
+    '2. Call find_hospitals → search for the right specialist nearby\n'
+    '3. Call rank_hospitals → pick the best option and prepare the patient\n\n'
+    'After all 3 tools complete, write a warm, clear 2-3 sentence summary '
+    'telling the patient what you found and what they should do next.\n'
+    'Be empathetic. Avoid medical jargon. Mention urgency clearly if needed.'
+)
+
+
 def run_orchestrator(symptoms: str, image_b64, lat: float, lng: float,
                      lang: str, user_conditions: list,
-                     past_consultations: list) -> dict:
+                     past_consultations: list, deadline: Deadline) -> dict:
     """
     Claude Sonnet tool_use agentic loop.
     Claude decides which agents to call and in what order, interprets
     results, and synthesizes a warm, empathetic final response.
+    If the deadline cannot cover another turn, the remaining agents run
+    directly in fixed order and the summary is templated.
     """
     lang_name = LANG_MAP.get(lang, 'English')
 
@@ -634,6 +728,7 @@ def run_orchestrator(symptoms: str, image_b64, lat: float, lng: float,
     state = {
         'diagnosis': None,
         'hospitals': [],
+        'searched':  False,
         'ranked':    None,
         'past_visit': {'found': False},
         'orchestrator_summary': '',
@@ -653,18 +748,6 @@ def run_orchestrator(symptoms: str, image_b64, lat: float, lng: float,
         except Exception:
             pass
 
-    system = (
-        f'You are a compassionate medical AI orchestrator. Reply in {lang_name}.\n\n'
-        'Your job: help the patient find the right doctor for their symptoms.\n\n'
-        'Follow this sequence STRICTLY:\n'
-        '1. Call diagnose_symptoms → analyze what the patient has\n'
-        '2. Call find_hospitals → search for the right specialist nearby\n'
-        '3. Call rank_hospitals → pick the best option and prepare the patient\n\n'
-        'After all 3 tools complete, write a warm, clear 2-3 sentence summary '
-        'telling the patient what you found and what they should do next.\n'
-        'Be empathetic. Avoid medical jargon. Mention urgency clearly if needed.'
-    )
-
     messages = [{
         'role':    'user',
         'content': [{'text': f'Patient symptoms: {symptoms}{memory_ctx}'}],
@@ -672,14 +755,27 @@ def run_orchestrator(symptoms: str, image_b64, lat: float, lng: float,
 
     turns = 0
     while turns < MAX_AGENT_TURNS:
+        # A turn must leave room for the tool it is about to call
+        timeout = deadline.budget(0.4, cap=25, floor=3)
+        if timeout is None:
+            deadline.degrade('orchestrator', f'no time left for turn {turns + 1}')
+            break
         turns += 1
-        resp = _bedrock().converse(
-            modelId=ORCHESTRATOR_MODEL,
-            system=[{'text': system}],
-            tools=TOOLS,
-            messages=messages,
-            inferenceConfig={'maxTokens': 1200, 'temperature': 0.2},
-        )
+        try:
+            with circuit.guard(f'bedrock:{ORCHESTRATOR_MODEL}'):
+                resp = _bedrock(timeout).converse(
+                    modelId=ORCHESTRATOR_MODEL,
+                    system=prompt_cache.cached_system(ORCHESTRATOR_SYSTEM_PROMPT, f'Reply in {lang_name}.',
+                                                      model_id=ORCHESTRATOR_MODEL, tools=TOOLS),
+                    toolConfig={'tools': prompt_cache.cached_tools(TOOLS, ORCHESTRATOR_MODEL)},
+                    messages=messages,
+                    inferenceConfig={'maxTokens': 1200, 'temperature': 0.2},
+                )
+        except Exception as e:
+            print(f'[orchestrator] turn {turns} failed: {e}')
+            deadline.degrade('orchestrator', str(e))
+            break
+        prompt_cache.record_usage('multi_agent.orchestrator', resp)
 
         stop_reason = resp['stopReason']
         out_msg     = resp['output']['message']
@@ -687,17 +783,17 @@ def run_orchestrator(symptoms: str, image_b64, lat: float, lng: float,
 
         if stop_reason == 'end_turn':
             state['orchestrator_summary'] = ' '.join(
-                b.get('text', '') for b in out_msg['content']
-                if b.get('type') == 'text'
+                b['text'] for b in out_msg['content'] if 'text' in b
             ).strip()
             break
 
         if stop_reason == 'tool_use':
             tool_results = []
             for block in out_msg['content']:
-                if block.get('type') != 'toolUse':
+                if 'toolUse' not in block:
                     continue
-                name, inp, use_id = block['name'], block['input'], block['toolUseId']
+                tool = block['toolUse']
+                name, inp, use_id = tool['name'], tool.get('input', {}), tool['toolUseId']
 
                 # ── Execute agent ──────────────────────────────────────────
                 if name == 'diagnose_symptoms':
@@ -706,6 +802,7 @@ def run_orchestrator(symptoms: str, image_b64, lat: float, lng: float,
                         inp.get('user_conditions', user_conditions),
                         image_b64,
                         lang,
+                        deadline,
                     )
                     state['diagnosis'] = diag
                     # Check memory for return visit after we know the specialty
@@ -727,8 +824,10 @@ def run_orchestrator(symptoms: str, image_b64, lat: float, lng: float,
                         inp.get('specialty', diag.get('specialty_needed', 'General Physician')),
                         lat, lng,
                         inp.get('urgency', diag.get('urgency', 'routine')),
+                        deadline,
                     )
                     state['hospitals'] = result.get('hospitals', [])
+                    state['searched']  = True
                     tool_output = {
                         'hospitals_found': len(state['hospitals']),
                         'top_3': [
@@ -753,7 +852,7 @@ def run_orchestrator(symptoms: str, image_b64, lat: float, lng: float,
                         'specialty_needed':     inp.get('specialty', diag.get('specialty_needed', '')),
                         'questions_for_doctor': diag.get('questions_for_doctor', []),
                         'urgency_reason':       diag.get('urgency_reason', ''),
-                    }, state['past_visit'], lang)
+                    }, state['past_visit'], lang, deadline)
                     state['ranked'] = ranked
                     rec = ranked.get('recommended_hospital') or {}
                     tool_output = {
@@ -773,9 +872,44 @@ def run_orchestrator(symptoms: str, image_b64, lat: float, lng: float,
 
             messages.append({'role': 'user', 'content': tool_results})
 
+    if state['ranked'] is None or not state['orchestrator_summary']:
+        _complete_pipeline(state, symptoms, image_b64, lat, lng, lang,
+                           user_conditions, past_consultations, deadline)
     return state
 
 
+def _complete_pipeline(state: dict, symptoms: str, image_b64, lat: float, lng: float,
+                       lang: str, user_conditions: list, past_consultations: list,
+                       deadline: Deadline):
+    """Run the agents the orchestrator never reached, then template a summary."""
+    if state['diagnosis'] is None:
+        state['diagnosis']  = diagnose_agent(symptoms, user_conditions, image_b64, lang, deadline)
+        state['past_visit'] = find_return_visit(
+            past_consultations, state['diagnosis'].get('specialty_needed', '')
+        )
+    diag = state['diagnosis']
+
+    if not state['searched']:
+        result = hospital_agent(diag.get('specialty_needed', 'General Physician'),
+                                lat, lng, diag.get('urgency', 'routine'), deadline)
+        state['hospitals'] = result.get('hospitals', [])
+        state['searched']  = True
+
+    if state['ranked'] is None:
+        state['ranked'] = ranker_agent(state['hospitals'], diag, state['past_visit'], lang, deadline)
+
+    if not state['orchestrator_summary']:
+        rec = state['ranked'].get('recommended_hospital')
+        summary = (
+            f'Your symptoms most likely point to {diag.get("condition", "a condition that needs evaluation")}. '
+            f'Please see a {diag.get("specialty_needed", "General Physician")} '
+            f'({diag.get("urgency", "routine")}).'
+        )
+        if rec:
+            summary += f' Suggested: {rec["name"]} ({rec["distance_km"]} km away).'
+        state['orchestrator_summary'] = summary
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # Lambda handler
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -787,14 +921,19 @@ def lambda_handler(event, context):
     method = event.get('httpMethod', 'POST')
     params = event.get('queryStringParameters') or {}
 
-    # GET /multi-agent/history
+    # GET /multi-agent/history (?limit=&cursor=&since=&until=)
     if method == 'GET':
         user_id = params.get('userId', 'anonymous')
-        past    = get_past_consultations(user_id, limit=10)
+        try:
+            past, next_cursor = records.page(user_id, 'consult', params,
+                                             default_limit=10, table_name=TABLE_NAME)
+        except ValueError as e:
+            return {'statusCode': 400, 'headers': CORS,
+                    'body': json.dumps({'error': str(e)})}
         # Serialize Decimal values from DynamoDB
-        clean = json.loads(json.dumps(past, default=str))
         return {'statusCode': 200, 'headers': CORS,
-                'body': json.dumps({'consultations': clean})}
+                'body': json.dumps({'consultations': past, 'nextCursor': next_cursor},
+                                   default=str)}
 
     if method != 'POST':
         return {'statusCode': 405, 'headers': CORS,
@@ -818,12 +957,14 @@ def lambda_handler(event, context):
         return {'statusCode': 400, 'headers': CORS,
                 'body': json.dumps({'error': 'Provide symptoms text or an image'})}
 
+    deadline = Deadline.from_context(context)
+
     # 1. Load memory (non-blocking — past consultations for return-visit detection)
     past_consultations = get_past_consultations(user_id)
 
     # 2. Run agentic orchestration
     state = run_orchestrator(
-        symptoms, image_b64, lat, lng, lang, user_conditions, past_consultations
+        symptoms, image_b64, lat, lng, lang, user_conditions, past_consultations, deadline
     )
 
     diagnosis = state.get('diagnosis') or {}
@@ -832,7 +973,7 @@ def lambda_handler(event, context):
     hospitals = state.get('hospitals', [])
     rec_hosp  = ranked.get('recommended_hospital')
 
-    # 3. Persist this consultation to memory
+    # 3. Persist this consultation to memory (background queue)
     save_consultation(user_id, symptoms, diagnosis, rec_hosp or {}, lang)
 
     # 4. Build clean response
@@ -867,6 +1008,7 @@ def lambda_handler(event, context):
             'past_consultations_count': len(past_consultations),
             'return_visit_suggested':   past_v.get('found', False),
         },
+        'degraded':    deadline.degraded,
     }
 
     return {
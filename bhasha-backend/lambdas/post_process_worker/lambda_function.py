@@ -0,0 +1,27 @@
+"""
+post_process_worker/lambda_function.py
+
+Consumer for the background work queue (shared/work_queue.py).
+Triggered by the bhasha-post-process SQS queue with ReportBatchItemFailures,
+so a failing task is retried on its own and, after maxReceiveCount receives,
+lands in the bhasha-post-process-dlq dead-letter queue.
+
+Tasks (shared/tasks.py):
+  ddb.put_item / ddb.put_items  — consultation, health-log, conversation writes
+  sns.sms                       — deep-analysis SMS summary
+  s3.put_object                 — medical-history document uploads
+  bedrock.summarize_into        — medical-history AI entry summaries
+
+Locally, drain the sqlite/memory stand-in instead:
+  cd bhasha-backend/lambdas && WORK_QUEUE_BACKEND=sqlite python -m shared.work_queue drain
+"""
+
+from shared import tasks  # noqa: F401 — registers the built-in tasks
+from shared import work_queue
+
+
+def lambda_handler(event, context):
+    result = work_queue.handle_sqs_event(event)
+    total  = len(event.get('Records', []))
+    print(f'[post_process_worker] processed={total} failed={len(result["batchItemFailures"])}')
+    return result
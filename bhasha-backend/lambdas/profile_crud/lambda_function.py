@@ -1,15 +1,50 @@
+"""
+profile_crud/lambda_function.py
+
+GET    /profile?userId=xxx   → profile, with an ETag; If-None-Match → 304
+POST   /profile              → upsert (one UpdateItem)
+DELETE /profile?userId=xxx
+
+Every write is a single UpdateItem: createdAt is set with if_not_exists and
+`version` is incremented atomically, so concurrent saves never lose the
+creation time and every saved state gets a new version. The ETag is derived
+from that version, so a client holding the current profile gets an empty
+304 instead of the payload.
+
+Every read first fetches just version and createdAt (a projected GetItem),
+so saves handled by any container are seen at once. A matching
+If-None-Match is answered 304 from those two attributes alone. Otherwise
+the full profile comes from a small in-container cache when it holds that
+exact version, or from a second, full GetItem. The cache can never serve
+a stale profile or ETag; PROFILE_CACHE_TTL_S only bounds how long an
+unused entry is kept.
+
+Env vars:
+  DYNAMODB_MAIN_TABLE  — main table
+  AWS_REGION_NAME      — table region
+  PROFILE_CACHE_TTL_S  — seconds an unused cached profile is kept (default 300; 0 disables)
+"""
+
 import json
-import boto3
 import os
 from datetime import datetime
 
+from shared import records
+from shared.cache import TieredCache, content_key
+
+CACHE_TTL_S = float(os.environ.get('PROFILE_CACHE_TTL_S', '300'))
+
 CORS = {
     'Content-Type': 'application/json',
     'Access-Control-Allow-Origin': '*',
-    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization,If-None-Match',
     'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
+    'Access-Control-Expose-Headers': 'ETag',
 }
 
+# Local tier only — profiles are per-user and must not outlive their TTL anywhere
+_profiles = TieredCache('profile', CACHE_TTL_S, max_items=512, table_name='')
+
 
 def lambda_handler(event, context):
     if event.get('httpMethod') == 'OPTIONS':
@@ -21,7 +56,7 @@ def lambda_handler(event, context):
         if method == 'GET':
             query_params = event.get('queryStringParameters') or {}
             user_id = query_params.get('userId', 'demo-user-123')
-            return get_profile(user_id)
+            return get_profile(user_id, _header(event, 'If-None-Match'))
 
         elif method in ('POST', 'PUT'):
             body = json.loads(event.get('body', '{}'))
@@ -48,43 +83,69 @@ def lambda_handler(event, context):
         }
 
 
-def get_profile(user_id: str):
-    dynamodb = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME'])
-    table = dynamodb.Table(os.environ['DYNAMODB_MAIN_TABLE'])
+def _header(event: dict, name: str) -> str:
+    headers = event.get('headers') or {}
+    return next((v for k, v in headers.items() if k.lower() == name.lower()), '') or ''
 
-    response = table.get_item(
-        Key={
-            'userId': user_id,
-            'recordId': 'profile#main',
-        }
-    )
 
-    item = response.get('Item')
-    if not item:
-        return {
-            'statusCode': 404,
-            'headers': CORS,
-            'body': json.dumps({'error': 'Profile not found'})
-        }
+def _etag(item: dict) -> str:
+    # createdAt distinguishes a re-created profile whose version restarted at 1
+    return '"%s"' % content_key(str(item.get('version', 0)), item.get('createdAt', ''))[:16]
+
 
+def _remember(user_id: str, item: dict):
+    """Cache `item` unless the cache already holds a newer version."""
+    if CACHE_TTL_S <= 0:
+        return
+    cached = _profiles.get(user_id)
+    if cached and cached.get('version', 0) > item.get('version', 0):
+        return
+    _profiles.put(user_id, item)
+
+
+def _not_found():
     return {
-        'statusCode': 200,
+        'statusCode': 404,
         'headers': CORS,
+        'body': json.dumps({'error': 'Profile not found'})
+    }
+
+
+def get_profile(user_id: str, if_none_match: str = ''):
+    # The current version, whichever container saved it
+    head = records.get(user_id, 'profile', 'main', attributes=['version', 'createdAt'])
+    if not head:
+        return _not_found()
+    head    = json.loads(json.dumps(head, default=records.json_default))
+    etag    = _etag(head)
+    headers = {**CORS, 'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in [t.strip() for t in if_none_match.split(',')]:
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+
+    item = _profiles.get(user_id) if CACHE_TTL_S > 0 else None
+    if item is None or _etag(item) != etag:
+        item = records.get(user_id, 'profile', 'main')
+        if not item:
+            return _not_found()
+        # Round-trip through JSON so cached and fresh reads look the same
+        item = json.loads(json.dumps(item, default=records.json_default))
+        if CACHE_TTL_S > 0:
+            _profiles.put(user_id, item)
+        # Saved again between the two reads — describe what is returned
+        headers['ETag'] = _etag(item)
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
         'body': json.dumps({'profile': item})
     }
 
 
 def upsert_profile(body: dict):
-    dynamodb = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME'])
-    table = dynamodb.Table(os.environ['DYNAMODB_MAIN_TABLE'])
-
     user_id = body.get('userId', 'demo-user-123')
     now = datetime.utcnow().isoformat()
 
-    # Build profile item
-    item = {
-        'userId': user_id,
-        'recordId': 'profile#main',
+    fields = {
         'recordType': 'profile',
         'name': body.get('name', ''),
         'age': str(body.get('age', '')),
@@ -93,19 +154,26 @@ def upsert_profile(body: dict):
         'emergencyContacts': body.get('emergencyContacts', []),
         'updatedAt': now,
     }
-
-    # Set createdAt only on first creation (use conditional write)
-    response = table.get_item(
-        Key={'userId': user_id, 'recordId': 'profile#main'}
-    )
-    if not response.get('Item'):
-        item['createdAt'] = now
-
-    table.put_item(Item=item)
+    names  = {f'#f{i}': k for i, k in enumerate(fields)}
+    values = {f':f{i}': v for i, v in enumerate(fields.values())}
+
+    # One round trip: createdAt only on first save, version bumped atomically
+    item = records.table().update_item(
+        Key=records.key(user_id, 'profile', 'main'),
+        UpdateExpression=(
+            'SET ' + ', '.join(f'#f{i} = :f{i}' for i in range(len(fields)))
+            + ', createdAt = if_not_exists(createdAt, :now) ADD version :one'
+        ),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues={**values, ':now': now, ':one': 1},
+        ReturnValues='ALL_NEW',
+    )['Attributes']
+    item = json.loads(json.dumps(item, default=records.json_default))
+    _remember(user_id, item)
 
     return {
         'statusCode': 200,
-        'headers': CORS,
+        'headers': {**CORS, 'ETag': _etag(item)},
         'body': json.dumps({
             'message': 'Profile saved',
             'profile': item
@@ -114,15 +182,8 @@ def upsert_profile(body: dict):
 
 
 def delete_profile(user_id: str):
-    dynamodb = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME'])
-    table = dynamodb.Table(os.environ['DYNAMODB_MAIN_TABLE'])
-
-    table.delete_item(
-        Key={
-            'userId': user_id,
-            'recordId': 'profile#main',
-        }
-    )
+    records.table().delete_item(Key=records.key(user_id, 'profile', 'main'))
+    _profiles.put(user_id, None)
 
     return {
         'statusCode': 200,
@@ -0,0 +1,6 @@
+"""
+shared/
+
+Helpers bundled into every Lambda zip by deploy.sh (lands next to
+lambda_function.py, so handlers import it as `from shared import ...`).
+"""
@@ -0,0 +1,112 @@
+"""
+shared/adherence.py
+
+Medication adherence aggregates, maintained incrementally on the medication
+item itself so no adherence view ever reads the adherence# history rows.
+
+State (the medication's `adherence` attribute):
+  day     — the newest day in `counts` (ISO date)
+  counts  — doses taken per day, newest first, at most WINDOW days
+  streak  — consecutive completed days with every expected dose taken
+  best    — longest streak so far
+  missed  — expected doses not taken, over every completed day
+  taken   — doses recorded in total
+  since   — first tracked day
+
+A day "completes" when the state is rolled past it. record_dose() rolls the
+state forward to today and counts one dose; summary() rolls a copy forward
+(days without any dose count as missed) and derives the 7 / 30-day ratios.
+Both are O(WINDOW) whatever the length of the history. The expected doses
+per day come from the medication's `times` schedule.
+"""
+
+from datetime import date
+
+WINDOW = 30
+
+
+def expected_per_day(times) -> int:
+    return max(1, len(times or []))
+
+
+def empty(today: str) -> dict:
+    return {'day': today, 'counts': [0], 'streak': 0, 'best': 0,
+            'missed': 0, 'taken': 0, 'since': today}
+
+
+def _normalise(state: dict, today: str) -> dict:
+    """Plain-int copy (DynamoDB hands numbers back as Decimal)."""
+    if not state:
+        return empty(today)
+    return {
+        'day':    state['day'],
+        'counts': [int(c) for c in state.get('counts', [])] or [0],
+        'streak': int(state.get('streak', 0)),
+        'best':   int(state.get('best', 0)),
+        'missed': int(state.get('missed', 0)),
+        'taken':  int(state.get('taken', 0)),
+        'since':  state.get('since', state['day']),
+    }
+
+
+def roll(state: dict, today: str, expected: int) -> dict:
+    """`state` advanced to `today`: every day before it is completed."""
+    s = _normalise(state, today)
+    gap = (date.fromisoformat(today) - date.fromisoformat(s['day'])).days
+    if gap <= 0:
+        return s
+
+    # The old newest day completes…
+    last = s['counts'][0]
+    if last >= expected:
+        s['streak'] += 1
+        s['best'] = max(s['best'], s['streak'])
+    else:
+        s['streak'] = 0
+        s['missed'] += expected - last
+    # …and so does every day in between, none of which saw a dose
+    if gap > 1:
+        s['streak'] = 0
+        s['missed'] += (gap - 1) * expected
+
+    s['counts'] = ([0] * min(gap, WINDOW) + s['counts'])[:WINDOW]
+    s['day'] = today
+    return s
+
+
+def record_dose(state: dict, today: str, expected: int) -> dict:
+    s = roll(state, today, expected)
+    s['counts'][0] += 1
+    s['taken'] += 1
+    return s
+
+
+def _window(s: dict, days: int, expected: int) -> dict:
+    tracked = (date.fromisoformat(s['day']) - date.fromisoformat(s['since'])).days + 1
+    counts  = s['counts'][:max(0, min(days, tracked))]
+    if not counts:
+        return {'taken': 0, 'expected': 0, 'missed': 0, 'ratio': None}
+    # Today counts only with what has been taken so far — it is not over yet
+    today     = min(counts[0], expected)
+    completed = [min(c, expected) for c in counts[1:]]
+    taken     = today + sum(completed)
+    due       = today + expected * len(completed)
+    return {'taken': taken, 'expected': due, 'missed': due - taken,
+            'ratio': round(taken / due, 3) if due else None}
+
+
+def summary(state: dict, today: str, times) -> dict:
+    expected = expected_per_day(times)
+    s = roll(state, today, expected)
+    done_today = s['counts'][0] >= expected
+    return {
+        'expectedPerDay': expected,
+        'takenToday':     s['counts'][0],
+        'currentStreak':  s['streak'] + (1 if done_today else 0),
+        'bestStreak':     max(s['best'], s['streak'] + (1 if done_today else 0)),
+        'missedDoses':    s['missed'],
+        'totalTaken':     s['taken'],
+        'trackedSince':   s['since'],
+        'last7':          _window(s, 7, expected),
+        'last30':         _window(s, 30, expected),
+    }
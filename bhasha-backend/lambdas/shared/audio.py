@@ -0,0 +1,190 @@
+"""
+shared/audio.py
+
+Pre-upload clean-up for speech clips. Browsers record webm/ogg at 48 kHz,
+often stereo, often with seconds of silence before and after the words;
+Transcribe bills and spends time on all of it. preprocess() shrinks a clip
+to what recognition needs:
+
+  decode   WAV (8/16/32-bit PCM) with the stdlib `wave` module; anything
+           else (webm/ogg Opus, mp3, m4a) through an ffmpeg binary
+  mono     mean of the channels
+  16 kHz   FFT resampling — band-limits to 8 kHz, all speech needs
+  trim     energy VAD on 30 ms frames: the threshold sits just above the
+           clip's own noise floor (10th-percentile frame energy), leading and
+           trailing frames below it are cut, keeping PAD_S either side
+  encode   FLAC through ffmpeg; 16-bit PCM WAV when ffmpeg is not there
+
+The DSP is NumPy. Decoding compressed formats and FLAC encoding need an
+ffmpeg binary (FFMPEG_PATH, e.g. from a Lambda layer at /opt/bin/ffmpeg).
+preprocess() never raises — whatever is missing or fails, the original clip
+is returned with the reason in the report, so transcription goes on as
+before.
+
+Given the invocation's Deadline, every ffmpeg run is bounded by
+deadline.budget(FFMPEG_SHARE, cap=FFMPEG_CAP_S) rather than a fixed timeout,
+and a clip that arrives with no budget left is uploaded as it is.
+
+Report: inBytes/outBytes/byteRatio, inSeconds/outSeconds/durationRatio,
+trimmedSeconds, ms — or skipped.
+
+Env vars:
+  AUDIO_PREPROCESS — 0 disables the stage (default on)
+  FFMPEG_PATH      — ffmpeg binary (default: /opt/bin/ffmpeg if present, else PATH)
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import wave
+
+ENABLED     = os.environ.get('AUDIO_PREPROCESS', '1') != '0'
+FFMPEG      = os.environ.get('FFMPEG_PATH') or (
+    '/opt/bin/ffmpeg' if os.path.exists('/opt/bin/ffmpeg') else shutil.which('ffmpeg') or '')
+
+TARGET_RATE = 16000
+FRAME_S     = 0.03
+PAD_S       = 0.25
+FLOOR_DB    = 6.0      # speech starts this far above the noise floor…
+MIN_DB      = -55.0    # …and never below this absolute level (dBFS)
+PEAK_DB     = 12.0     # …nor closer than this to the loudest frame
+
+FFMPEG_SHARE = 0.2     # of the time left, per ffmpeg run — transcription needs the rest
+FFMPEG_CAP_S = 8.0
+
+
+def _ffmpeg(args: list, deadline=None):
+    timeout = deadline.budget(FFMPEG_SHARE, cap=FFMPEG_CAP_S) if deadline else FFMPEG_CAP_S
+    if timeout is None:
+        raise TimeoutError('no time budget left for ffmpeg')
+    subprocess.run([FFMPEG, '-v', 'error', '-y', *args], check=True,
+                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.PIPE, timeout=timeout)
+
+
+def _read_wav(data: bytes):
+    """(float32 samples × channels, rate) from PCM WAV bytes."""
+    import numpy as np
+    with wave.open(io.BytesIO(data)) as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width == 1:
+        x = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        x = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768
+    elif width == 4:
+        x = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f'{width * 8}-bit WAV not supported')
+    return x[:len(x) - len(x) % channels].reshape(-1, channels), rate
+
+
+def decode(data: bytes, audio_format: str, workdir: str, deadline=None):
+    if audio_format != 'wav':
+        if not FFMPEG:
+            raise RuntimeError(f'ffmpeg not available to decode {audio_format}')
+        src, dst = os.path.join(workdir, f'in.{audio_format}'), os.path.join(workdir, 'in.wav')
+        with open(src, 'wb') as f:
+            f.write(data)
+        # Native rate and channels — downmix and resampling happen below
+        _ffmpeg(['-i', src, '-c:a', 'pcm_s16le', dst], deadline)
+        with open(dst, 'rb') as f:
+            data = f.read()
+    return _read_wav(data)
+
+
+def resample(x, rate: int, target: int = TARGET_RATE):
+    """FFT resampling of a mono signal; drops everything above target / 2."""
+    import numpy as np
+    if rate == target or not len(x):
+        return x
+    n_out = max(1, int(round(len(x) * target / rate)))
+    spectrum = np.fft.rfft(x)
+    keep = n_out // 2 + 1
+    if keep > len(spectrum):
+        spectrum = np.concatenate((spectrum, np.zeros(keep - len(spectrum), dtype=spectrum.dtype)))
+    return (np.fft.irfft(spectrum[:keep], n_out) * (n_out / len(x))).astype(np.float32)
+
+
+def voiced_span(x, rate: int = TARGET_RATE) -> tuple:
+    """(start, end) sample range from the first to the last voiced frame, padded."""
+    import numpy as np
+    frame = int(FRAME_S * rate)
+    n = len(x) // frame
+    if n < 3:
+        return 0, len(x)
+    energy = np.sqrt(np.mean(x[:n * frame].reshape(n, frame) ** 2, axis=1))
+    db = 20 * np.log10(energy + 1e-10)
+    threshold = min(max(np.percentile(db, 10) + FLOOR_DB, MIN_DB), db.max() - PEAK_DB)
+    voiced = np.flatnonzero(db > threshold)
+    if not len(voiced):
+        return 0, len(x)    # nothing stands out — keep it all rather than guess
+    pad = int(PAD_S * rate)
+    return max(0, int(voiced[0]) * frame - pad), min(len(x), (int(voiced[-1]) + 1) * frame + pad)
+
+
+def _wav_bytes(x, rate: int) -> bytes:
+    import numpy as np
+    pcm = (np.clip(x, -1, 1) * 32767).astype('<i2')
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def encode(x, rate: int, workdir: str, deadline=None) -> tuple:
+    """(bytes, format): FLAC when ffmpeg is available, else 16-bit WAV."""
+    data = _wav_bytes(x, rate)
+    if not FFMPEG:
+        return data, 'wav'
+    src, dst = os.path.join(workdir, 'out.wav'), os.path.join(workdir, 'out.flac')
+    with open(src, 'wb') as f:
+        f.write(data)
+    _ffmpeg(['-i', src, '-c:a', 'flac', '-compression_level', '8', dst], deadline)
+    with open(dst, 'rb') as f:
+        return f.read(), 'flac'
+
+
+def preprocess(data: bytes, audio_format: str, deadline=None) -> tuple:
+    """(bytes, format, report) — the cleaned-up clip, or the original one."""
+    if not ENABLED:
+        return data, audio_format, {'skipped': 'disabled'}
+    if deadline and deadline.budget(FFMPEG_SHARE, cap=FFMPEG_CAP_S) is None:
+        deadline.degrade('preprocess', 'no time budget, uploading the raw clip')
+        return data, audio_format, {'skipped': 'no time budget'}
+    t0 = time.time()
+    try:
+        import numpy  # noqa: F401 — the whole stage needs it
+        with tempfile.TemporaryDirectory(prefix='audio-') as workdir:
+            x, rate = decode(data, audio_format, workdir, deadline)
+            in_seconds = len(x) / rate
+            mono = resample(x.mean(axis=1), rate)
+            start, end = voiced_span(mono)
+            out, out_format = encode(mono[start:end], TARGET_RATE, workdir, deadline)
+    except Exception as e:
+        print(f'[audio] preprocessing skipped: {e}')
+        return data, audio_format, {'skipped': str(e)[:200]}
+
+    out_seconds = (end - start) / TARGET_RATE
+    report = {
+        'inBytes':        len(data),
+        'outBytes':       len(out),
+        'byteRatio':      round(len(out) / max(1, len(data)), 3),
+        'inSeconds':      round(in_seconds, 2),
+        'outSeconds':     round(out_seconds, 2),
+        'durationRatio':  round(out_seconds / in_seconds, 3) if in_seconds else 1.0,
+        'trimmedSeconds': round(in_seconds - out_seconds, 2),
+        'format':         f'{audio_format}→{out_format}',
+        'ms':             int((time.time() - t0) * 1000),
+    }
+    # Never make things worse — a tiny, already-compressed clip can grow as FLAC
+    if len(out) >= len(data) and report['durationRatio'] >= 0.99:
+        return data, audio_format, {**report, 'skipped': 'no gain'}
+    print(f'[audio] {report}')
+    return out, out_format, report
@@ -0,0 +1,209 @@
+"""
+shared/bm25.py
+
+Lexical BM25 retrieval over the prepared KB corpus. Vector search is weak on
+exact drug names, lab tests and rare-disease terms; BM25 is exact on them.
+scripts/build_bm25_index.py writes the index next to the vector index
+(LOCAL_KB_DIR, same row ids as chunks.jsonl), so shared/local_kb.py can fuse
+both rankings with reciprocal rank fusion.
+
+Files (little-endian, all memory-mapped):
+  bm25.meta.json   {count, avgdl, k1, b, n_terms, digest} — digest identifies
+                   the chunks.jsonl the rows came from (shared/local_kb.py)
+  bm25.terms       TERM_HEADER, n_terms × TERM entries sorted by term, term bytes
+  bm25.postings    per term: df doc-id deltas then df term frequencies, all
+                   LEB128 varints
+  bm25.norm        float32 per doc: k1 · (1 − b + b · len / avgdl)
+
+Query path (MaxScore): terms are processed from the highest to the lowest
+max contribution. Once the k-th best score θ is at least the sum of the
+remaining terms' max contributions, no unseen document can reach the top k,
+so the rest of the terms only score the documents still in contention —
+frequent low-idf terms stop adding candidates. Postings are decoded with
+numpy (vectorised varint decode), so a query stays in the low milliseconds.
+"""
+
+import json
+import math
+import mmap
+import os
+import re
+import struct
+
+K1 = 1.2
+B  = 0.75
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have',
+    'i', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to',
+    'was', 'were', 'which', 'with', 'my', 'me', 'am', 'been', 'since', 'what',
+}
+
+TERM_HEADER = struct.Struct('<I')           # term bytes offset (after the entries)
+TERM        = struct.Struct('<IHIQIf')      # term_off, term_len, df, post_off, post_len, max_score
+
+
+def tokenize(text: str) -> list:
+    return [t for t in re.findall(r'[a-z0-9]+', text.lower()) if t not in STOPWORDS]
+
+
+def _varints(values) -> bytearray:
+    out = bytearray()
+    for v in values:
+        while v >= 0x80:
+            out.append((v & 0x7F) | 0x80)
+            v >>= 7
+        out.append(v)
+    return out
+
+
+class BM25Index:
+    def __init__(self, path: str):
+        import numpy as np
+        self.np = np
+        with open(os.path.join(path, 'bm25.meta.json')) as f:
+            self.meta = json.load(f)
+        self.n_terms = self.meta['n_terms']
+        with open(os.path.join(path, 'bm25.terms'), 'rb') as f:
+            self._terms = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(os.path.join(path, 'bm25.postings'), 'rb') as f:
+            self._postings = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.norm = np.memmap(os.path.join(path, 'bm25.norm'), dtype=np.float32, mode='r',
+                              shape=(self.meta['count'],))
+        (self._strings,) = TERM_HEADER.unpack_from(self._terms, 0)
+
+    def _entry(self, i: int) -> tuple:
+        return TERM.unpack_from(self._terms, TERM_HEADER.size + i * TERM.size)
+
+    def term(self, token: str):
+        """(df, post_off, post_len, max_score) for `token`, or None — binary search."""
+        key, lo, hi = token.encode('utf-8'), 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off, n, df, p_off, p_len, max_score = self._entry(mid)
+            start = self._strings + off
+            cur = self._terms[start:start + n]
+            if cur == key:
+                return df, p_off, p_len, max_score
+            if cur < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def postings(self, p_off: int, p_len: int, df: int):
+        """(doc ids, term frequencies) as numpy arrays."""
+        np = self.np
+        raw   = np.frombuffer(self._postings, dtype=np.uint8, count=p_len, offset=p_off)
+        ends  = np.flatnonzero(raw < 0x80)
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+        shift = (np.arange(len(raw)) - starts[group]) * 7
+        vals  = np.zeros(len(ends), dtype=np.uint64)
+        np.add.at(vals, group, (raw & 0x7F).astype(np.uint64) << shift.astype(np.uint64))
+        return np.cumsum(vals[:df]).astype(np.int64), vals[df:].astype(np.float32)
+
+    def search(self, query: str, k: int = 10) -> list:
+        """[(row, score)] best first."""
+        np = self.np
+        n_docs, k1 = self.meta['count'], self.meta['k1']
+        terms = []
+        for tok in dict.fromkeys(tokenize(query)):
+            hit = self.term(tok)
+            if hit:
+                df, p_off, p_len, max_score = hit
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                terms.append((max_score, idf, df, p_off, p_len))
+        if not terms:
+            return []
+        terms.sort(key=lambda t: -t[0])
+        remaining = [sum(t[0] for t in terms[i:]) for i in range(len(terms))] + [0.0]
+
+        acc_ids, acc_sc = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        closed = False     # True once no unseen document can reach the top k
+        for i, (max_score, idf, df, p_off, p_len) in enumerate(terms):
+            ids, tf = self.postings(p_off, p_len, df)
+            contrib = idf * tf * (k1 + 1) / (tf + self.norm[ids])
+            if closed:
+                # Only documents already in contention can still gain
+                pos  = np.searchsorted(acc_ids, ids)
+                pos  = np.minimum(pos, len(acc_ids) - 1)
+                keep = acc_ids[pos] == ids
+                np.add.at(acc_sc, pos[keep], contrib[keep])
+            else:
+                all_ids = np.concatenate((acc_ids, ids))
+                all_sc  = np.concatenate((acc_sc, contrib.astype(np.float32)))
+                acc_ids, inv = np.unique(all_ids, return_inverse=True)
+                acc_sc  = np.zeros(len(acc_ids), dtype=np.float32)
+                np.add.at(acc_sc, inv, all_sc)
+
+            rest = remaining[i + 1]
+            if len(acc_sc) >= k and rest > 0:
+                theta = np.partition(acc_sc, len(acc_sc) - k)[len(acc_sc) - k]
+                if theta >= rest:
+                    closed = True
+                    # Drop candidates that cannot reach θ even with every remaining term
+                    alive = acc_sc + rest >= theta
+                    acc_ids, acc_sc = acc_ids[alive], acc_sc[alive]
+
+        kk  = min(k, len(acc_sc))
+        top = np.argpartition(-acc_sc, kk - 1)[:kk]
+        top = top[np.argsort(-acc_sc[top])]
+        return [(int(acc_ids[j]), float(acc_sc[j])) for j in top]
+
+
+def rrf(rankings: list, k: int = 60) -> list:
+    """Reciprocal rank fusion of several best-first id lists → [(id, score)] best first."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda x: -x[1])
+
+
+# ── Build side (scripts/build_bm25_index.py) ───────────────────────────────────
+
+def write_index(out_dir: str, docs, k1: float = K1, b: float = B, digest: str = ''):
+    """`docs` yields the text of each row, in chunks.jsonl order; `digest` is that file's."""
+    from array import array
+    from collections import Counter
+
+    postings, lengths = {}, array('I')
+    for row, text in enumerate(docs):
+        tokens = tokenize(text)
+        lengths.append(len(tokens))
+        for tok, tf in Counter(tokens).items():
+            entry = postings.get(tok)
+            if entry is None:
+                entry = postings[tok] = (array('I'), array('I'))
+            entry[0].append(row)
+            entry[1].append(tf)
+
+    n_docs = len(lengths)
+    avgdl  = sum(lengths) / max(1, n_docs)
+    norm   = array('f', (k1 * (1 - b + b * dl / avgdl) for dl in lengths))
+
+    entries, strings = [], bytearray()
+    with open(os.path.join(out_dir, 'bm25.postings'), 'wb') as post:
+        for tok in sorted(postings):
+            rows, tfs = postings[tok]
+            df  = len(rows)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            max_score = max(idf * tf * (k1 + 1) / (tf + norm[r]) for r, tf in zip(rows, tfs))
+            deltas = [rows[0]] + [rows[j] - rows[j - 1] for j in range(1, df)]
+            blob = _varints(deltas) + _varints(tfs)
+            name = tok.encode('utf-8')
+            entries.append(TERM.pack(len(strings), len(name), df, post.tell(), len(blob), max_score))
+            strings += name
+            post.write(blob)
+
+    with open(os.path.join(out_dir, 'bm25.terms'), 'wb') as f:
+        f.write(TERM_HEADER.pack(TERM_HEADER.size + len(entries) * TERM.size))
+        f.writelines(entries)
+        f.write(strings)
+    with open(os.path.join(out_dir, 'bm25.norm'), 'wb') as f:
+        norm.tofile(f)
+    with open(os.path.join(out_dir, 'bm25.meta.json'), 'w') as f:
+        json.dump({'count': n_docs, 'avgdl': avgdl, 'k1': k1, 'b': b,
+                   'n_terms': len(entries), 'digest': digest}, f)
+    return n_docs, len(entries)
@@ -0,0 +1,121 @@
+"""
+shared/cache.py
+
+Two-tier TTL cache for results that are expensive to recompute and safe to
+share between users (NER output, ICD-10 codes, retrieval results):
+
+  1. an in-process LRU, so a warm container answers repeats in microseconds
+  2. optionally DynamoDB (CACHE_TABLE, pk cacheKey, TTL attribute expiresAt),
+     so every container benefits from each other's misses
+
+Values must be JSON-serialisable; they are stored as a JSON string so
+DynamoDB's Decimal conversion never leaks into callers. Cache failures are
+never fatal — a broken table just means more misses.
+
+Env vars:
+  CACHE_TABLE  — optional shared table (setup_infra.sh creates BhashaAI_Cache)
+  APP_REGION   — table region, defaults to ap-south-1
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+APP_REGION  = os.environ.get('APP_REGION', 'ap-south-1')
+CACHE_TABLE = os.environ.get('CACHE_TABLE', '')
+
+
+def content_key(*parts: str) -> str:
+    """Stable hash of the given strings — the cache key for that content."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+class TieredCache:
+    def __init__(self, prefix: str, ttl_s: float, max_items: int = 512,
+                 table_name: str = CACHE_TABLE):
+        self.prefix     = prefix
+        self.ttl_s      = ttl_s
+        self.max_items  = max_items
+        self.table_name = table_name
+        self.stats      = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+        self._items     = OrderedDict()   # key → (expires_at, value)
+        self._lock      = threading.Lock()
+        self._table     = None
+
+    def get(self, key: str):
+        """Cached value for `key`, or None."""
+        now = time.time()
+        with self._lock:
+            hit = self._items.get(key)
+            if hit and hit[0] > now:
+                self._items.move_to_end(key)
+                self.stats['local_hits'] += 1
+                return hit[1]
+            if hit:
+                del self._items[key]
+
+        value, expires_at = self._get_shared(key, now)
+        with self._lock:
+            if value is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['shared_hits'] += 1
+            self._store_local(key, value, expires_at)
+        return value
+
+    def put(self, key: str, value):
+        expires_at = time.time() + self.ttl_s
+        with self._lock:
+            self._store_local(key, value, expires_at)
+        self._put_shared(key, value, expires_at)
+
+    def _store_local(self, key: str, value, expires_at: float):
+        self._items[key] = (expires_at, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    # ── DynamoDB tier ─────────────────────────────────────────────────────────
+
+    def _shared(self):
+        if self._table is None:
+            import boto3
+            from .deadline import boto_config
+            self._table = boto3.resource('dynamodb', region_name=APP_REGION,
+                                         config=boto_config(1)).Table(self.table_name)
+        return self._table
+
+    def _get_shared(self, key: str, now: float) -> tuple:
+        if not self.table_name:
+            return None, 0
+        try:
+            item = self._shared().get_item(
+                Key={'cacheKey': f'{self.prefix}#{key}'},
+                ProjectionExpression='#v, expiresAt',
+                ExpressionAttributeNames={'#v': 'value'},
+            ).get('Item')
+            # TTL deletion is lazy, so expired items can still be returned
+            if item and float(item.get('expiresAt', 0)) > now:
+                return json.loads(item['value']), float(item['expiresAt'])
+        except Exception as e:
+            print(f'[cache:{self.prefix}] shared read failed: {e}')
+        return None, 0
+
+    def _put_shared(self, key: str, value, expires_at: float):
+        if not self.table_name:
+            return
+        try:
+            self._shared().put_item(Item={
+                'cacheKey':  f'{self.prefix}#{key}',
+                'value':     json.dumps(value, ensure_ascii=False),
+                'expiresAt': int(expires_at),
+            })
+        except Exception as e:
+            print(f'[cache:{self.prefix}] shared write failed: {e}')
@@ -0,0 +1,201 @@
+"""
+shared/circuit.py
+
+Per-dependency circuit breakers (Comprehend Medical, Bedrock models, the
+Knowledge Base, Overpass, Google Places). While a dependency is failing or
+slow, its circuit opens and calls fail immediately with CircuitOpen, so the
+caller's existing `except` fallback runs in microseconds instead of waiting
+for a timeout.
+
+States:
+  closed     — calls go through; the last WINDOW outcomes (within WINDOW_S)
+               are kept. With at least MIN_CALLS outcomes, the circuit opens
+               when the error rate reaches ERROR_RATE or the share of calls
+               slower than the dependency's slow threshold reaches SLOW_RATE.
+  open       — calls are rejected for OPEN_S seconds.
+  half_open  — one probe call at a time is let through; a fast success
+               closes the circuit, anything else re-opens it.
+
+State lives in the container (module-level registry). With CIRCUIT_TABLE
+set, a circuit that opens is also written to DynamoDB so other containers
+pick it up on their next sync (at most every SYNC_S seconds per circuit).
+
+Usage — keep the guarded block tight around the network call:
+  try:
+      with circuit.guard('comprehend'):
+          resp = comprehend.detect_entities_v2(Text=text)
+  except Exception as e:
+      ...existing fallback...
+
+Env vars:
+  CIRCUIT_TABLE    — optional DynamoDB table (pk cacheKey, TTL expiresAt) for sharing
+  CIRCUIT_OPEN_S   — seconds an open circuit rejects calls (default 30)
+  APP_REGION       — table region, defaults to ap-south-1
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+APP_REGION = os.environ.get('APP_REGION', 'ap-south-1')
+TABLE_NAME = os.environ.get('CIRCUIT_TABLE', '')
+OPEN_S     = float(os.environ.get('CIRCUIT_OPEN_S', '30'))
+
+WINDOW     = 20      # outcomes kept per circuit
+WINDOW_S   = 120     # ...and only those from the last two minutes
+MIN_CALLS  = 5
+ERROR_RATE = 0.5
+SLOW_RATE  = 0.8
+SYNC_S     = 5
+
+# Seconds after which a successful call still counts as slow. Bedrock
+# circuits are named 'bedrock:<modelId>' and share one threshold.
+SLOW_S = {
+    'comprehend':    4,
+    'bedrock':       15,
+    'kb':            8,
+    'overpass':      10,
+    'google_places': 5,
+    'embed':         2,
+}
+DEFAULT_SLOW_S = 10
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class Breaker:
+    def __init__(self, name: str):
+        self.name        = name
+        self.slow_s      = SLOW_S.get(name.split(':')[0], DEFAULT_SLOW_S)
+        self.state       = CLOSED
+        self.open_until  = 0.0
+        self.outcomes    = deque(maxlen=WINDOW)   # (time, ok, slow)
+        self.probing     = False
+        self.synced_at   = 0.0
+        self._lock       = threading.Lock()
+
+    def allow(self) -> bool:
+        now = time.time()
+        if TABLE_NAME and self.state == CLOSED and now - self.synced_at >= SYNC_S:
+            self.synced_at = now
+            shared_until = _read_shared(self.name)   # network — outside the lock
+            if shared_until > now:
+                with self._lock:
+                    if self.state == CLOSED:
+                        self._open(shared_until)
+        with self._lock:
+            if self.state == OPEN:
+                if now < self.open_until:
+                    return False
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == HALF_OPEN:
+                if self.probing:
+                    return False
+                self.probing = True
+            return True
+
+    def record(self, ok: bool, latency_s: float):
+        now     = time.time()
+        slow    = latency_s > self.slow_s
+        publish = None   # openUntil to share, written after the lock is released
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probing = False
+                if ok and not slow:
+                    print(f'[circuit] {self.name} closed after probe ({latency_s:.2f}s)')
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                    publish = 0
+                else:
+                    publish = self._open(now + OPEN_S)
+            else:
+                self.outcomes.append((now, ok, slow))
+                recent = [o for o in self.outcomes if now - o[0] <= WINDOW_S]
+                if len(recent) >= MIN_CALLS:
+                    errors = sum(1 for _, good, _ in recent if not good) / len(recent)
+                    slows  = sum(1 for _, _, s in recent if s) / len(recent)
+                    if errors >= ERROR_RATE or slows >= SLOW_RATE:
+                        print(f'[circuit] {self.name} tripped: errors={errors:.0%} slow={slows:.0%}')
+                        publish = self._open(now + OPEN_S)
+        if publish is not None and TABLE_NAME:
+            _write_shared(self.name, publish)
+
+    def _open(self, until: float) -> float:
+        self.state      = OPEN
+        self.open_until = until
+        self.probing    = False
+        self.outcomes.clear()
+        return until
+
+
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def breaker(name: str) -> Breaker:
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = Breaker(name)
+        return _breakers[name]
+
+
+@contextmanager
+def guard(name: str):
+    """Raise CircuitOpen if `name` is open, else time the block and record its outcome."""
+    b = breaker(name)
+    if not b.allow():
+        raise CircuitOpen(f'circuit {name} open')
+    start = time.monotonic()
+    try:
+        yield b
+    except Exception:
+        b.record(False, time.monotonic() - start)
+        raise
+    b.record(True, time.monotonic() - start)
+
+
+def states() -> dict:
+    """Circuit name → state, for logs and health checks."""
+    return {name: b.state for name, b in _breakers.items()}
+
+
+# ── Optional DynamoDB sharing ──────────────────────────────────────────────────
+
+_table = None
+
+
+def _shared_table():
+    global _table
+    if _table is None:
+        import boto3
+        from .deadline import boto_config
+        _table = boto3.resource('dynamodb', region_name=APP_REGION,
+                                config=boto_config(1)).Table(TABLE_NAME)
+    return _table
+
+
+def _read_shared(name: str) -> float:
+    try:
+        item = _shared_table().get_item(Key={'cacheKey': f'circuit#{name}'}).get('Item') or {}
+        return float(item.get('openUntil', 0))
+    except Exception as e:
+        print(f'[circuit] shared read {name} failed: {e}')
+        return 0.0
+
+
+def _write_shared(name: str, until: float):
+    try:
+        _shared_table().put_item(Item={
+            'cacheKey':  f'circuit#{name}',
+            'openUntil': int(until),
+            'expiresAt': int(max(until, time.time()) + 3600),
+        })
+    except Exception as e:
+        print(f'[circuit] shared write {name} failed: {e}')
@@ -0,0 +1,73 @@
+"""
+shared/deadline.py
+
+Per-invocation time budget. A Deadline is created once at handler entry from
+context.get_remaining_time_in_millis() (minus a reserve for building the
+response) and passed to every network stage. Each stage asks for its share
+of whatever time is left, so one slow Overpass or KB call can no longer push
+the whole invocation into a Lambda timeout.
+
+When a stage cannot get a useful timeout, or its call times out, the caller
+falls back to degraded output and records it with degrade(); handlers return
+deadline.degraded in the response so the client knows what was skipped.
+
+Usage:
+  deadline = Deadline.from_context(context)
+  timeout  = deadline.budget(0.3, cap=15)       # None → skip the stage
+  client   = boto3.client('bedrock-runtime', config=boto_config(timeout))
+
+Env vars:
+  DEADLINE_RESERVE_S  — seconds kept back for the response (default 1.5)
+  DEADLINE_DEFAULT_S  — budget when there is no Lambda context (default 30)
+"""
+
+import os
+import time
+
+RESERVE_S = float(os.environ.get('DEADLINE_RESERVE_S', '1.5'))
+DEFAULT_S = float(os.environ.get('DEADLINE_DEFAULT_S', '30'))
+
+
+class Deadline:
+    def __init__(self, total_s: float, reserve_s: float = RESERVE_S):
+        self.end      = time.monotonic() + max(0.0, total_s - reserve_s)
+        self.degraded = []   # stage names, in the order they were degraded
+
+    @classmethod
+    def from_context(cls, context, reserve_s: float = RESERVE_S) -> 'Deadline':
+        try:
+            total_s = context.get_remaining_time_in_millis() / 1000
+        except Exception:
+            total_s = DEFAULT_S   # local run / test harness
+        return cls(total_s, reserve_s)
+
+    def remaining(self) -> float:
+        return max(0.0, self.end - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, share: float, cap: float, floor: float = 1.0):
+        """
+        Timeout for the next stage: `share` of the remaining time, at most
+        `cap` seconds. Returns None when less than `floor` seconds would be
+        available — the stage is not worth starting and should degrade.
+        """
+        timeout = min(cap, self.remaining() * share)
+        return timeout if timeout >= floor else None
+
+    def degrade(self, stage: str, reason: str = ''):
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+        print(f'[deadline] degraded {stage}: {reason} ({self.remaining():.1f}s left)')
+
+
+def boto_config(timeout: float):
+    """botocore Config bounding one client's calls to `timeout` seconds, no retries."""
+    from botocore.config import Config
+    timeout = max(1.0, timeout or DEFAULT_S)
+    return Config(
+        connect_timeout=min(timeout, 3.0),
+        read_timeout=timeout,
+        retries={'max_attempts': 1, 'mode': 'standard'},
+    )
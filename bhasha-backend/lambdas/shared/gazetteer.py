@@ -0,0 +1,436 @@
+"""
+shared/gazetteer.py
+
+Local medical entity extractor — a dictionary (gazetteer) of symptoms,
+conditions, medicines and body parts in English, Devanagari (Hindi /
+Marathi), other Indic scripts and romanized Hindi ("Hinglish"), compiled
+once per container into a token-prefix index.
+
+Comprehend Medical only understands English, so for "mujhe 3 din se bukhar
+hai" or "தலைவலி" it is a slow call that returns nothing useful. extract()
+runs in microseconds and returns the same shape as shared/ner.py:
+
+  {symptoms, conditions, medications, body_parts, durations}
+
+Values are the canonical English terms (durations keep the original text),
+so KB queries and synthesis prompts see one vocabulary for every language.
+
+Matching:
+  - text is split on whitespace/punctuation, lowercased, nukta and
+    chandrabindu dropped; a listed spelling matches as it is
+  - other romanized spellings match through a fold that merges common
+    variants (bukhhar/bukhar, zukaam/jukam, phoolna/fulna). Only the
+    romanized variants are folded — canonical English terms match as
+    written, so "fit" is not "feet"
+  - the longest phrase wins ("pet me dard" → stomach pain, not stomach)
+  - Indic-script words also match by stem, so inflected forms are found
+    (காய்ச்சலாக → fever)
+  - romanized words that are also English words (sir, pair, pet…) only
+    count when the text is Hinglish; this is checked on the form that
+    matched, so a fold that lands on an English word (taap → tap) is
+    caught too
+  - everyday English words used as lay synonyms (sugar → diabetes,
+    cold → runny nose) are matched but flagged: extract(text, lay=False)
+    skips them, so shared/ner.py does not treat them as proof that
+    Comprehend has nothing to add
+  - durations match whole words only ("a dinner" is not "a din")
+"""
+
+import re
+import unicodedata
+
+# canonical English term → variants. The canonical term is a variant too.
+SYMPTOMS = {
+    'fever': [
+        'bukhar', 'bukhaar', 'bukar', 'jwar', 'jvar', 'taap', 'tap', 'temperature',
+        'high temperature', 'बुखार', 'बुख़ार', 'ज्वर', 'ताप', 'காய்ச்சல்', 'kaichal',
+        'kaaichal', 'జ్వరం', 'jwaram', 'jvaram', 'জ্বর', 'jor', 'તાવ', 'taav',
+        'ಜ್ವರ', 'പനി', 'ਬੁਖਾਰ',
+    ],
+    'cough': [
+        'khansi', 'khaansi', 'khasi', 'khokla', 'खांसी', 'खाँसी', 'खासी', 'खोकला',
+        'இருமல்', 'irumal', 'దగ్గు', 'daggu', 'কাশি', 'kashi', 'ઉધરસ', 'udhras',
+        'ಕೆಮ್ಮು', 'kemmu', 'ചുമ', 'ਖੰਘ', 'khangh',
+    ],
+    'headache': [
+        'head ache', 'head pain', 'sir dard', 'sirdard', 'sar dard', 'sardard',
+        'sir me dard', 'sir mein dard', 'सिरदर्द', 'सिर दर्द', 'सर दर्द',
+        'सिर में दर्द', 'डोकेदुखी', 'தலைவலி', 'தலை வலி', 'thalaivali',
+        'thalai vali', 'తలనొప్పి', 'tala noppi', 'talanoppi', 'মাথাব্যথা',
+        'মাথা ব্যথা', 'matha byatha', 'માથાનો દુખાવો', 'ತಲೆನೋವು', 'tale novu',
+        'തലവേദന', 'thalavedana', 'ਸਿਰ ਦਰਦ',
+    ],
+    'vomiting': [
+        'vomit', 'vomits', 'ulti', 'ultee', 'उल्टी', 'उलटी', 'वांती', 'வாந்தி', 'vaanthi',
+        'vanthi', 'వాంతి', 'వాంతులు', 'vaanti', 'বমি', 'bomi', 'ઉલટી', 'ವಾಂತಿ',
+        'ഛർദ്ദി', 'ਉਲਟੀ',
+    ],
+    'nausea': [
+        'nauseous', 'ji michlana', 'jee michlana', 'ji machalna', 'matli', 'जी मिचलाना',
+        'जी मचलाना', 'मतली', 'மயக்கம் போல', 'వికారం', 'vikaram', 'বমি বমি ভাব',
+    ],
+    'diarrhoea': [
+        'diarrhea', 'loose motion', 'loose motions', 'dast', 'patla paikhana', 'दस्त',
+        'पतला पैखाना', 'जुलाब', 'வயிற்றுப்போக்கு', 'విరేచనాలు', 'virechanalu',
+        'পাতলা পায়খানা', 'ডায়রিয়া', 'ઝાડા', 'jhada', 'ಅತಿಸಾರ', 'വയറിളക്കം',
+    ],
+    'stomach pain': [
+        'stomach ache', 'abdominal pain', 'tummy pain', 'pet dard', 'pet me dard',
+        'pet mein dard', 'pet ka dard', 'पेट दर्द', 'पेट में दर्द', 'पेटदुखी',
+        'வயிற்று வலி', 'வயிறு வலி', 'vayiru vali', 'కడుపు నొప్పి', 'kadupu noppi',
+        'পেট ব্যথা', 'pet byatha', 'પેટમાં દુખાવો', 'ಹೊಟ್ಟೆ ನೋವು', 'hotte novu',
+        'വയറുവേദന', 'ਪੇਟ ਦਰਦ',
+    ],
+    'chest pain': [
+        'seene me dard', 'seene mein dard', 'chhati me dard', 'chati me dard',
+        'सीने में दर्द', 'छाती में दर्द', 'छातीत दुखणे', 'நெஞ்சு வலி', 'nenju vali',
+        'ఛాతీ నొప్పి', 'বুকে ব্যথা', 'buke byatha', 'ਛਾਤੀ ਦਰਦ',
+    ],
+    'shortness of breath': [
+        'breathlessness', 'breathing difficulty', 'difficulty breathing', 'saans phoolna',
+        'saans fulna', 'saans lene me takleef', 'saans lene mein taklif', 'dam phoolna',
+        'सांस फूलना', 'साँस फूलना', 'सांस लेने में तकलीफ', 'साँस लेने में तकलीफ़',
+        'दम फूलना', 'மூச்சுத் திணறல்', 'மூச்சு திணறல்', 'ఆయాసం', 'aayasam',
+        'শ্বাসকষ্ট', 'shwaskashto', 'ਸਾਹ ਫੁੱਲਣਾ',
+    ],
+    'dizziness': [
+        'dizzy', 'giddiness', 'vertigo', 'chakkar', 'chakkar aana', 'chakkar aa raha',
+        'चक्कर', 'चक्कर आना', 'தலைசுற்றல்', 'తల తిరగడం', 'মাথা ঘোরা', 'matha ghora',
+        'ચક્કર', 'ತಲೆ ಸುತ್ತು', 'തലകറക്കം', 'ਚੱਕਰ',
+    ],
+    'fatigue': [
+        'tiredness', 'weakness', 'tired', 'kamzori', 'kamjori', 'thakan', 'thakaan',
+        'कमजोरी', 'कमज़ोरी', 'थकान', 'थकावट', 'अशक्तपणा', 'சோர்வு', 'sorvu',
+        'నీరసం', 'neerasam', 'দুর্বলতা', 'durbolota', 'ક્ષીણતા', 'ಆಯಾಸ', 'ക്ഷീണം',
+        'ਕਮਜ਼ੋਰੀ',
+    ],
+    'runny nose': [
+        'cold', 'common cold', 'zukam', 'jukam', 'sardi', 'naak behna', 'nazla',
+        'जुकाम', 'ज़ुकाम', 'सर्दी', 'नाक बहना', 'सर्दी जुकाम', 'சளி', 'sali',
+        'జలుబు', 'jalubu', 'সর্দি', 'shordi', 'શરદી', 'ನೆಗಡಿ', 'ജലദോഷം', 'ਜ਼ੁਕਾਮ',
+    ],
+    'sore throat': [
+        'throat pain', 'gale me dard', 'gale mein dard', 'gala kharab', 'gala dukhna',
+        'गले में दर्द', 'गला खराब', 'गला ख़राब', 'தொண்டை வலி', 'thondai vali',
+        'గొంతు నొప్పి', 'gonthu noppi', 'গলা ব্যথা', 'gola byatha', 'ਗਲਾ ਖਰਾਬ',
+    ],
+    'body ache': [
+        'body pain', 'badan dard', 'sharir me dard', 'sharir mein dard', 'बदन दर्द',
+        'शरीर में दर्द', 'अंगदुखी', 'உடல் வலி', 'udal vali', 'ఒళ్ళు నొప్పులు',
+        'গা ব্যথা', 'ਸਰੀਰ ਦਰਦ',
+    ],
+    'joint pain': [
+        'jodon me dard', 'jodo me dard', 'jodon ka dard', 'jodo ka dard',
+        'जोड़ों में दर्द', 'जोड़ों का दर्द', 'सांधेदुखी', 'மூட்டு வலி', 'moottu vali',
+        'కీళ్ల నొప్పులు', 'keella noppulu', 'গাঁটে ব্যথা', 'ਜੋੜਾਂ ਦਾ ਦਰਦ',
+    ],
+    'back pain': [
+        'backache', 'kamar dard', 'peeth dard', 'peeth me dard', 'kamar me dard',
+        'कमर दर्द', 'पीठ दर्द', 'कमर में दर्द', 'पाठदुखी', 'முதுகு வலி', 'muthugu vali',
+        'నడుము నొప్పి', 'nadumu noppi', 'পিঠে ব্যথা', 'ਕਮਰ ਦਰਦ',
+    ],
+    'toothache': [
+        'tooth pain', 'daant dard', 'dant dard', 'दांत दर्द', 'दाँत दर्द', 'பல் வலி',
+        'పంటి నొప్పి', 'দাঁতে ব্যথা', 'ਦੰਦ ਦਰਦ',
+    ],
+    'ear pain': ['earache', 'kaan dard', 'kaan me dard', 'कान दर्द', 'कान में दर्द', 'காது வலி', 'చెవి నొప్పి'],
+    'eye pain': ['aankh me dard', 'aankh dard', 'आंख में दर्द', 'आँख में दर्द', 'கண் வலி', 'కంటి నొప్పి'],
+    'pain': ['ache', 'dard', 'dukhna', 'दर्द', 'दुखना', 'दुखणे', 'வலி', 'vali', 'నొప్పి', 'noppi', 'ব্যথা', 'byatha', 'દુખાવો', 'ನೋವು', 'വേദന', 'ਦਰਦ'],
+    'rash': ['rashes', 'chakatte', 'daane', 'dane', 'चकत्ते', 'दाने', 'पुरळ', 'தடிப்பு', 'దద్దుర్లు', 'ফুসকুড়ি', 'ਧੱਫੜ'],
+    'itching': ['itchy', 'khujli', 'khujlee', 'खुजली', 'खाज', 'அரிப்பு', 'arippu', 'దురద', 'durada', 'চুলকানি', 'ਖਾਰਸ਼'],
+    'swelling': ['swollen', 'sujan', 'soojan', 'सूजन', 'सूज', 'வீக்கம்', 'veekkam', 'వాపు', 'vaapu', 'ফোলা', 'ਸੋਜ'],
+    'burning urination': [
+        'burning micturition', 'peshab me jalan', 'peshab mein jalan', 'पेशाब में जलन',
+        'लघवीला जळजळ', 'சிறுநீர் எரிச்சல்', 'మూత్రంలో మంట', 'প্রস্রাবে জ্বালা',
+    ],
+    'frequent urination': ['baar baar peshab', 'bar bar peshab', 'बार बार पेशाब', 'बार-बार पेशाब'],
+    'loss of appetite': [
+        'no appetite', 'bhook na lagna', 'bhookh na lagna', 'bhook nahi lagti',
+        'bhookh nahi lagti', 'भूख न लगना', 'भूख नहीं लगती', 'பசியின்மை', 'ఆకలి లేదు',
+        'খিদে নেই',
+    ],
+    'insomnia': ['sleeplessness', 'neend na aana', 'neend nahi aati', 'नींद न आना', 'नींद नहीं आती', 'தூக்கமின்மை', 'నిద్రలేమి'],
+    'palpitations': ['dhadkan tez', 'dil ki dhadkan tez', 'धड़कन तेज', 'दिल की धड़कन तेज', 'படபடப்பு', 'గుండె దడ'],
+    'chills': ['shivering', 'kapkapi', 'kampkampi', 'thand lagna', 'कंपकंपी', 'ठंड लगना', 'ठंड लगकर', 'குளிர் நடுக்கம்', 'చలి'],
+    'sweating': ['pasina', 'paseena', 'पसीना', 'வியர்வை', 'చెమట', 'ঘাম'],
+    'constipation': ['kabz', 'kabj', 'qabz', 'कब्ज', 'कब्ज़', 'बद्धकोष्ठता', 'மலச்சிக்கல்', 'మలబద్ధకం', 'কোষ্ঠকাঠিন্য', 'ਕਬਜ਼'],
+    'heartburn': ['acidity', 'acid reflux', 'seene me jalan', 'सीने में जलन', 'एसिडिटी', 'अम्लपित्त', 'நெஞ்செரிச்சல்', 'గుండెల్లో మంట', 'অম্বল'],
+    'blurred vision': ['dhundhla dikhna', 'dhundla dikhna', 'धुंधला दिखना', 'धुंधला दिखाई', 'மங்கலான பார்வை', 'మసకగా కనిపించడం'],
+    'fainting': ['unconscious', 'unconsciousness', 'behosh', 'behoshi', 'बेहोश', 'बेहोशी', 'मूर्छा', 'மயக்கம்', 'mayakkam', 'స్పృహ తప్పడం', 'অজ্ঞান'],
+    'seizure': ['fits', 'convulsions', 'daura padna', 'दौरा पड़ना', 'झटके', 'வலிப்பு', 'మూర్ఛ', 'খিঁচুনি'],
+    'bleeding': ['khoon aana', 'khoon behna', 'खून आना', 'खून बहना', 'रक्तस्राव', 'இரத்தப்போக்கு', 'రక్తస్రావం', 'রক্তপাত'],
+    'numbness': ['sunn', 'sunn padna', 'सुन्न', 'सुन्नपन', 'மரத்துப்போதல்', 'తిమ్మిరి'],
+}
+
+CONDITIONS = {
+    'diabetes': ['sugar', 'sugar ki bimari', 'madhumeh', 'मधुमेह', 'शुगर', 'डायबिटीज', 'डायबिटीज़', 'சர்க்கரை நோய்', 'நீரிழிவு', 'షుగర్', 'మధుమేహం', 'ডায়াবেটিস', 'ਸ਼ੂਗਰ'],
+    'hypertension': ['high blood pressure', 'high bp', 'bp', 'uchch raktchap', 'उच्च रक्तचाप', 'हाई बीपी', 'बीपी', 'ब्लड प्रेशर', 'உயர் இரத்த அழுத்தம்', 'రక్తపోటు', 'উচ্চ রক্তচাপ'],
+    'asthma': ['dama', 'दमा', 'अस्थमा', 'ஆஸ்துமா', 'ఆస్తమా', 'হাঁপানি', 'ਦਮਾ'],
+    'tuberculosis': ['tb', 'tapedik', 'टीबी', 'तपेदिक', 'क्षय रोग', 'காசநோய்', 'క్షయ', 'যক্ষ্মা'],
+    'malaria': ['मलेरिया', 'மலேரியா', 'మలేరియా', 'ম্যালেরিয়া'],
+    'dengue': ['dengu', 'डेंगू', 'டெங்கு', 'డెంగ్యూ', 'ডেঙ্গু'],
+    'typhoid': ['miyadi bukhar', 'टाइफाइड', 'टायफॉईड', 'मियादी बुखार', 'டைபாய்டு', 'టైఫాయిడ్', 'টাইফয়েড'],
+    'jaundice': ['piliya', 'peeliya', 'पीलिया', 'कावीळ', 'மஞ்சள் காமாலை', 'కామెర్లు', 'জন্ডিস', 'ਪੀਲੀਆ'],
+    'migraine': ['adhasisi', 'माइग्रेन', 'आधासीसी', 'ஒற்றைத் தலைவலி', 'మైగ్రేన్'],
+    'anaemia': ['anemia', 'khoon ki kami', 'खून की कमी', 'एनीमिया', 'இரத்த சோகை', 'రక్తహీనత', 'রক্তাল্পতা'],
+    'thyroid disorder': ['thyroid', 'थायराइड', 'थायरॉइड', 'தைராய்டு', 'థైరాయిడ్', 'থাইরয়েড'],
+    'pneumonia': ['nimonia', 'निमोनिया', 'நிமோனியா', 'న్యుమోనియా', 'নিউমোনিয়া'],
+    'covid-19': ['covid', 'corona', 'कोरोना', 'कोविड', 'கொரோனா', 'కరోనా', 'করোনা'],
+    'heart attack': ['myocardial infarction', 'dil ka daura', 'दिल का दौरा', 'हृदयविकाराचा झटका', 'மாரடைப்பு', 'గుండెపోటు', 'হার্ট অ্যাটাক'],
+    'stroke': ['paralysis', 'lakwa', 'lakva', 'लकवा', 'पक्षाघात', 'பக்கவாதம்', 'పక్షవాతం', 'স্ট্রোক'],
+    'arthritis': ['gathiya', 'गठिया', 'संधिवात', 'மூட்டுவாதம்', 'కీళ్ళవాతం', 'বাত'],
+    'kidney stone': ['pathri', 'पथरी', 'गुर्दे की पथरी', 'சிறுநீரக கல்', 'కిడ్నీ రాళ్లు', 'কিডনিতে পাথর'],
+    'epilepsy': ['mirgi', 'मिर्गी', 'अपस्मार', 'காக்கை வலிப்பு', 'మూర్ఛ వ్యాధి', 'মৃগী'],
+    'chickenpox': ['chechak', 'choti mata', 'चेचक', 'छोटी माता', 'கொப்புளிப்பான்', 'ఆటలమ్మ', 'জলবসন্ত'],
+    'urinary tract infection': ['uti', 'peshab ka infection', 'पेशाब का इन्फेक्शन', 'मूत्र संक्रमण'],
+    'food poisoning': ['फूड पॉइजनिंग', 'विषाक्त भोजन'],
+    'piles': ['haemorrhoids', 'hemorrhoids', 'bawaseer', 'bavasir', 'बवासीर', 'मूळव्याध', 'மூலநோய்', 'మొలలు', 'অর্শ'],
+    'gastritis': ['gastric', 'gas', 'pet me gas', 'गैस', 'पेट में गैस', 'गैस्ट्रिक'],
+    'cancer': ['कैंसर', 'कर्करोग', 'புற்றுநோய்', 'క్యాన్సర్', 'ক্যান্সার'],
+    'depression': ['udasi', 'avsaad', 'उदासी', 'अवसाद', 'மனச்சோர்வு', 'డిప్రెషన్', 'বিষণ্ণতা'],
+}
+
+MEDICATIONS = {
+    'paracetamol': ['acetaminophen', 'crocin', 'dolo', 'dolo 650', 'calpol', 'pcm', 'पैरासिटामोल', 'क्रोसिन', 'डोलो', 'பாராசிட்டமால்', 'పారాసిటమాల్', 'প্যারাসিটামল'],
+    'ibuprofen': ['brufen', 'combiflam', 'आइबुप्रोफेन', 'कॉम्बिफ्लेम'],
+    'aspirin': ['disprin', 'ecosprin', 'एस्पिरिन', 'डिस्प्रिन'],
+    'diclofenac': ['voveran', 'डाइक्लोफेनाक'],
+    'metformin': ['glycomet', 'मेटफॉर्मिन', 'மெட்ஃபார்மின்'],
+    'insulin': ['इंसुलिन', 'இன்சுலின்', 'ఇన్సులిన్', 'ইনসুলিন'],
+    'amlodipine': ['amlong', 'एमलोडिपिन'],
+    'telmisartan': ['telma', 'टेल्मिसर्टन'],
+    'atorvastatin': ['atorva', 'lipitor', 'एटोरवास्टेटिन'],
+    'levothyroxine': ['thyronorm', 'eltroxin', 'thyroxine', 'थायरोनॉर्म'],
+    'azithromycin': ['azithral', 'azee', 'एज़िथ्रोमाइसिन'],
+    'amoxicillin': ['mox', 'augmentin', 'एमोक्सिसिलिन'],
+    'cetirizine': ['cetzine', 'okacet', 'सेटिरिज़िन'],
+    'pantoprazole': ['pan 40', 'pan d', 'pantocid', 'पैंटोप्राजोल'],
+    'omeprazole': ['omez', 'ओमेप्राजोल'],
+    'ranitidine': ['rantac', 'aciloc', 'रैनिटिडिन'],
+    'salbutamol': ['asthalin', 'albuterol', 'सालबुटामोल'],
+    'montelukast': ['montair', 'मोंटेलुकास्ट'],
+    'ondansetron': ['emeset', 'ondem', 'ओंडानसेट्रॉन'],
+    'metronidazole': ['flagyl', 'मेट्रोनिडाजोल'],
+    'loperamide': ['eldoper', 'imodium', 'लोपेरामाइड'],
+    'oral rehydration salts': ['ors', 'ओआरएस', 'electral'],
+    'antacid': ['digene', 'gelusil', 'eno', 'डाइजीन', 'ईनो'],
+}
+
+BODY_PARTS = {
+    'head': ['sir', 'sar', 'सिर', 'सर', 'डोके', 'தலை', 'thalai', 'తల', 'মাথা', 'matha', 'માથું', 'ತಲೆ', 'തല', 'ਸਿਰ'],
+    'abdomen': ['stomach', 'belly', 'tummy', 'pet', 'पेट', 'வயிறு', 'vayiru', 'కడుపు', 'kadupu', 'পেট', 'પેટ', 'ಹೊಟ್ಟೆ', 'വയർ', 'ਪੇਟ'],
+    'chest': ['chhati', 'chati', 'seena', 'seene', 'छाती', 'सीना', 'सीने', 'நெஞ்சு', 'ఛాతీ', 'বুক', 'છાતી', 'ಎದೆ', 'നെഞ്ച്', 'ਛਾਤੀ'],
+    'back': ['peeth', 'kamar', 'पीठ', 'कमर', 'पाठ', 'முதுகு', 'నడుము', 'পিঠ', 'ਪਿੱਠ'],
+    'throat': ['gala', 'gale', 'गला', 'गले', 'घसा', 'தொண்டை', 'గొంతు', 'গলা', 'ਗਲਾ'],
+    'eye': ['eyes', 'aankh', 'ankh', 'aankhen', 'आंख', 'आँख', 'आंखों', 'डोळा', 'கண்', 'కన్ను', 'চোখ', 'ਅੱਖ'],
+    'ear': ['ears', 'kaan', 'कान', 'காது', 'చెవి', 'কান', 'ਕੰਨ'],
+    'nose': ['naak', 'नाक', 'மூக்கு', 'ముక్కు', 'নাক', 'ਨੱਕ'],
+    'tooth': ['teeth', 'daant', 'dant', 'दांत', 'दाँत', 'பல்', 'పన్ను', 'দাঁত', 'ਦੰਦ'],
+    'leg': ['legs', 'foot', 'feet', 'pair', 'pairon', 'taang', 'पैर', 'पैरों', 'टांग', 'पाय', 'கால்', 'కాలు', 'পা', 'ਲੱਤ'],
+    'hand': ['hands', 'haath', 'hath', 'हाथ', 'கை', 'చేయి', 'হাত', 'ਹੱਥ'],
+    'arm': ['arms', 'baanh', 'bazu', 'बांह', 'बाजू'],
+    'knee': ['knees', 'ghutna', 'ghutne', 'घुटना', 'घुटने', 'गुडघा', 'முழங்கால்', 'మోకాలు', 'হাঁটু', 'ਗੋਡਾ'],
+    'joint': ['joints', 'jod', 'jodon', 'जोड़', 'जोड़ों', 'மூட்டு', 'కీళ్లు', 'গাঁট'],
+    'skin': ['twacha', 'chamdi', 'त्वचा', 'चमड़ी', 'தோல்', 'చర్మం', 'ত্বক', 'ਚਮੜੀ'],
+    'heart': ['dil', 'hriday', 'दिल', 'हृदय', 'இதயம்', 'గుండె', 'হৃদয়', 'ਦਿਲ'],
+    'kidney': ['kidneys', 'gurda', 'gurde', 'गुर्दा', 'गुर्दे', 'किडनी', 'சிறுநீரகம்', 'మూత్రపిండం', 'কিডনি'],
+    'liver': ['jigar', 'liver', 'जिगर', 'लीवर', 'यकृत', 'கல்லீரல்', 'కాలేయం', 'যকৃত'],
+    'lungs': ['lung', 'fefde', 'phephde', 'फेफड़े', 'फुफ्फुस', 'நுரையீரல்', 'ఊపిరితిత్తులు', 'ফুসফুস'],
+    'neck': ['gardan', 'गर्दन', 'मान', 'கழுத்து', 'మెడ', 'ঘাড়', 'ਗਰਦਨ'],
+    'shoulder': ['shoulders', 'kandha', 'kandhe', 'कंधा', 'कंधे', 'தோள்', 'భుజం', 'কাঁধ'],
+    'tongue': ['jeebh', 'जीभ', 'நாக்கு', 'నాలుక', 'জিভ'],
+}
+
+# A symptom implies where it hurts; Comprehend reports both.
+IMPLIED_BODY_PART = {
+    'headache': 'head', 'stomach pain': 'abdomen', 'chest pain': 'chest',
+    'back pain': 'back', 'sore throat': 'throat', 'joint pain': 'joint',
+    'toothache': 'tooth', 'ear pain': 'ear', 'eye pain': 'eye',
+}
+
+# Romanized words that are also ordinary English words — only matched in
+# Hinglish text.
+AMBIGUOUS_ROMAN = {
+    'sir', 'sar', 'pair', 'pet', 'dil', 'gala', 'jor', 'tap', 'dane', 'mox',
+    'sali', 'vali', 'gas', 'dama', 'jod', 'hath', 'bp', 'tb', 'eno', 'azee',
+    'sun', 'sine', 'pith', 'tang', 'kan', 'fit',
+}
+
+# English words that name an entity only colloquially ("sugar" for
+# diabetes). extract(lay=False) ignores them.
+LAY_ENGLISH = {
+    'sugar', 'cold', 'temperature', 'fits', 'gastric', 'gas', 'acidity',
+    'paralysis', 'thyroid',
+}
+
+# Common Hindi function words in romanized text.
+HINGLISH_MARKERS = {
+    'hai', 'hain', 'tha', 'thi', 'raha', 'rahi', 'rahe', 'mein', 'mujhe', 'mera',
+    'meri', 'mere', 'se', 'ka', 'ki', 'ke', 'ko', 'nahi', 'nahin', 'bahut', 'bohot',
+    'aur', 'kal', 'din', 'hua', 'hui', 'lagta', 'lagti', 'kya', 'bhi', 'abhi',
+    'hota', 'hoti', 'ho', 'gaya', 'gayi', 'wala', 'wali',
+}
+
+_NUM = (
+    r'\d+|a|an|one|two|three|four|five|six|seven|ten|few|couple of|several|'
+    r'ek|do|teen|char|chaar|paanch|panch|chhe|saat|das|kai|'
+    r'एक|दो|तीन|चार|पांच|पाँच|छह|सात|आठ|दस|कई'
+)
+_UNIT = (
+    r'minutes?|hours?|days?|weeks?|months?|years?|'
+    r'ghante|ghanta|ghanton|din|dino|dinon|hafte|hafta|haftay|mahine|mahina|saal|baras|'
+    r'घंटे|घंटा|दिन|दिनों|हफ्ते|हफ़्ते|हफ्ता|सप्ताह|महीने|महीना|साल|वर्ष|'
+    r'நாட்களாக|நாட்கள்|நாள்|வாரம்|மாதம்|రోజులుగా|రోజులు|రోజు|వారం|నెల|'
+    r'দিন|সপ্তাহ|মাস|દિવસ|અઠવાડિયા|ದಿನ|ദിവസം|ਦਿਨ|ਹਫ਼ਤੇ'
+)
+# Word boundaries: \b alone would split Indic words at their vowel signs,
+# so letters of the Indic blocks count as word characters too
+_WORD = r'\w\u0900-\u0dff'
+DURATION_RE = re.compile(
+    rf'(?<![{_WORD}])(?:'
+    rf'(?:(?:for|since|past|last|from)\s+)?(?:{_NUM})\s*(?:{_UNIT})(?:\s*(?:se|से|ago|now|ধরে))?'
+    r'|(?:kal|parso|subah|raat|कल|परसों|सुबह|रात)\s+(?:se|से)'
+    r'|since (?:yesterday|morning|last night)|(?:yesterday|last night) onwards'
+    rf')(?![{_WORD}])',
+    re.IGNORECASE,
+)
+
+_TOKEN_RE = re.compile(r'[^\s.,;:!?()\[\]{}"\'/\\|।॥\-–—]+')
+# Trailing halant/virama/pulli — dropped so the stem matches inflected forms
+_VIRAMAS  = '्্੍્୍்్್്'
+_MIN_STEM = 3
+
+
+def _plain(token: str) -> str:
+    token = unicodedata.normalize('NFC', token).lower()
+    return token.replace('़', '').replace('ँ', 'ं')   # nukta, chandrabindu
+
+
+def _fold(token: str) -> str:
+    """Romanization fold — bukhaar, bukhhar and bukhar all become bukhar."""
+    token = _plain(token)
+    if token.isascii():
+        for a, b in (('ph', 'f'), ('ee', 'i'), ('oo', 'u'), ('z', 'j'), ('w', 'v'), ('q', 'k')):
+            token = token.replace(a, b)
+        token = re.sub(r'(.)\1+', r'\1', token)
+    return token
+
+
+def _tokens(text: str) -> list:
+    return [_plain(t) for t in _TOKEN_RE.findall(text)]
+
+
+_AMBIGUOUS_FOLDED = {_fold(w) for w in AMBIGUOUS_ROMAN}
+
+
+def _compile():
+    """
+    Phrase indexes — first token → [(tokens, category, canonical, ambiguous,
+    lay)], longest first — for listed spellings and for folded romanized variants;
+    plus Indic stems.
+    """
+    phrases, folded, stems = {}, {}, {}
+    for category, table in (('symptoms', SYMPTOMS), ('conditions', CONDITIONS),
+                            ('medications', MEDICATIONS), ('body_parts', BODY_PARTS)):
+        for canonical, variants in table.items():
+            for variant in [canonical] + variants:
+                toks = tuple(_tokens(variant))
+                if not toks:
+                    continue
+                entry = (toks, category, canonical, len(toks) == 1 and toks[0] in AMBIGUOUS_ROMAN,
+                         variant in LAY_ENGLISH)
+                phrases.setdefault(toks[0], []).append(entry)
+                if len(toks) == 1 and not toks[0].isascii():
+                    stem = toks[0].rstrip(_VIRAMAS)
+                    if len(stem) >= _MIN_STEM:
+                        stems.setdefault(stem, entry)
+                # English terms are never folded — "feet" must not become "fit"
+                if variant == canonical or not variant.isascii():
+                    continue
+                ftoks = tuple(_fold(t) for t in toks)
+                if ftoks != toks:
+                    folded.setdefault(ftoks[0], []).append(
+                        (ftoks, category, canonical, len(ftoks) == 1 and ftoks[0] in _AMBIGUOUS_FOLDED,
+                         False))
+    for index in (phrases, folded):
+        for entries in index.values():
+            entries.sort(key=lambda e: -len(e[0]))
+    return phrases, folded, stems
+
+
+_PHRASES, _FOLDED, _STEMS = _compile()
+_LONGEST = max(len(e[0]) for entries in _PHRASES.values() for e in entries)
+
+
+def script_profile(text: str) -> tuple:
+    """(latin letters, other letters) — marks count with their base letter."""
+    latin = other = 0
+    for ch in text:
+        if ch.isascii():
+            latin += ch.isalpha()
+        elif unicodedata.category(ch)[0] in 'LM':
+            other += 1
+    return latin, other
+
+
+def is_hinglish(tokens: list) -> bool:
+    hits = sum(1 for t in tokens if t in HINGLISH_MARKERS)
+    return hits >= 2 and hits / max(1, len(tokens)) >= 0.15
+
+
+def is_english(text: str) -> bool:
+    """Latin-script text that is not romanized Hindi — what Comprehend Medical can read."""
+    latin, other = script_profile(text)
+    if latin == 0 or other > latin * 0.2:
+        return False
+    return not is_hinglish(_tokens(text))
+
+
+def _match(tokens: list, i: int, hinglish: bool, lay: bool = True):
+    # Listed spellings first, then the folded romanized variants
+    window = tokens[i:i + _LONGEST]
+    for index, toks_at in ((_PHRASES, window), (_FOLDED, [_fold(t) for t in window])):
+        for toks, category, canonical, ambiguous, is_lay in index.get(toks_at[0], ()):
+            if (ambiguous and not hinglish) or (is_lay and not lay):
+                continue
+            if tuple(toks_at[:len(toks)]) == toks:
+                return len(toks), category, canonical
+    token = tokens[i]
+    if not token.isascii():
+        for k in range(len(token) - 1, _MIN_STEM - 1, -1):
+            entry = _STEMS.get(token[:k])
+            if entry:
+                return 1, entry[1], entry[2]
+    return 0, None, None
+
+
+def extract(text: str, lay: bool = True) -> dict:
+    """
+    Entities found in `text`, de-duplicated, in order of appearance.
+    lay=False skips lay synonyms (LAY_ENGLISH).
+    """
+    entities = {'symptoms': [], 'conditions': [], 'medications': [],
+                'body_parts': [], 'durations': []}
+    tokens   = _tokens(text)
+    hinglish = is_hinglish(tokens)
+
+    i = 0
+    while i < len(tokens):
+        n, category, canonical = _match(tokens, i, hinglish, lay)
+        if not n:
+            i += 1
+            continue
+        entities[category].append(canonical)
+        if canonical in IMPLIED_BODY_PART:
+            entities['body_parts'].append(IMPLIED_BODY_PART[canonical])
+        i += n
+
+    # Localized digits (३, ௩, ৩ …) → ASCII so the duration pattern sees them
+    digits = ''.join(str(unicodedata.digit(ch)) if ch.isdigit() else ch for ch in text)
+    entities['durations'] = [m.group(0).strip() for m in DURATION_RE.finditer(digits)]
+
+    # Generic 'pain' adds nothing next to a specific one
+    if len(entities['symptoms']) > 1 and any(s in IMPLIED_BODY_PART for s in entities['symptoms']):
+        entities['symptoms'] = [s for s in entities['symptoms'] if s != 'pain']
+
+    return {k: list(dict.fromkeys(v)) for k, v in entities.items()}
@@ -0,0 +1,206 @@
+"""
+shared/icd10.py
+
+Offline ICD-10-CM lookup. scripts/build_icd10_index.py compiles the CMS
+ICD-10-CM tabular list (plus a lay-term synonym table) into one binary
+file, shared/data/icd10.idx, which is bundled with the lambdas and
+memory-mapped on first use. Resolving a condition string is then a trie
+walk over the mmap — microseconds, no network, no per-call cost — instead
+of an infer_icd10_cm round trip.
+
+Terms are normalised before both indexing and lookup (normalize()):
+lowercase, ASCII-folded, punctuation and filler words ("unspecified",
+"of", "the"…) dropped, plurals stemmed and tokens sorted, so
+"Fever, unspecified" and "unspecified fever" share a key. A miss retries
+with each single token dropped ("severe chest pain" → "chest pain").
+
+File layout (little-endian):
+  header   MAGIC, u32 n_entries, u32 entries_off, u32 strings_off, u32 root_off
+  entries  n_entries × (u32 code_off, u16 code_len, u32 desc_off, u16 desc_len)
+  strings  UTF-8 codes and descriptions
+  trie     radix-trie nodes:
+             u16 label_len, label bytes, u32 entry+1 (0 = none), u16 n_children,
+             n_children × u8 first byte (sorted), n_children × u32 child offset
+
+Env vars:
+  ICD10_INDEX  — path to the index (default shared/data/icd10.idx)
+"""
+
+import mmap
+import os
+import re
+import struct
+import threading
+import unicodedata
+
+INDEX_PATH = os.environ.get(
+    'ICD10_INDEX', os.path.join(os.path.dirname(__file__), 'data', 'icd10.idx')
+)
+
+MAGIC   = b'ICD10IX1'
+_HEADER = struct.Struct('<8sIIII')
+_ENTRY  = struct.Struct('<IHIH')
+_NODE   = struct.Struct('<IH')      # entry+1, n_children (after the label)
+_U16    = struct.Struct('<H')
+_U32    = struct.Struct('<I')
+
+STOPWORDS = {
+    'a', 'an', 'and', 'as', 'at', 'by', 'for', 'in', 'of', 'on', 'or', 'the', 'to',
+    'unspecified', 'nos', 'disease', 'disorder',
+}
+MAX_FALLBACK_TOKENS = 6
+
+
+def normalize(term: str) -> str:
+    """Order-independent lookup key for a term ('' when nothing is left)."""
+    term = unicodedata.normalize('NFKD', term.lower())
+    term = ''.join(ch for ch in term if not unicodedata.combining(ch))
+    tokens = set()
+    for tok in re.findall(r'[a-z0-9]+', term):
+        if tok in STOPWORDS:
+            continue
+        if len(tok) > 3 and tok.endswith('s') and not tok.endswith(('ss', 'us', 'is')):
+            tok = tok[:-1]
+        tokens.add(tok)
+    return ' '.join(sorted(tokens))
+
+
+class Index:
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_entries, self._entries, self._strings, self._root = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an ICD-10 index')
+
+    def entry(self, i: int) -> tuple:
+        code_off, code_len, desc_off, desc_len = \
+            _ENTRY.unpack_from(self._mm, self._entries + i * _ENTRY.size)
+        base = self._strings
+        return (self._mm[base + code_off:base + code_off + code_len].decode('utf-8'),
+                self._mm[base + desc_off:base + desc_off + desc_len].decode('utf-8'))
+
+    def _find(self, key: bytes) -> int:
+        mm, off, i = self._mm, self._root, 0
+        while True:
+            (label_len,) = _U16.unpack_from(mm, off)
+            off += 2
+            if key[i:i + label_len] != mm[off:off + label_len]:
+                return -1
+            i   += label_len
+            off += label_len
+            value, n = _NODE.unpack_from(mm, off)
+            off += _NODE.size
+            if i == len(key):
+                return value - 1
+            k = mm[off:off + n].find(key[i:i + 1])
+            if k < 0:
+                return -1
+            (off,) = _U32.unpack_from(mm, off + n + 4 * k)
+
+    def lookup(self, term: str):
+        """(code, description) for `term`, or None."""
+        key = normalize(term)
+        if not key:
+            return None
+        i = self._find(key.encode('utf-8'))
+        if i < 0:
+            tokens = key.split(' ')
+            if 1 < len(tokens) <= MAX_FALLBACK_TOKENS:
+                for drop in range(len(tokens)):
+                    i = self._find(' '.join(tokens[:drop] + tokens[drop + 1:]).encode('utf-8'))
+                    if i >= 0:
+                        break
+        return self.entry(i) if i >= 0 else None
+
+
+_index = None
+_index_lock = threading.Lock()
+_missing = False
+
+
+def index():
+    """The mapped index, or None when it has not been built/bundled."""
+    global _index, _missing
+    if _index is None and not _missing:
+        with _index_lock:
+            if _index is None and not _missing:
+                try:
+                    _index = Index(INDEX_PATH)
+                except (OSError, ValueError) as e:
+                    print(f'[icd10] no local index ({e}) — run scripts/build_icd10_index.py')
+                    _missing = True
+    return _index
+
+
+def available() -> bool:
+    return index() is not None
+
+
+def lookup_all(terms: list) -> dict:
+    """{term: {code, description}} for every term the index resolves — same shape as ner.infer_icd10()."""
+    idx, out = index(), {}
+    if idx is None:
+        return out
+    for term in terms:
+        hit = idx.lookup(term)
+        if hit:
+            out[term] = {'code': hit[0], 'description': hit[1]}
+    return out
+
+
+# ── Build side (scripts/build_icd10_index.py) ──────────────────────────────────
+
+def write_index(path: str, entries: list, keys: dict):
+    """
+    entries — [(code, description)]
+    keys    — normalised key → entry number
+    """
+    strings, table = bytearray(), bytearray()
+    for code, desc in entries:
+        c, d = code.encode('utf-8'), desc.encode('utf-8')
+        table += _ENTRY.pack(len(strings), len(c), len(strings) + len(c), len(d))
+        strings += c + d
+
+    entries_off = _HEADER.size
+    strings_off = entries_off + len(table)
+    trie_base   = strings_off + len(strings)
+
+    trie  = bytearray()
+    items = sorted((k.encode('utf-8'), v) for k, v in keys.items() if k)
+
+    def write_node(label: bytes, lo: int, hi: int, depth: int) -> int:
+        """Write the node for items[lo:hi] (all sharing items[lo][0][:depth]); returns its offset."""
+        value = 0
+        if items[lo][0] and len(items[lo][0]) == depth:
+            value = items[lo][1] + 1
+            lo += 1
+        firsts, offsets = bytearray(), []
+        while lo < hi:
+            first = items[lo][0][depth]
+            end = lo
+            while end < hi and items[end][0][depth] == first:
+                end += 1
+            a, b = items[lo][0], items[end - 1][0]
+            lcp = depth
+            while lcp < min(len(a), len(b)) and a[lcp] == b[lcp]:
+                lcp += 1
+            offsets.append(write_node(a[depth:lcp], lo, end, lcp))
+            firsts.append(first)
+            lo = end
+        off = trie_base + len(trie)
+        trie.extend(_U16.pack(len(label)) + label + _NODE.pack(value, len(firsts)) + firsts)
+        for child in offsets:
+            trie.extend(_U32.pack(child))
+        return off
+
+    root = write_node(b'', 0, len(items), 0) if items else trie_base
+    if not items:
+        trie.extend(_U16.pack(0) + _NODE.pack(0, 0))
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(entries), entries_off, strings_off, root))
+        f.write(table)
+        f.write(strings)
+        f.write(trie)
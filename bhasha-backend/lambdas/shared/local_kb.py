@@ -0,0 +1,354 @@
+"""
+shared/local_kb.py
+
+In-process retrieval over the prepared KB corpus — the local replacement
+for the cross-region Bedrock Knowledge Base Retrieve call.
+scripts/build_vector_index.py embeds the `prepare_kb_docs.py --local-only`
+chunks with Titan Text Embeddings v2 into a directory:
+
+  chunks.jsonl         one {source, title, text, file} per row
+  chunks.off           uint64 byte offsets into chunks.jsonl (count + 1)
+  chunks.meta.json     {count, digest} — digest: SHA-1 of chunks.jsonl
+  meta.json            {model, dim, count, nlist, digest}
+  vectors.f16          count × dim float16, unit-normalised (memory-mapped)
+  vectors.keys         `file<TAB>sha1` per row — build-time only, for reuse on re-runs
+  ivf.centroids.f16    nlist × dim   ┐
+  ivf.lists.i32        row ids grouped by list   ├ optional IVF partitioning
+  ivf.offsets.i64      nlist + 1 list boundaries ┘
+
+scripts/build_bm25_index.py adds a lexical BM25 index over the same rows
+(bm25.* — shared/bm25.py). With both present, retrieve() fuses the two
+rankings with reciprocal rank fusion (LOCAL_KB_MODE=hybrid, the default):
+vector search finds paraphrases, BM25 pins exact drug / test / disease
+names. Either index also works alone.
+
+Row ids tie the three together, so each index header (meta.json,
+bm25.meta.json) records the chunk count and digest of the chunks.jsonl it
+was built from. LocalKB refuses to load when a header, chunks.off or the
+file size disagrees with chunks.meta.json — e.g. the vector index was
+rebuilt over new chunks but BM25 was not — rather than return other rows'
+text; callers then keep using the Bedrock Knowledge Base.
+
+A query is embedded once (one Titan call, cached per text in shared/cache.py)
+and scored in-process:
+  - IVF:   only the LOCAL_KB_NPROBE lists whose centroids score highest are
+    scanned — single-digit ms over ~180k rows (the default index layout)
+  - exact: block-wise float32 dot products over the whole mmap'd matrix with
+    an argpartition top-k per block, so memory stays bounded. Dominated by
+    the float16 → float32 conversion; tens of ms at 180k rows, so it is the
+    fallback for small indexes and LOCAL_KB_NPROBE=0.
+
+numpy is imported lazily; without it, or without an index, available() is
+False and callers keep using the Bedrock Knowledge Base. If the query
+embedding call fails, hybrid mode answers from BM25 alone.
+
+Env vars:
+  LOCAL_KB_DIR      — index directory (e.g. an EFS mount), or s3://bucket/prefix/
+                      to download it to /tmp on cold start. Unset = disabled.
+  LOCAL_KB_NPROBE   — IVF lists scanned per query (default 8; 0 = exact search)
+  LOCAL_KB_MODE     — hybrid (default) | vector | bm25
+  EMBED_REGION      — Titan embeddings region (default APP_REGION)
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+
+from . import bm25, circuit
+from .cache import TieredCache, content_key
+
+APP_REGION   = os.environ.get('APP_REGION', 'ap-south-1')
+EMBED_REGION = os.environ.get('EMBED_REGION', APP_REGION)
+KB_DIR       = os.environ.get('LOCAL_KB_DIR', '')
+NPROBE       = int(os.environ.get('LOCAL_KB_NPROBE', '8'))
+MODE         = os.environ.get('LOCAL_KB_MODE', 'hybrid')
+FUSE_DEPTH   = 4      # each ranking contributes k · FUSE_DEPTH candidates to RRF
+
+EMBED_MODEL  = 'amazon.titan-embed-text-v2:0'
+BLOCK_ROWS   = 32768
+TMP_DIR      = '/tmp/kb_index'
+
+_query_cache = TieredCache('emb', ttl_s=30 * 24 * 3600, max_items=1024)
+
+
+def embed(client, text: str, dim: int) -> list:
+    """Unit-normalised Titan v2 embedding of `text`."""
+    with circuit.guard('embed'):
+        resp = client.invoke_model(
+            modelId=EMBED_MODEL,
+            body=json.dumps({'inputText': text[:20000], 'dimensions': dim, 'normalize': True}),
+        )
+    return json.loads(resp['body'].read())['embedding']
+
+
+class ChunkStore:
+    def __init__(self, path: str):
+        import numpy as np
+        with open(os.path.join(path, 'chunks.meta.json')) as f:
+            self.meta = json.load(f)
+        self.offsets = np.fromfile(os.path.join(path, 'chunks.off'), dtype=np.uint64)
+        self.count   = len(self.offsets) - 1
+        self.digest  = self.meta['digest']
+        size = os.path.getsize(os.path.join(path, 'chunks.jsonl'))
+        if self.count != self.meta['count'] or int(self.offsets[-1]) != size:
+            raise ValueError(f'chunk store is inconsistent: chunks.off has {self.count} rows ending '
+                             f'at byte {int(self.offsets[-1])}, chunks.jsonl has {size} bytes, '
+                             f'chunks.meta.json says {self.meta["count"]} rows')
+        with open(os.path.join(path, 'chunks.jsonl'), 'rb') as f:
+            self._chunks = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def check(self, name: str, header: dict):
+        """Raise unless an index `header` was built from this chunk store."""
+        if header.get('count') != self.count or header.get('digest') != self.digest:
+            raise ValueError(f'{name} was built from other chunks ({header.get("count")} rows, '
+                             f'digest {header.get("digest")}) than chunks.jsonl '
+                             f'({self.count} rows, digest {self.digest}) — rebuild it')
+
+    def chunk(self, row: int) -> dict:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._chunks[start:end])
+
+
+class VectorIndex:
+    def __init__(self, path: str):
+        import numpy as np
+        self.np = np
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        n, d = self.meta['count'], self.meta['dim']
+        self.vectors = np.memmap(os.path.join(path, 'vectors.f16'), dtype=np.float16,
+                                 mode='r', shape=(n, d))
+
+        self.nlist = self.meta.get('nlist', 0)
+        if self.nlist:
+            self.centroids = np.fromfile(os.path.join(path, 'ivf.centroids.f16'),
+                                         dtype=np.float16).reshape(self.nlist, d).astype(np.float32)
+            self.lists     = np.memmap(os.path.join(path, 'ivf.lists.i32'), dtype=np.int32,
+                                       mode='r', shape=(n,))
+            self.list_off  = np.fromfile(os.path.join(path, 'ivf.offsets.i64'), dtype=np.int64)
+
+    def search(self, queries, k: int = 5, nprobe: int = NPROBE):
+        """
+        Top-k rows for each query vector (m × dim). Returns (ids, scores),
+        both m × k, best first.
+        """
+        np = self.np
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, self.meta['dim'])
+        if self.nlist and nprobe:
+            return self._search_ivf(q, k, min(nprobe, self.nlist))
+
+        cand_ids, cand_scores = [], []
+        for start in range(0, len(self.vectors), BLOCK_ROWS):
+            block  = np.asarray(self.vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            scores = q @ block.T                                   # m × rows
+            kk     = min(k, scores.shape[1])
+            top    = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+            cand_ids.append(top + start)
+            cand_scores.append(np.take_along_axis(scores, top, axis=1))
+        return self._best(np.hstack(cand_ids), np.hstack(cand_scores), k)
+
+    def _search_ivf(self, q, k: int, nprobe: int):
+        np = self.np
+        probes = np.argpartition(-(q @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        all_ids, all_scores = [], []
+        for qi, lists in enumerate(probes):
+            rows = np.concatenate([self.lists[self.list_off[l]:self.list_off[l + 1]] for l in lists])
+            rows.sort()    # sequential reads from the mmap
+            scores = np.asarray(self.vectors[rows], dtype=np.float32) @ q[qi]
+            kk  = min(k, len(rows))
+            top = np.argpartition(-scores, kk - 1)[:kk] if kk else np.array([], dtype=np.int64)
+            ids = np.full(k, -1, dtype=np.int64)
+            sc  = np.full(k, -np.inf, dtype=np.float32)
+            ids[:kk], sc[:kk] = rows[top], scores[top]
+            all_ids.append(ids)
+            all_scores.append(sc)
+        return self._best(np.vstack(all_ids), np.vstack(all_scores), k)
+
+    def _best(self, ids, scores, k: int):
+        np = self.np
+        k = min(k, ids.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        ids, scores = np.take_along_axis(ids, top, 1), np.take_along_axis(scores, top, 1)
+        order = np.argsort(-scores, axis=1)
+        return np.take_along_axis(ids, order, 1), np.take_along_axis(scores, order, 1)
+
+
+# ── Container-level index ─────────────────────────────────────────────────────
+
+class LocalKB:
+    """Chunk store plus whichever of the vector / BM25 indexes were built."""
+
+    def __init__(self, path: str):
+        self.chunks  = ChunkStore(path)
+        self.vectors = VectorIndex(path) if os.path.exists(os.path.join(path, 'meta.json')) else None
+        self.lexical = (bm25.BM25Index(path)
+                        if os.path.exists(os.path.join(path, 'bm25.meta.json')) else None)
+        if MODE == 'vector':
+            self.lexical = None
+        elif MODE == 'bm25':
+            self.vectors = None
+        if not (self.vectors or self.lexical):
+            raise FileNotFoundError(f'no vector or BM25 index in {path} for mode {MODE}')
+        if self.vectors:
+            self.chunks.check('meta.json', self.vectors.meta)
+        if self.lexical:
+            self.chunks.check('bm25.meta.json', self.lexical.meta)
+
+
+_kb = None
+_kb_lock = threading.Lock()
+_failed = False
+
+
+def _download(uri: str) -> str:
+    """Copy an s3://bucket/prefix/ index to /tmp once per container."""
+    import boto3
+    bucket, _, prefix = uri[len('s3://'):].partition('/')
+    prefix = prefix.rstrip('/') + '/'
+    marker = os.path.join(TMP_DIR, '.complete')
+    if os.path.exists(marker):
+        return TMP_DIR
+    os.makedirs(TMP_DIR, exist_ok=True)
+    s3 = boto3.client('s3', region_name=APP_REGION)
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            name = obj['Key'][len(prefix):]
+            if name and '/' not in name:
+                s3.download_file(bucket, obj['Key'], os.path.join(TMP_DIR, name))
+    open(marker, 'w').close()
+    return TMP_DIR
+
+
+def kb():
+    """The loaded LocalKB, or None when disabled / unavailable."""
+    global _kb, _failed
+    if _kb is None and KB_DIR and not _failed:
+        with _kb_lock:
+            if _kb is None and not _failed:
+                try:
+                    path = _download(KB_DIR) if KB_DIR.startswith('s3://') else KB_DIR
+                    _kb = LocalKB(path)
+                    print(f'[local_kb] {_kb.chunks.count:,} chunks, '
+                          f'vectors={bool(_kb.vectors)} '
+                          f'(nlist={_kb.vectors.nlist if _kb.vectors else 0}), '
+                          f'bm25={bool(_kb.lexical)}')
+                except Exception as e:
+                    print(f'[local_kb] unavailable: {e}')
+                    _failed = True
+    return _kb
+
+
+def available() -> bool:
+    return kb() is not None
+
+
+def _vector_ranking(idx: VectorIndex, query: str, depth: int, client) -> list:
+    dim = idx.meta['dim']
+    key = content_key(EMBED_MODEL, str(dim), ' '.join(query.split()))
+    vec = _query_cache.get(key)
+    if vec is None:
+        vec = embed(client(), query, dim)
+        _query_cache.put(key, vec)
+    ids, scores = idx.search([vec], depth)
+    return [(int(r), float(sc)) for r, sc in zip(ids[0], scores[0]) if r >= 0]
+
+
+def retrieve(query: str, k: int = 5, client=None) -> list:
+    """
+    [{text, source, title, score}] for the k best chunks. `client` is a
+    zero-argument factory for a bedrock-runtime client, called only when the
+    query embedding is not cached. `score` is the cosine similarity, the
+    BM25 score, or — when both rankings are fused — the RRF score.
+    """
+    local = kb()
+    if local is None:
+        return []
+
+    rankings = []
+    if local.vectors:
+        try:
+            rankings.append(_vector_ranking(local.vectors, query,
+                                            k * FUSE_DEPTH if local.lexical else k, client))
+        except Exception as e:
+            if not local.lexical:
+                raise
+            print(f'[local_kb] vector search failed, BM25 only: {e}')
+    if local.lexical:
+        rankings.append(local.lexical.search(query, k * FUSE_DEPTH if local.vectors else k))
+
+    if len(rankings) > 1:
+        ranked = bm25.rrf([[row for row, _ in r] for r in rankings])[:k]
+    else:
+        ranked = rankings[0][:k] if rankings else []
+
+    results = []
+    for row, score in ranked:
+        chunk = local.chunks.chunk(row)
+        chunk['score'] = score
+        results.append(chunk)
+    return results
+
+
+# ── Build side (scripts/build_vector_index.py, scripts/build_bm25_index.py) ────
+
+def read_chunk(path: str, root: str) -> dict:
+    """Parse a prepare_kb_docs.py file: `Source: / Section|Title: / ---` header, then the text."""
+    with open(path, encoding='utf-8') as f:
+        raw = f.read()
+    header, sep, body = raw.partition('\n---\n')
+    if not sep:
+        header, body = '', raw
+    meta = dict(line.split(': ', 1) for line in header.splitlines() if ': ' in line)
+    return {
+        'source': meta.get('Source', os.path.basename(path)),
+        'title':  meta.get('Section') or meta.get('Title', ''),
+        'text':   body.strip(),
+        'file':   os.path.relpath(path, root),
+    }
+
+
+def chunk_files(root: str, limit: int = 0) -> list:
+    files = sorted(os.path.join(d, f) for d, _, fs in os.walk(root) for f in fs if f.endswith('.txt'))
+    return files[:limit] if limit else files
+
+
+def write_chunks(files: list, root: str, out_dir: str) -> int:
+    """chunks.jsonl + chunks.off + chunks.meta.json for `files`, in order; returns the row count."""
+    from array import array
+    offsets, digest = array('Q', [0]), hashlib.sha1()
+    with open(os.path.join(out_dir, 'chunks.jsonl'), 'wb') as out:
+        for path in files:
+            line = json.dumps(read_chunk(path, root), ensure_ascii=False).encode('utf-8') + b'\n'
+            out.write(line)
+            digest.update(line)
+            offsets.append(out.tell())
+    with open(os.path.join(out_dir, 'chunks.off'), 'wb') as f:
+        offsets.tofile(f)
+    with open(os.path.join(out_dir, 'chunks.meta.json'), 'w') as f:
+        json.dump({'count': len(files), 'digest': digest.hexdigest()}, f)
+    return len(files)
+
+
+def chunk_meta(out_dir: str) -> dict:
+    """{count, digest} of an existing chunk store — what index headers record."""
+    path = os.path.join(out_dir, 'chunks.meta.json')
+    if not os.path.exists(path):
+        # Stores written before chunks.meta.json existed
+        count, digest = 0, hashlib.sha1()
+        with open(os.path.join(out_dir, 'chunks.jsonl'), 'rb') as f:
+            for line in f:
+                count += 1
+                digest.update(line)
+        with open(path, 'w') as f:
+            json.dump({'count': count, 'digest': digest.hexdigest()}, f)
+    with open(path) as f:
+        return json.load(f)
+
+
+def iter_chunks(out_dir: str):
+    """Rows of an existing chunks.jsonl, in order."""
+    with open(os.path.join(out_dir, 'chunks.jsonl'), encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
@@ -0,0 +1,189 @@
+"""
+shared/ner.py
+
+Comprehend Medical NER and ICD-10 inference behind a content-hash cache
+(shared/cache.py). Frontend retries and repeat questions send identical
+text, so within the TTL each distinct text costs at most one
+detect_entities_v2 and one infer_icd10_cm round trip across all call sites.
+
+The cache stores the filtered structure the handlers actually use, never
+the raw Comprehend response:
+  detect_entities() → {symptoms, conditions, medications, body_parts, durations}
+  infer_icd10()     → {entity text: {code, description}}
+
+Comprehend Medical only reads English. Every text first goes through the
+local gazetteer (shared/gazetteer.py); Comprehend is only called when it can
+add something — English text that is longer than NER_SHORT_WORDS words or
+where the gazetteer found nothing but lay synonyms ("sugar"). Hindi, other Indic scripts and Hinglish
+are answered locally. When Comprehend is called, gazetteer hits it missed
+are appended to its result. A failed call (error, open circuit, no time
+budget) raises: callers fall back to gazetteer.extract() and record the
+stage as degraded, so the response says the entities came from the
+gazetteer alone.
+
+`client` is a zero-argument callable returning a comprehendmedical client;
+it is only called on a miss, so cache hits skip client creation and the
+caller's deadline check. Failed calls are never cached.
+
+Env vars:
+  CACHE_TABLE      — optional shared DynamoDB tier (see shared/cache.py)
+  NER_CACHE_TTL_S  — seconds a result stays valid (default 7 days)
+  NER_CACHE_SIZE   — in-process LRU entries per cache (default 512)
+  NER_MODE         — auto (default) | local (never call Comprehend) | comprehend (always)
+  NER_SHORT_WORDS  — English texts up to this many words skip Comprehend
+                     when the gazetteer found something (default 6)
+  ICD10_MODE       — local (default): resolve extracted entities against the
+                     offline index (shared/icd10.py) when it is bundled;
+                     comprehend: always use infer_icd10_cm (higher precision)
+"""
+
+import os
+
+from . import circuit, gazetteer, icd10
+from .cache import TieredCache, content_key
+
+TTL_S       = float(os.environ.get('NER_CACHE_TTL_S', str(7 * 24 * 3600)))
+SIZE        = int(os.environ.get('NER_CACHE_SIZE', '512'))
+MODE        = os.environ.get('NER_MODE', 'auto')
+SHORT_WORDS = int(os.environ.get('NER_SHORT_WORDS', '6'))
+ICD_MODE    = os.environ.get('ICD10_MODE', 'local')
+
+MIN_SCORE     = 0.6
+ICD_MIN_SCORE = 0.7
+
+CATEGORY_KEYS = {
+    'SIGN_OR_SYMPTOM':   'symptoms',
+    'MEDICAL_CONDITION': 'conditions',
+    'MEDICATION':        'medications',
+    'ANATOMY':           'body_parts',
+    'TIME_EXPRESSION':   'durations',
+}
+
+_entities_cache = TieredCache('ner', TTL_S, SIZE)
+_icd_cache      = TieredCache('icd10', TTL_S, SIZE)
+
+STATS = {'local': 0, 'comprehend': 0, 'comprehend_failed': 0}
+
+
+def _normalize(text: str, limit: int) -> str:
+    return ' '.join(text.split())[:limit]
+
+
+def _copy(entities: dict) -> dict:
+    return {k: list(v) for k, v in entities.items()}
+
+
+def needs_comprehend(text: str, local: dict) -> bool:
+    """Whether Comprehend can add anything to the gazetteer result for `text`."""
+    if MODE in ('local', 'comprehend'):
+        return MODE == 'comprehend'
+    if not gazetteer.is_english(text):
+        return False
+    found = any(local[k] for k in ('symptoms', 'conditions', 'medications'))
+    if not found or len(text.split()) > SHORT_WORDS:
+        return True
+    # Lay synonyms ("sugar") alone are too weak to skip Comprehend
+    strict = gazetteer.extract(text, lay=False)
+    return not any(strict[k] for k in ('symptoms', 'conditions', 'medications'))
+
+
+def _merge(entities: dict, local: dict) -> dict:
+    """Comprehend's entities, then gazetteer hits it did not already report."""
+    for k, values in local.items():
+        seen = {v.lower() for v in entities[k]}
+        entities[k] += [v for v in values if v.lower() not in seen]
+    return entities
+
+
+def detect_entities(text: str, client) -> dict:
+    """
+    Entities scoring >= MIN_SCORE, grouped and de-duplicated, in order of
+    appearance. Raises when Comprehend was needed but failed.
+    """
+    text  = _normalize(text, 20000)
+    local = gazetteer.extract(text)
+    if not needs_comprehend(text, local):
+        STATS['local'] += 1
+        return local
+
+    try:
+        return _merge(_comprehend_entities(text, client), local)
+    except Exception as e:
+        print(f'[ner] comprehend failed: {e}')
+        STATS['comprehend_failed'] += 1
+        raise
+
+
+def _comprehend_entities(text: str, client) -> dict:
+    key = content_key('detect_entities_v2', text)
+    hit = _entities_cache.get(key)
+    if hit is not None:
+        return _copy(hit)
+
+    STATS['comprehend'] += 1
+    # Built outside the guard: a factory that raises for lack of time
+    # budget must not count as a Comprehend failure
+    comprehend = client()
+    with circuit.guard('comprehend'):
+        resp = comprehend.detect_entities_v2(Text=text)
+
+    entities = {k: [] for k in CATEGORY_KEYS.values()}
+    for e in resp.get('Entities', []):
+        if e.get('Score', 0) < MIN_SCORE:
+            continue
+        k = CATEGORY_KEYS.get(e.get('Category', ''))
+        if k:
+            entities[k].append(e.get('Text', ''))
+    entities = {k: list(dict.fromkeys(v)) for k, v in entities.items()}
+    _entities_cache.put(key, entities)
+    return _copy(entities)
+
+
+def icd10_local() -> bool:
+    """Whether ICD-10 codes come from the offline index instead of infer_icd10()."""
+    return ICD_MODE != 'comprehend' and icd10.available()
+
+
+def resolve_icd10(entities: dict) -> dict:
+    """Offline ICD-10 codes for already-extracted conditions and symptoms."""
+    return icd10.lookup_all(entities['conditions'] + entities['symptoms'])
+
+
+def infer_icd10(text: str, client) -> dict:
+    """
+    Top ICD-10-CM concept per entity scoring above ICD_MIN_SCORE. Non-English
+    text is coded from the gazetteer's English terms instead of the raw text.
+    """
+    if MODE == 'local':
+        return {}
+    text = _normalize(text, 10000)
+    if not gazetteer.is_english(text):
+        local = gazetteer.extract(text)
+        text  = '. '.join(local['conditions'] + local['symptoms'])
+        if not text:
+            return {}
+    key  = content_key('infer_icd10_cm', text)
+    hit  = _icd_cache.get(key)
+    if hit is not None:
+        return dict(hit)
+
+    # Built outside the guard: a factory that raises for lack of time
+    # budget must not count as a Comprehend failure
+    comprehend = client()
+    with circuit.guard('comprehend'):
+        resp = comprehend.infer_icd10_cm(Text=text)
+
+    icd_map = {}
+    for entity in resp.get('Entities', []):
+        if entity.get('Score', 0) > ICD_MIN_SCORE and entity.get('ICD10CMConcepts'):
+            icd_map[entity['Text']] = {
+                'code':        entity['ICD10CMConcepts'][0]['Code'],
+                'description': entity['ICD10CMConcepts'][0]['Description'],
+            }
+    _icd_cache.put(key, icd_map)
+    return dict(icd_map)
+
+
+def stats() -> dict:
+    return {'paths': dict(STATS), 'ner': dict(_entities_cache.stats),
+            'icd10': dict(_icd_cache.stats)}
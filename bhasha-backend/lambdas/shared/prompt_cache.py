@@ -0,0 +1,107 @@
+"""
+shared/prompt_cache.py
+
+Bedrock Converse prompt caching for large static prefixes (system prompts,
+tool specs). Bedrock caches everything before a cachePoint block, in the
+order tools → system → messages, so anything per-request (reply language,
+patient context) must come after the checkpoint.
+
+Two limits decide whether a checkpoint is sent at all:
+  - Only Anthropic Claude models take a checkpoint in toolConfig.tools;
+    Amazon Nova accepts them in system/messages only and fails validation
+    otherwise. For other models the tools are sent as they are and only
+    the system prompt is checkpointed.
+  - A checkpoint only caches once the prefix before it reaches MIN_TOKENS
+    (1,024 for Nova Pro and Claude Sonnet). Shorter prefixes are sent
+    without one — it would never hit. The prefix is estimated at
+    CHARS_PER_TOKEN characters a token.
+
+The static prompts in this repo are currently well under the minimum
+(roughly 150–550 tokens, tools included), so no checkpoint is sent today
+and the cache metrics read zero. They start counting as soon as a prompt
+or tool list grows past it.
+
+record_usage() logs cache reads/writes per call site as a CloudWatch
+Embedded Metric Format line (namespace BhashaAI/PromptCache), plus an
+in-container tally in STATS.
+
+Env vars:
+  PROMPT_CACHE            — set to 0 to drop the checkpoints (models without caching)
+  PROMPT_CACHE_MIN_TOKENS — smallest prefix worth a checkpoint (default 1024)
+"""
+
+import json
+import os
+import time
+
+ENABLED     = os.environ.get('PROMPT_CACHE', '1') != '0'
+MIN_TOKENS  = int(os.environ.get('PROMPT_CACHE_MIN_TOKENS', '1024'))
+CACHE_POINT = {'cachePoint': {'type': 'default'}}
+
+CHARS_PER_TOKEN  = 4
+TOOL_CACHE_MODELS = ('anthropic.claude',)   # model id substrings
+
+STATS = {}   # site → {calls, input, cache_read, cache_write}
+
+
+def estimate_tokens(obj) -> int:
+    text = obj if isinstance(obj, str) else json.dumps(obj)
+    return len(text) // CHARS_PER_TOKEN
+
+
+def caches_tools(model_id: str) -> bool:
+    """True when `model_id` accepts a checkpoint in toolConfig.tools."""
+    return any(m in model_id for m in TOOL_CACHE_MODELS)
+
+
+def cached_system(static_text: str, *dynamic_texts: str, model_id: str = '', tools=None) -> list:
+    """
+    System blocks: the static prompt, a checkpoint, then per-request text.
+    `tools` count towards the prefix only where the model caches them.
+    """
+    prefix = estimate_tokens(static_text)
+    if tools and caches_tools(model_id):
+        prefix += estimate_tokens(tools)
+    blocks = [{'text': static_text}]
+    if ENABLED and prefix >= MIN_TOKENS:
+        blocks.append(CACHE_POINT)
+    blocks.extend({'text': t} for t in dynamic_texts if t)
+    return blocks
+
+
+def cached_tools(tools: list, model_id: str) -> list:
+    """Tool specs followed by a checkpoint, where the model supports one."""
+    if ENABLED and caches_tools(model_id) and estimate_tokens(tools) >= MIN_TOKENS:
+        return tools + [CACHE_POINT]
+    return tools
+
+
+def record_usage(site: str, resp: dict) -> dict:
+    usage = resp.get('usage', {}) or {}
+    row = {
+        'input':       usage.get('inputTokens', 0),
+        'cache_read':  usage.get('cacheReadInputTokens', 0),
+        'cache_write': usage.get('cacheWriteInputTokens', 0),
+    }
+    tally = STATS.setdefault(site, {'calls': 0, 'input': 0, 'cache_read': 0, 'cache_write': 0})
+    tally['calls'] += 1
+    for k, v in row.items():
+        tally[k] += v
+
+    print(json.dumps({
+        '_aws': {'Timestamp': int(time.time() * 1000), 'CloudWatchMetrics': [{
+            'Namespace':  'BhashaAI/PromptCache',
+            'Dimensions': [['Site']],
+            'Metrics': [
+                {'Name': 'InputTokens',      'Unit': 'Count'},
+                {'Name': 'CacheReadTokens',  'Unit': 'Count'},
+                {'Name': 'CacheWriteTokens', 'Unit': 'Count'},
+            ],
+        }]},
+        'Site':             site,
+        'InputTokens':      row['input'],
+        'CacheReadTokens':  row['cache_read'],
+        'CacheWriteTokens': row['cache_write'],
+        'LatencyMs':        resp.get('metrics', {}).get('latencyMs', 0),
+    }))
+    return row
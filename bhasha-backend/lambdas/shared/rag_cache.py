@@ -0,0 +1,61 @@
+"""
+shared/rag_cache.py
+
+Retrieval results keyed on a canonical form of the query. The diagnose
+path builds its RAG query from the first five symptoms plus up to three
+user conditions, so a small set of queries — "fever, headache diabetes" —
+repeats constantly, often differing only in case, spacing and punctuation.
+canonical_query() lower-cases the words and drops punctuation and extra
+whitespace, so those variants share one entry and skip the retrieval round
+trip. Word order is kept: "pain without fever" and "fever without pain" are
+different questions and must not share a result.
+
+Entries live in a TieredCache (shared/cache.py): a size-bounded in-process
+LRU plus, with CACHE_TABLE set, the shared DynamoDB tier, both expiring
+after RAG_CACHE_TTL_S. `source` (KB id or "local") is part of the key, so
+switching retrieval backends never serves the other backend's chunks.
+Empty results are not cached — they usually mean a timeout or an open
+circuit, not an empty corpus.
+
+Env vars:
+  RAG_CACHE_TTL_S  — seconds a result stays valid (default 6 hours; 0 disables)
+  RAG_CACHE_SIZE   — in-process LRU entries (default 256)
+"""
+
+import os
+import re
+
+from .cache import TieredCache, content_key
+
+TTL_S = float(os.environ.get('RAG_CACHE_TTL_S', str(6 * 3600)))
+SIZE  = int(os.environ.get('RAG_CACHE_SIZE', '256'))
+
+_cache = TieredCache('rag', TTL_S, SIZE)
+
+
+def canonical_query(query: str) -> str:
+    """The words of `query`, lower-cased, in order, single-spaced, without punctuation."""
+    return ' '.join(re.findall(r'\w+', query.lower()))
+
+
+def cached(source: str, query: str, fetch, *extra: str):
+    """
+    The cached result for `query` against `source`, else fetch() — stored
+    when non-empty. `extra` adds key parts that change the result for the
+    same query (result count, reply language…).
+    """
+    if TTL_S <= 0:
+        return fetch()
+    key = content_key(source, canonical_query(query), *extra)
+    hit = _cache.get(key)
+    if hit is not None:
+        print(f'[rag_cache] hit ({source}): {canonical_query(query)[:60]}')
+        return hit
+    value = fetch()
+    if value:
+        _cache.put(key, value)
+    return value
+
+
+def stats() -> dict:
+    return dict(_cache.stats)
@@ -0,0 +1,184 @@
+"""
+shared/records.py
+
+Key-based access to the main table (DYNAMODB_MAIN_TABLE, partition key
+userId, sort key recordId). Every entity lives in its user's partition under
+a recordId prefix, so per-user reads are Query / GetItem calls that cost
+O(that user's items) — never a table Scan, whose cost grows with the whole
+table and whose Limit applies before the filter.
+
+  entity       recordId
+  profile      profile#main
+  medication   med#<medicationId>
+  adherence    adherence#<medicationId>#<date>
+  health_log   log#<timestamp>#<logId>        (sorts by time)
+  emergency    emergency#<emergencyId>
+  consult      consult#<timestamp>
+  history      history#<timestamp>
+
+query() follows LastEvaluatedKey until `limit` items are collected, so a
+limit is always honoured exactly. `attributes` becomes a
+ProjectionExpression with #placeholders, so reserved words (name, status,
+date…) need no special handling by callers.
+
+Timelines (health_log, consult, history) embed an ISO timestamp right after
+the prefix, so page() serves them newest-first straight from the sort key
+(ScanIndexForward=False) and pushes `since` / `until` into the key
+condition — a page costs O(page size) however long the user's record is.
+Pages continue from an opaque cursor: the LastEvaluatedKey, base64-encoded.
+Health logs written before they were time-keyed (log#<logId>) are moved
+to this layout once by scripts/migrate_health_logs.py.
+
+Env vars:
+  DYNAMODB_MAIN_TABLE  — defaults to BhashaAI_Main
+  AWS_REGION_NAME / APP_REGION — table region, defaults to ap-south-1
+"""
+
+import base64
+import json
+import os
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+TABLE_NAME = os.environ.get('DYNAMODB_MAIN_TABLE', 'BhashaAI_Main')
+REGION     = os.environ.get('AWS_REGION_NAME', os.environ.get('APP_REGION', 'ap-south-1'))
+
+PREFIX = {
+    'profile':    'profile#',
+    'medication': 'med#',
+    'adherence':  'adherence#',
+    'health_log': 'log#',
+    'emergency':  'emergency#',
+    'consult':    'consult#',
+    'history':    'history#',
+}
+
+TIME_KEYED = {'health_log', 'consult', 'history'}
+MAX_PAGE   = 200
+
+_tables = {}
+
+
+def table(name: str = TABLE_NAME):
+    """Table resource, reused across warm invocations."""
+    if name not in _tables:
+        _tables[name] = boto3.resource('dynamodb', region_name=REGION).Table(name)
+    return _tables[name]
+
+
+def record_id(kind: str, *parts: str) -> str:
+    return PREFIX[kind] + '#'.join(parts)
+
+
+def key(user_id: str, kind: str, *parts: str) -> dict:
+    return {'userId': user_id, 'recordId': record_id(kind, *parts)}
+
+
+def projection(attributes) -> dict:
+    """ProjectionExpression kwargs for `attributes` (empty = whole item)."""
+    if not attributes:
+        return {}
+    names = {f'#p{i}': a for i, a in enumerate(attributes)}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+
+
+def get(user_id: str, kind: str, *parts: str, attributes=None, table_name: str = TABLE_NAME):
+    """One item by primary key, or None."""
+    return table(table_name).get_item(
+        Key=key(user_id, kind, *parts), **projection(attributes)
+    ).get('Item')
+
+
+def _sort_condition(kind: str, since: str, until: str):
+    prefix = PREFIX[kind]
+    if not (since or until):
+        return Key('recordId').begins_with(prefix)
+    if kind not in TIME_KEYED:
+        raise ValueError(f'{kind} records are not time-ordered')
+    # `until` is inclusive of everything it prefixes ('2025-01-31' = the whole day)
+    return Key('recordId').between(prefix + (since or ''), prefix + (until or '') + '\uffff')
+
+
+def query(user_id: str, kind: str, *, attributes=None, limit: int = 0,
+          newest_first: bool = False, start_key: dict = None,
+          since: str = '', until: str = '', table_name: str = TABLE_NAME) -> tuple:
+    """
+    (items, last_key) for every `kind` record of the user, in recordId order
+    (reversed with newest_first). last_key is None when nothing is left,
+    otherwise pass it back as start_key to continue. since / until (ISO
+    timestamps or prefixes of one) bound time-keyed kinds.
+    """
+    kwargs = {
+        'KeyConditionExpression': Key('userId').eq(user_id) & _sort_condition(kind, since, until),
+        'ScanIndexForward': not newest_first,
+        **projection(attributes),
+    }
+    items = []
+    while True:
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+        if limit:
+            kwargs['Limit'] = limit - len(items)
+        resp = table(table_name).query(**kwargs)
+        items.extend(resp.get('Items', []))
+        start_key = resp.get('LastEvaluatedKey')
+        if not start_key or (limit and len(items) >= limit):
+            return items, start_key
+
+
+def query_all(user_id: str, kind: str, **kwargs) -> list:
+    return query(user_id, kind, **kwargs)[0]
+
+
+# ── Timeline pages ────────────────────────────────────────────────────────────
+
+def encode_cursor(last_key: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(last_key).encode('utf-8')).decode('ascii') \
+        if last_key else None
+
+
+def decode_cursor(cursor: str, user_id: str, kind: str) -> dict:
+    """The start key behind `cursor`; ValueError when it is malformed or not this user's."""
+    if not cursor:
+        return None
+    try:
+        start = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('invalid cursor')
+    if (not isinstance(start, dict) or start.get('userId') != user_id
+            or not str(start.get('recordId', '')).startswith(PREFIX[kind])):
+        raise ValueError('invalid cursor')
+    return start
+
+
+def page(user_id: str, kind: str, params: dict, default_limit: int = 50,
+         attributes=None, table_name: str = TABLE_NAME) -> tuple:
+    """
+    (items, next_cursor) for one newest-first page, driven by the request's
+    query parameters: limit, cursor, since, until. next_cursor is None on
+    the last page. Raises ValueError for a bad limit, cursor or range.
+    """
+    try:
+        limit = int(params.get('limit') or default_limit)
+    except ValueError:
+        raise ValueError('limit must be a number')
+    limit = max(1, min(limit, MAX_PAGE))
+    since, until = params.get('since') or '', params.get('until') or ''
+    # until covers everything it prefixes, so since='2025-01-31T10' / until='2025-01-31' is fine
+    if since and until and since > until and not since.startswith(until):
+        raise ValueError('since must not be after until')
+    items, last_key = query(
+        user_id, kind, attributes=attributes, limit=limit, newest_first=True,
+        start_key=decode_cursor(params.get('cursor'), user_id, kind),
+        since=since, until=until, table_name=table_name,
+    )
+    return items, encode_cursor(last_key)
+
+
+def json_default(obj):
+    """json.dumps default for items — DynamoDB numbers come back as Decimal."""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    raise TypeError(f'{type(obj).__name__} is not JSON serialisable')
@@ -0,0 +1,438 @@
+"""
+shared/replay.py
+
+Record/replay stand-ins for the upstream calls on the hot paths, so any
+Lambda can be run and benchmarked offline:
+
+  • a botocore event hook for Bedrock `converse`, Comprehend Medical
+    `detect_entities_v2` / `infer_icd10_cm` and the Knowledge Base
+    `retrieve` / `retrieve_and_generate`
+  • a urllib opener shim for Overpass, Google Places, Google TTS and Exotel
+
+record — calls go to the real services; each response is appended to a
+         cassette (<dir>/<service>.<Operation>.jsonl or http.<host>.jsonl)
+         with its measured latency.
+replay — nothing leaves the machine. Intercepted calls are answered from the
+         cassettes after a synthetic delay; any other AWS call, or a call
+         with no recording, raises ReplayMiss, which the handlers' existing
+         fallbacks treat like an outage.
+
+A synthetic delay longer than the caller's own timeout (the botocore
+client's read_timeout, urlopen's timeout=) is cut at that timeout, and the
+call raises what the real client would: botocore ReadTimeoutError or
+socket.timeout. Deadline-sized timeouts therefore behave as they do live.
+
+Requests are matched on a digest of their parameters (API keys stripped
+from URLs). With REPLAY_MATCH=operation a miss falls back to the recordings
+of the same operation in rotation, so one cassette can drive many inputs.
+
+Latency (REPLAY_LATENCY) — `;`-separated `target=distribution` rules, the
+target being `<service>.<Operation>`, `<service>`, a host or `*`:
+  recorded              sleep what was measured while recording (default)
+  none                  no delay
+  fixed:S               constant S seconds
+  uniform:A:B           uniform between A and B seconds
+  normal:MU:SIGMA       clamped at 0
+  lognormal:MEDIAN:SIGMA
+e.g. REPLAY_LATENCY='bedrock-runtime=lognormal:2.5:0.4;overpass-api.de=uniform:1:6;*=recorded'
+
+Benchmark a handler (run from bhasha-backend/lambdas/):
+  python -m shared.replay record multi_agent event.json
+  python -m shared.replay replay multi_agent event.json -n 50
+`event.json` is an API Gateway event, or just the request body.
+
+Env vars:
+  REPLAY_MODE      — off|record|replay (install() reads it; the CLI sets it)
+  REPLAY_DIR       — cassette directory, defaults to ./cassettes
+  REPLAY_MATCH     — exact|operation (default exact)
+  REPLAY_LATENCY   — latency rules, see above
+  REPLAY_SEED      — seed for the latency distributions (default 0)
+  REPLAY_TIMEOUT_S — remaining time reported by the fake Lambda context (default 60)
+"""
+
+import base64
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from email.message import Message
+from urllib.response import addinfourl
+
+MODE     = os.environ.get('REPLAY_MODE', 'off')
+DIR      = os.environ.get('REPLAY_DIR', 'cassettes')
+MATCH    = os.environ.get('REPLAY_MATCH', 'exact')
+LATENCY  = os.environ.get('REPLAY_LATENCY', 'recorded')
+SEED     = int(os.environ.get('REPLAY_SEED', '0'))
+
+# botocore event-name service ids → operations that are recorded/replayed
+AWS_OPERATIONS = {
+    'bedrock-runtime':       ['Converse'],
+    'comprehendmedical':     ['DetectEntitiesV2', 'InferICD10CM'],
+    'bedrock-agent-runtime': ['Retrieve', 'RetrieveAndGenerate'],
+}
+HTTP_HOSTS = [
+    'overpass-api.de',
+    'maps.googleapis.com',
+    'texttospeech.googleapis.com',
+    'api.exotel.com',
+]
+
+STATS = {}   # target → {'calls': n, 'misses': n, 'delay_s': total}
+
+
+class ReplayMiss(Exception):
+    pass
+
+
+# ── Cassettes ──────────────────────────────────────────────────────────────────
+
+_lock      = threading.Lock()
+_cassettes = {}   # name → {'by_key': {key: entry}, 'all': [entries], 'next': i}
+
+
+def _json_default(o):
+    if isinstance(o, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(bytes(o)).decode()}
+    if hasattr(o, 'read'):   # streaming bodies are never recorded
+        return None
+    return str(o)
+
+
+def _restore(o):
+    if isinstance(o, dict):
+        if set(o) == {'__bytes__'}:
+            return base64.b64decode(o['__bytes__'])
+        return {k: _restore(v) for k, v in o.items()}
+    if isinstance(o, list):
+        return [_restore(v) for v in o]
+    return o
+
+
+def _digest(o) -> str:
+    def default(v):
+        if isinstance(v, (bytes, bytearray)):
+            return 'sha256:' + hashlib.sha256(bytes(v)).hexdigest()
+        return str(v)
+    raw = json.dumps(o, sort_keys=True, default=default, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def _load(name: str) -> dict:
+    if name not in _cassettes:
+        c = {'by_key': {}, 'all': [], 'next': 0}
+        path = os.path.join(DIR, f'{name}.jsonl')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        c['by_key'][entry['key']] = entry
+                        c['all'].append(entry)
+        _cassettes[name] = c
+    return _cassettes[name]
+
+
+def _record(name: str, key: str, response, latency_s: float, **extra):
+    entry = dict(extra, key=key, latency_s=round(latency_s, 4), response=response)
+    os.makedirs(DIR, exist_ok=True)
+    with _lock:
+        with open(os.path.join(DIR, f'{name}.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, default=_json_default, ensure_ascii=False) + '\n')
+        c = _load(name)
+        c['by_key'][key] = entry
+        c['all'].append(entry)
+
+
+def _lookup(name: str, key: str) -> dict:
+    with _lock:
+        c = _load(name)
+        entry = c['by_key'].get(key)
+        if entry is None and MATCH == 'operation' and c['all']:
+            entry = c['all'][c['next'] % len(c['all'])]
+            c['next'] += 1
+    if entry is None:
+        _stat(name, miss=True)
+        raise ReplayMiss(f'no recording for {name} ({key})')
+    return entry
+
+
+# ── Synthetic latency ──────────────────────────────────────────────────────────
+
+_rng = random.Random(SEED)
+
+
+def _parse_rules(spec: str) -> list:
+    rules = []
+    for part in filter(None, (p.strip() for p in spec.split(';'))):
+        target, _, dist = part.rpartition('=')
+        rules.append((target or '*', dist.split(':')))
+    return rules
+
+
+_rules = _parse_rules(LATENCY)
+
+
+def _delay(targets: list, recorded_s: float) -> float:
+    """Pick the first rule matching the most specific target and sample it."""
+    dist = ['recorded']
+    for t in targets + ['*']:
+        hit = next((d for rt, d in _rules if rt == t), None)
+        if hit:
+            dist = hit
+            break
+    kind, args = dist[0], [float(a) for a in dist[1:]]
+    if kind == 'none':
+        return 0.0
+    if kind == 'fixed':
+        return args[0]
+    if kind == 'uniform':
+        return _rng.uniform(args[0], args[1])
+    if kind == 'normal':
+        return max(0.0, _rng.gauss(args[0], args[1]))
+    if kind == 'lognormal':
+        return _rng.lognormvariate(math.log(args[0]), args[1])
+    return recorded_s
+
+
+def _wait(delay_s: float, timeout_s) -> bool:
+    """Sleep the synthetic delay, at most timeout_s; False when the timeout cut it short."""
+    if timeout_s is not None and delay_s > timeout_s:
+        time.sleep(timeout_s)
+        return False
+    time.sleep(delay_s)
+    return True
+
+
+def _stat(name: str, delay_s: float = 0.0, miss: bool = False):
+    with _lock:
+        s = STATS.setdefault(name, {'calls': 0, 'misses': 0, 'delay_s': 0.0})
+        s['calls'] += 1
+        s['misses'] += int(miss)
+        s['delay_s'] += delay_s
+
+
+# ── botocore hook ──────────────────────────────────────────────────────────────
+
+class _FakeHTTPResponse:
+    status_code = 200
+    headers     = {}
+    content     = b''
+    raw         = None
+
+
+def _on_parameter_build(params, model, context, **kwargs):
+    context['replay_key']   = _digest(params)
+    context['replay_start'] = time.monotonic()
+
+
+def _on_before_call(model, context, event_name, **kwargs):
+    service = event_name.split('.')[1]
+    name    = f'{service}.{model.name}'
+    if model.name not in AWS_OPERATIONS.get(service, []):
+        _stat(name, miss=True)
+        raise ReplayMiss(f'{name} is not replayed — no network in replay mode')
+    entry   = _lookup(name, context.get('replay_key', ''))
+    delay   = _delay([name, service], entry.get('latency_s', 0.0))
+    timeout = getattr(context.get('client_config'), 'read_timeout', None)
+    _stat(name, min(delay, timeout) if timeout is not None else delay)
+    if not _wait(delay, timeout):
+        from botocore.exceptions import ReadTimeoutError
+        raise ReadTimeoutError(endpoint_url=f'https://{service}.replay')
+    return _FakeHTTPResponse(), _restore(entry['response'])
+
+
+def _on_before_call_record(context, **kwargs):
+    context['replay_start'] = time.monotonic()
+
+
+def _on_after_call(http_response, parsed, model, context, event_name, **kwargs):
+    if getattr(http_response, 'status_code', 200) >= 300:
+        return
+    service = event_name.split('.')[1]
+    if model.name not in AWS_OPERATIONS.get(service, []):
+        return
+    latency = time.monotonic() - context.get('replay_start', time.monotonic())
+    _record(f'{service}.{model.name}', context.get('replay_key', ''), parsed, latency)
+
+
+def _install_botocore(mode: str):
+    try:
+        import boto3
+    except ImportError:
+        print('[replay] boto3 not installed — only HTTP calls are hooked')
+        return
+    if boto3.DEFAULT_SESSION is None:
+        boto3.setup_default_session()
+    events = boto3.DEFAULT_SESSION.events
+    events.register('before-parameter-build', _on_parameter_build)
+    if mode == 'replay':
+        events.register('before-call', _on_before_call)
+    else:
+        events.register('before-call', _on_before_call_record)
+        events.register('after-call', _on_after_call)
+
+
+# ── urllib shim ────────────────────────────────────────────────────────────────
+
+def _http_target(req) -> tuple:
+    """(cassette name, key) for a request, or (None, None) if not intercepted."""
+    parts = urllib.parse.urlsplit(req.full_url)
+    if parts.hostname not in HTTP_HOSTS:
+        return None, None
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query) if k != 'key']
+    key = _digest([req.get_method(), parts.path, sorted(query), req.data or b''])
+    return f'http.{parts.hostname}', key
+
+
+def _make_response(req, entry: dict):
+    headers = Message()
+    for k, v in entry.get('headers', {}).items():
+        headers[k] = v
+    body = base64.b64decode(entry['response'])
+    resp = addinfourl(io.BytesIO(body), headers, req.full_url, entry.get('status', 200))
+    resp.msg = entry.get('reason', 'OK')
+    return resp
+
+
+class ReplayHandler(urllib.request.BaseHandler):
+    handler_order = 100   # before the real http/https handlers
+
+    def __init__(self, mode: str):
+        self.mode = mode
+
+    def default_open(self, req):
+        name, key = _http_target(req)
+        if name is None:
+            if self.mode == 'replay':
+                raise ReplayMiss(f'{req.full_url} is not replayed — no network in replay mode')
+            return None
+        if self.mode == 'record':
+            req._replay = (name, key, time.monotonic())
+            return None   # fall through to the real handler; recorded in *_response
+        entry   = _lookup(name, key)
+        delay   = _delay([name[len('http.'):]], entry.get('latency_s', 0.0))
+        timeout = getattr(req, 'timeout', None)
+        timeout = timeout if isinstance(timeout, (int, float)) else None
+        _stat(name, min(delay, timeout) if timeout is not None else delay)
+        if not _wait(delay, timeout):
+            raise socket.timeout('timed out')   # what urlopen raises waiting for a response
+        return _make_response(req, entry)
+
+    def http_response(self, req, response):
+        if self.mode != 'record' or not hasattr(req, '_replay'):
+            return response
+        name, key, start = req._replay
+        body = response.read()
+        _record(name, key, base64.b64encode(body).decode(), time.monotonic() - start,
+                status=response.status, reason=response.reason,
+                headers={'Content-Type': response.headers.get('Content-Type', '')})
+        return _make_response(req, {'response': base64.b64encode(body).decode(),
+                                    'status': response.status, 'reason': response.reason,
+                                    'headers': {'Content-Type': response.headers.get('Content-Type', '')}})
+
+    https_response = http_response
+
+
+def _install_urllib(mode: str):
+    urllib.request.install_opener(urllib.request.build_opener(ReplayHandler(mode)))
+
+
+# ── Entry points ───────────────────────────────────────────────────────────────
+
+_installed = False
+
+
+def install(mode: str = None):
+    """Hook botocore and urllib for `mode` (defaults to REPLAY_MODE). Idempotent."""
+    global _installed, MODE
+    mode = mode or MODE
+    if _installed or mode not in ('record', 'replay'):
+        return
+    MODE = mode
+    if mode == 'replay':
+        # Never touch real credentials or the instance metadata service
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'replay')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'replay')
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+        os.environ['AWS_EC2_METADATA_DISABLED'] = 'true'
+    _install_botocore(mode)
+    _install_urllib(mode)
+    _installed = True
+    print(f'[replay] {mode} mode, cassettes in {os.path.abspath(DIR)}')
+
+
+class FakeContext:
+    """Just enough of the Lambda context object for the handlers."""
+    function_name = 'replay'
+    aws_request_id = 'replay'
+
+    def __init__(self, timeout_s: float):
+        self._end = time.monotonic() + timeout_s
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int(max(0.0, self._end - time.monotonic()) * 1000)
+
+
+def load_handler(lambda_dir: str):
+    import importlib.util
+    path = os.path.join(lambda_dir, 'lambda_function.py')
+    spec = importlib.util.spec_from_file_location(f'{os.path.basename(lambda_dir)}_lambda', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.lambda_handler
+
+
+def load_event(arg: str) -> dict:
+    raw = open(arg, encoding='utf-8').read() if os.path.exists(arg) else arg
+    event = json.loads(raw)
+    if 'httpMethod' not in event and 'body' not in event:
+        event = {'httpMethod': 'POST', 'body': json.dumps(event)}
+    return event
+
+
+def bench(lambda_dir: str, event: dict, runs: int, timeout_s: float) -> dict:
+    handler = load_handler(lambda_dir)
+    times, statuses = [], {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        resp = handler(json.loads(json.dumps(event)), FakeContext(timeout_s))
+        times.append(time.perf_counter() - start)
+        code = (resp or {}).get('statusCode', '?')
+        statuses[code] = statuses.get(code, 0) + 1
+    times.sort()
+    pct = lambda p: times[min(len(times) - 1, int(p * len(times)))]
+    return {
+        'runs':      runs,
+        'status':    statuses,
+        'mean_ms':   round(sum(times) / len(times) * 1000, 1),
+        'p50_ms':    round(pct(0.50) * 1000, 1),
+        'p95_ms':    round(pct(0.95) * 1000, 1),
+        'max_ms':    round(times[-1] * 1000, 1),
+        'upstreams': {k: dict(v, delay_s=round(v['delay_s'], 3)) for k, v in sorted(STATS.items())},
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(prog='python -m shared.replay')
+    ap.add_argument('mode', choices=['record', 'replay'])
+    ap.add_argument('lambda_dir', help='e.g. multi_agent')
+    ap.add_argument('event', help='event JSON file, or inline JSON')
+    ap.add_argument('-n', '--runs', type=int, default=1)
+    ap.add_argument('--timeout', type=float,
+                    default=float(os.environ.get('REPLAY_TIMEOUT_S', '60')),
+                    help='seconds reported by the fake Lambda context')
+    args = ap.parse_args()
+
+    install(args.mode)
+    report = bench(args.lambda_dir, load_event(args.event), args.runs, args.timeout)
+    print(json.dumps(report, indent=2, default=str))
+    sys.exit(0)
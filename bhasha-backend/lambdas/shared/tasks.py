@@ -0,0 +1,105 @@
+"""
+shared/tasks.py
+
+Built-in background tasks for shared/work_queue.py. Each task is a small,
+idempotent AWS side effect whose payload is plain JSON, so any producer
+Lambda can enqueue it and the post_process_worker Lambda can run it.
+
+Tasks raise on failure — the queue retries and finally dead-letters them.
+"""
+
+import base64
+
+import boto3
+from botocore.exceptions import ClientError
+
+from .work_queue import task
+
+DEFAULT_REGION = 'ap-south-1'
+
+_clients = {}
+
+
+def _client(service: str, region: str):
+    key = (service, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service, region_name=region)
+    return _clients[key]
+
+
+def _table(name: str, region: str):
+    key = ('dynamodb-table', name, region)
+    if key not in _clients:
+        _clients[key] = boto3.resource('dynamodb', region_name=region).Table(name)
+    return _clients[key]
+
+
+# ── DynamoDB ───────────────────────────────────────────────────────────────────
+
+@task('ddb.put_item')
+def put_item(table: str, item: dict, region: str = DEFAULT_REGION):
+    _table(table, region).put_item(Item=item)
+
+
+@task('ddb.put_items')
+def put_items(table: str, items: list, region: str = DEFAULT_REGION):
+    with _table(table, region).batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=item)
+
+
+# ── SNS / S3 ───────────────────────────────────────────────────────────────────
+
+@task('sns.sms')
+def send_sms(phone: str, message: str, region: str = DEFAULT_REGION):
+    _client('sns', region).publish(
+        PhoneNumber=phone,
+        Message=message,
+        MessageAttributes={
+            'AWS.SNS.SMS.SMSType': {
+                'DataType': 'String', 'StringValue': 'Transactional',
+            },
+        },
+    )
+
+
+@task('s3.put_object')
+def put_object(bucket: str, key: str, body_b64: str,
+               content_type: str = 'application/octet-stream',
+               region: str = DEFAULT_REGION):
+    _client('s3', region).put_object(
+        Bucket=bucket, Key=key,
+        Body=base64.b64decode(body_b64),
+        ContentType=content_type,
+    )
+
+
+# ── Bedrock ────────────────────────────────────────────────────────────────────
+
+@task('bedrock.summarize_into')
+def summarize_into(table: str, key: dict, attribute: str, prompt: str, model_id: str,
+                   max_tokens: int = 120, temperature: float = 0.1,
+                   region: str = DEFAULT_REGION, bedrock_region: str = 'us-east-1'):
+    """
+    Generate text with Bedrock and write it onto an existing DynamoDB item.
+    The item keeps its placeholder value until this succeeds; items deleted
+    in the meantime are left alone.
+    """
+    resp = _client('bedrock-runtime', bedrock_region).converse(
+        modelId=model_id,
+        messages=[{'role': 'user', 'content': [{'text': prompt}]}],
+        inferenceConfig={'maxTokens': max_tokens, 'temperature': temperature},
+    )
+    text = resp['output']['message']['content'][0]['text'].strip()
+    try:
+        _table(table, region).update_item(
+            Key=key,
+            UpdateExpression='SET #a = :v',
+            ConditionExpression='attribute_exists(userId)',
+            ExpressionAttributeNames={'#a': attribute},
+            ExpressionAttributeValues={':v': text},
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+        print(f'[summarize_into] {key} no longer exists — skipped')
@@ -0,0 +1,273 @@
+"""
+shared/work_queue.py
+
+Background work queue for side effects the user never sees in the response —
+consultation/health-log writes, SMS notifications, S3 document uploads and
+AI entry summaries. Handlers call enqueue() and return; the
+post_process_worker Lambda (or drain() locally) runs the task later with
+retries and dead-lettering.
+
+Backends (WORK_QUEUE_BACKEND):
+  sqs     — production. Retries come from the SQS visibility timeout, the
+            dead-letter queue from the redrive policy (see setup_infra.sh).
+  sqlite  — file-backed local stand-in with the same retry / dead-letter rules.
+  memory  — in-process list, drained explicitly (local scripts, benchmarks).
+  inline  — run the task immediately. Default when WORK_QUEUE_URL is unset,
+            so an unconfigured deploy behaves exactly like before.
+
+enqueue() never raises. If the queue is unreachable or the message is too
+large for SQS, the task runs inline so no side effect is dropped.
+
+Payloads travel as JSON on every backend, inline included, so a task sees
+the same types wherever it runs. Decimals (numbers read from DynamoDB) are
+written as JSON numbers and every non-integer number comes back as a
+Decimal, so a ddb.put_item task writes exactly what an inline put_item
+would have.
+
+Local worker (run from bhasha-backend/lambdas/):
+  WORK_QUEUE_BACKEND=sqlite python -m shared.work_queue drain
+
+Env vars:
+  WORK_QUEUE_BACKEND       — sqs|sqlite|memory|inline
+  WORK_QUEUE_URL           — SQS queue URL (selects sqs when backend unset)
+  WORK_QUEUE_DB            — SQLite path, defaults to /tmp/bhasha_work_queue.db
+  WORK_QUEUE_MAX_ATTEMPTS  — local retry budget before dead-lettering (default 5)
+  APP_REGION               — SQS region, defaults to ap-south-1
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+APP_REGION   = os.environ.get('APP_REGION', os.environ.get('AWS_REGION_NAME', 'ap-south-1'))
+QUEUE_URL    = os.environ.get('WORK_QUEUE_URL', '')
+BACKEND      = os.environ.get('WORK_QUEUE_BACKEND', '') or ('sqs' if QUEUE_URL else 'inline')
+DB_PATH      = os.environ.get('WORK_QUEUE_DB', '/tmp/bhasha_work_queue.db')
+MAX_ATTEMPTS = int(os.environ.get('WORK_QUEUE_MAX_ATTEMPTS', '5'))
+
+MAX_MESSAGE_BYTES = 250_000   # SQS hard limit is 256 KiB
+RETRY_BASE_S      = 2         # local backoff: 2s, 4s, 8s, ...
+
+
+class _Encoder(json.JSONEncoder):
+    """Decimals as numbers; anything else JSON cannot carry (datetimes…) as text."""
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj) if obj % 1 == 0 else float(obj)
+        return str(obj)
+
+
+def _encode(envelope: dict) -> str:
+    return json.dumps(envelope, cls=_Encoder)
+
+
+def _decode(body: str) -> dict:
+    return json.loads(body, parse_float=Decimal)
+
+
+# ── Task registry ──────────────────────────────────────────────────────────────
+
+_TASKS = {}
+
+
+def task(name: str):
+    """Register a function as a named background task."""
+    def register(fn):
+        _TASKS[name] = fn
+        return fn
+    return register
+
+
+def run_task(name: str, payload: dict):
+    if name not in _TASKS:
+        from . import tasks  # noqa: F401 — registers the built-in tasks
+    fn = _TASKS.get(name)
+    if fn is None:
+        raise KeyError(f'Unknown task: {name}')
+    fn(**payload)
+
+
+# ── Producer side ──────────────────────────────────────────────────────────────
+
+_sqs_client = None
+_memory     = []   # memory backend: envelopes waiting to run
+_dead       = []   # memory backend: envelopes that exhausted MAX_ATTEMPTS
+
+
+def _sqs():
+    global _sqs_client
+    if _sqs_client is None:
+        import boto3
+        _sqs_client = boto3.client('sqs', region_name=APP_REGION)
+    return _sqs_client
+
+
+def _db():
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS work_queue ("
+        " id TEXT PRIMARY KEY, body TEXT NOT NULL, attempts INTEGER DEFAULT 0,"
+        " available_at REAL NOT NULL, status TEXT DEFAULT 'ready', last_error TEXT)"
+    )
+    return conn
+
+
+def enqueue(name: str, **payload) -> bool:
+    """
+    Queue a background task. Returns True when the task was accepted (queued,
+    or run inline successfully), False if it ran inline and failed.
+    """
+    envelope = {
+        'id':         uuid.uuid4().hex,
+        'task':       name,
+        'payload':    payload,
+        'enqueuedAt': datetime.now(timezone.utc).isoformat(),
+    }
+    body = _encode(envelope)
+    envelope = _decode(body)   # what a worker would see
+
+    if BACKEND == 'inline':
+        return _run_inline(envelope)
+    if len(body.encode('utf-8')) > MAX_MESSAGE_BYTES:
+        print(f'[work_queue] {name} payload too large for queue — running inline')
+        return _run_inline(envelope)
+
+    try:
+        if BACKEND == 'sqs':
+            _sqs().send_message(QueueUrl=QUEUE_URL, MessageBody=body)
+        elif BACKEND == 'sqlite':
+            with _db() as conn:
+                conn.execute('INSERT INTO work_queue (id, body, available_at) VALUES (?, ?, ?)',
+                             (envelope['id'], body, time.time()))
+        elif BACKEND == 'memory':
+            _memory.append(dict(envelope, attempts=0, available_at=time.time()))
+        else:
+            raise ValueError(f'Unknown WORK_QUEUE_BACKEND: {BACKEND}')
+        return True
+    except Exception as e:
+        print(f'[work_queue] enqueue {name} failed, running inline: {e}')
+        return _run_inline(envelope)
+
+
+def _run_inline(envelope: dict) -> bool:
+    try:
+        run_task(envelope['task'], envelope['payload'])
+        return True
+    except Exception as e:
+        print(f'[work_queue] inline {envelope["task"]} failed: {e}')
+        return False
+
+
+# ── Consumer side ──────────────────────────────────────────────────────────────
+
+def handle_sqs_event(event: dict) -> dict:
+    """
+    SQS → Lambda batch handler. Failed records are reported individually
+    (ReportBatchItemFailures) so only they return to the queue; after
+    maxReceiveCount the redrive policy moves them to the dead-letter queue.
+    """
+    failures = []
+    for record in event.get('Records', []):
+        msg_id = record.get('messageId', '')
+        try:
+            envelope = _decode(record['body'])
+            run_task(envelope['task'], envelope['payload'])
+        except Exception as e:
+            receives = record.get('attributes', {}).get('ApproximateReceiveCount', '?')
+            print(f'[work_queue] {msg_id} failed (receive #{receives}): {e}')
+            failures.append({'itemIdentifier': msg_id})
+    return {'batchItemFailures': failures}
+
+
+def drain(max_tasks: int = 0) -> dict:
+    """Run every due task on the local (sqlite/memory) backend once."""
+    stats = {'done': 0, 'retried': 0, 'dead': 0}
+    if BACKEND == 'sqlite':
+        _drain_sqlite(stats, max_tasks)
+    elif BACKEND == 'memory':
+        _drain_memory(stats, max_tasks)
+    else:
+        raise ValueError(f'drain() needs the sqlite or memory backend, not {BACKEND}')
+    return stats
+
+
+def _drain_sqlite(stats: dict, max_tasks: int):
+    with _db() as conn:
+        rows = conn.execute(
+            'SELECT id, body, attempts FROM work_queue'
+            " WHERE status = 'ready' AND available_at <= ? ORDER BY available_at"
+            + (f' LIMIT {int(max_tasks)}' if max_tasks else ''),
+            (time.time(),),
+        ).fetchall()
+        for row_id, body, attempts in rows:
+            envelope = _decode(body)
+            try:
+                run_task(envelope['task'], envelope['payload'])
+                conn.execute('DELETE FROM work_queue WHERE id = ?', (row_id,))
+                stats['done'] += 1
+            except Exception as e:
+                attempts += 1
+                if attempts >= MAX_ATTEMPTS:
+                    conn.execute("UPDATE work_queue SET status = 'dead', attempts = ?, last_error = ?"
+                                 ' WHERE id = ?', (attempts, str(e)[:500], row_id))
+                    stats['dead'] += 1
+                else:
+                    conn.execute('UPDATE work_queue SET attempts = ?, available_at = ?, last_error = ?'
+                                 ' WHERE id = ?',
+                                 (attempts, time.time() + RETRY_BASE_S ** attempts, str(e)[:500], row_id))
+                    stats['retried'] += 1
+                print(f'[work_queue] {envelope["task"]} attempt {attempts} failed: {e}')
+
+
+def _drain_memory(stats: dict, max_tasks: int):
+    now = time.time()
+    due = [m for m in _memory if m['available_at'] <= now]
+    if max_tasks:
+        due = due[:max_tasks]
+    for envelope in due:
+        _memory.remove(envelope)
+        try:
+            run_task(envelope['task'], envelope['payload'])
+            stats['done'] += 1
+        except Exception as e:
+            envelope['attempts'] += 1
+            envelope['last_error'] = str(e)[:500]
+            if envelope['attempts'] >= MAX_ATTEMPTS:
+                _dead.append(envelope)
+                stats['dead'] += 1
+            else:
+                envelope['available_at'] = time.time() + RETRY_BASE_S ** envelope['attempts']
+                _memory.append(envelope)
+                stats['retried'] += 1
+            print(f'[work_queue] {envelope["task"]} attempt {envelope["attempts"]} failed: {e}')
+
+
+def dead_letters() -> list:
+    """Envelopes that exhausted their retries on the local backends."""
+    if BACKEND == 'memory':
+        return list(_dead)
+    if BACKEND == 'sqlite':
+        with _db() as conn:
+            rows = conn.execute('SELECT body, attempts, last_error FROM work_queue'
+                                " WHERE status = 'dead'").fetchall()
+        return [dict(_decode(b), attempts=a, last_error=err) for b, a, err in rows]
+    return []
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('drain', 'dead'):
+        print('Usage: python -m shared.work_queue drain [--loop] | dead')
+        sys.exit(1)
+    if sys.argv[1] == 'dead':
+        print(json.dumps(dead_letters(), indent=2, cls=_Encoder))
+    elif '--loop' in sys.argv:
+        while True:
+            drain()
+            time.sleep(1)
+    else:
+        print(drain())
@@ -0,0 +1,168 @@
+"""
+shared/writes.py
+
+Coalesced DynamoDB writes. A handler that persists several independent items
+(an emergency record plus one call record per contact) buffers them with
+put() / delete() and sends them together: flush() packs the buffer into
+BatchWriteItem requests of up to 25 items — any number of tables per
+request — so the request pays one write round trip instead of N.
+
+Writes that must land together go through transact() instead, a single
+TransactWriteItems call (up to 100 actions, all-or-nothing). A failed
+condition surfaces as ConditionFailed with the index of the action that
+failed, so callers can still map a missing record to a 404.
+
+Retries:
+  BatchWriteItem may accept a request and hand back UnprocessedItems when a
+  partition is throttled. Those are resent with exponential backoff and full
+  jitter until they are written or MAX_ATTEMPTS runs out, then flush()
+  raises. Transactions are retried the same way on TransactionConflict and
+  throttling.
+
+@flush_on_exit wraps a lambda_handler so anything still buffered is written
+before the response goes out, error paths included. The buffer is emptied
+on every flush, even a failed one, so nothing leaks into the next warm
+invocation. One buffer must not hold two writes to the same key —
+BatchWriteItem rejects duplicates.
+
+Env vars:
+  AWS_REGION_NAME / APP_REGION — table region, defaults to ap-south-1
+"""
+
+import functools
+import os
+import random
+import time
+
+import boto3
+
+REGION = os.environ.get('AWS_REGION_NAME', os.environ.get('APP_REGION', 'ap-south-1'))
+
+BATCH_SIZE   = 25      # BatchWriteItem limit
+MAX_ACTIONS  = 100     # TransactWriteItems limit
+MAX_ATTEMPTS = 8
+BACKOFF_S    = 0.05    # 50ms, 100ms, 200ms, ... with full jitter
+
+_RETRYABLE = {'TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded'}
+
+_resources = {}
+
+
+class ConditionFailed(Exception):
+    """A transact() condition check failed; `index` is the failing action."""
+    def __init__(self, index: int):
+        super().__init__(f'condition failed on action {index}')
+        self.index = index
+
+
+def _dynamodb(region: str):
+    if region not in _resources:
+        _resources[region] = boto3.resource('dynamodb', region_name=region)
+    return _resources[region]
+
+
+def _backoff(attempt: int):
+    time.sleep(random.uniform(0, BACKOFF_S * (2 ** attempt)))
+
+
+# ── Batched writes ────────────────────────────────────────────────────────────
+
+def batch_write(requests: list, region: str = REGION) -> int:
+    """
+    Write [(table, {'PutRequest': …} | {'DeleteRequest': …})] in as few
+    BatchWriteItem calls as possible; returns the number of items written.
+    """
+    dynamodb = _dynamodb(region)
+    for start in range(0, len(requests), BATCH_SIZE):
+        pending = {}
+        for table, request in requests[start:start + BATCH_SIZE]:
+            pending.setdefault(table, []).append(request)
+        for attempt in range(MAX_ATTEMPTS):
+            pending = dynamodb.batch_write_item(RequestItems=pending).get('UnprocessedItems') or {}
+            if not pending:
+                break
+            left = sum(len(v) for v in pending.values())
+            print(f'[writes] {left} unprocessed item(s), retry {attempt + 1}/{MAX_ATTEMPTS}')
+            _backoff(attempt)
+        else:
+            raise RuntimeError(f'BatchWriteItem: {sum(len(v) for v in pending.values())} '
+                               f'item(s) still unprocessed after {MAX_ATTEMPTS} attempts')
+    return len(requests)
+
+
+class WriteBuffer:
+    def __init__(self, region: str = REGION):
+        self.region   = region
+        self.requests = []
+
+    def __len__(self):
+        return len(self.requests)
+
+    def put(self, table: str, item: dict):
+        self.requests.append((table, {'PutRequest': {'Item': item}}))
+
+    def delete(self, table: str, key: dict):
+        self.requests.append((table, {'DeleteRequest': {'Key': key}}))
+
+    def flush(self) -> int:
+        requests, self.requests = self.requests, []
+        if not requests:
+            return 0
+        t0 = time.time()
+        written = batch_write(requests, self.region)
+        print(f'[writes] flushed {written} item(s) in {(time.time() - t0) * 1000:.0f}ms')
+        return written
+
+
+_buffer = WriteBuffer()
+
+
+def put(table: str, item: dict):
+    _buffer.put(table, item)
+
+
+def delete(table: str, key: dict):
+    _buffer.delete(table, key)
+
+
+def flush() -> int:
+    return _buffer.flush()
+
+
+def flush_on_exit(handler):
+    """Decorator: flush the module buffer when `handler` returns or raises."""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            try:
+                flush()
+            except Exception as e:
+                print(f'[writes] flush at exit failed: {e}')
+    return wrapper
+
+
+# ── Transactions ──────────────────────────────────────────────────────────────
+
+def transact(actions: list, region: str = REGION):
+    """
+    Run [{'Put' | 'Update' | 'Delete' | 'ConditionCheck': {TableName, …}}]
+    as one TransactWriteItems call, with plain Python values — the resource's
+    client serializes them, exactly as Table.put_item does. Raises
+    ConditionFailed when a ConditionExpression does not hold.
+    """
+    if len(actions) > MAX_ACTIONS:
+        raise ValueError(f'at most {MAX_ACTIONS} actions per transaction')
+    client = _dynamodb(region).meta.client
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return client.transact_write_items(TransactItems=actions)
+        except client.exceptions.TransactionCanceledException as e:
+            codes = [r.get('Code') for r in e.response.get('CancellationReasons', [])]
+            if 'ConditionalCheckFailed' in codes:
+                raise ConditionFailed(codes.index('ConditionalCheckFailed'))
+            if not _RETRYABLE.intersection(codes) or attempt == MAX_ATTEMPTS - 1:
+                raise
+            print(f'[writes] transaction cancelled ({codes}), retry {attempt + 1}/{MAX_ATTEMPTS}')
+            _backoff(attempt)
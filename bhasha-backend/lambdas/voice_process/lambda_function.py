@@ -4,7 +4,8 @@ import os
 import uuid
 import urllib.request
 from datetime import datetime
-from boto3.dynamodb.conditions import Key
+
+from shared import work_queue
 
 CORS = {
     'Content-Type': 'application/json',
@@ -120,23 +121,46 @@ def _resp(lang, key, **kw):
     return template.format(**kw) if kw else template
 
 
-def _conv_state(history):
-    """Detect where we are in the symptom flow from the last assistant message."""
-    for msg in reversed(history):
-        if msg['role'] != 'assistant':
-            continue
-        t = msg['content'][0]['text'].lower()
-        # Asked about impact?
-        if any(k in t for k in ['नींद', 'neend', 'sleep', 'daily', 'roz', 'affect',
-                                  'प्रभावित', 'ঘুম', 'నిద్ర', 'தூக்க', 'झोप', 'ਨੀਂਦ',
-                                  'ഉറക്ക', 'ನಿದ್ರ', 'ઊંઘ', 'kaam ko']):
-            return 'asked_impact'
-        # Asked about duration?
-        if any(k in t for k in ['कितने', 'kitne', 'how long', 'since', 'कब से',
-                                  'समय से', 'ఎంత కాలం', 'எவ்வளவு', 'किती',
-                                  'কতদিন', 'ਕਿੰਨੇ', 'എത്ര', 'ಎಷ್ಟು', 'કેટલા']):
-            return 'asked_duration'
-    return 'fresh'
+# ── Session state ─────────────────────────────────────────────────────────────
+# One item per session in the conversations table, next to the transcript:
+# read with a single GetItem and replaced with a single conditional PutItem,
+# so a turn costs the same however long the session has run. The transcript
+# turns are appended separately (background queue) and never read back.
+#   fsmState      fresh | asked_duration | asked_impact
+#   firstSymptom  what the user described when the symptom flow started
+#   language      last detected reply language
+#   lastIntent    intent of the previous turn
+#   turns         turn count — also the optimistic-concurrency version
+STATE_KEY = '#state'   # sort key; sorts ahead of every ISO timestamp
+
+
+def _load_session(table, session_id):
+    try:
+        return table.get_item(
+            Key={'sessionId': session_id, 'timestamp': STATE_KEY}, ConsistentRead=True,
+        ).get('Item') or {}
+    except Exception as e:
+        print(f"Session state read failed: {e}")
+        return {}
+
+
+def _save_session(table, session, session_id, **changes):
+    """Write the next state unless another turn of this session got there first."""
+    turns = int(session.get('turns', 0))
+    item  = {
+        **session, **changes,
+        'sessionId': session_id, 'timestamp': STATE_KEY,
+        'turns': turns + 1, 'updatedAt': datetime.utcnow().isoformat(),
+    }
+    condition = {'ConditionExpression': 'attribute_not_exists(sessionId)'} if not turns else {
+        'ConditionExpression': 'turns = :turns', 'ExpressionAttributeValues': {':turns': turns},
+    }
+    try:
+        table.put_item(Item=item, **condition)
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        print(f"Session {session_id} advanced concurrently — keeping the other turn's state")
+    except Exception as e:
+        print(f"Session state write failed: {e}")
 
 
 def _ask_model(bedrock, question):
@@ -276,31 +300,13 @@ def lambda_handler(event, context):
         else:
             bedrock = boto3.client('bedrock-runtime', region_name=bedrock_region)
 
-            # Load DynamoDB history
+            # Session state — one consistent GetItem
             dynamodb = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME'])
             table    = dynamodb.Table(os.environ['DYNAMODB_CONVERSATIONS_TABLE'])
-            history_messages = []
-            try:
-                hist = table.query(
-                    KeyConditionExpression=Key('sessionId').eq(session_id),
-                    ScanIndexForward=True, Limit=10,
-                )
-                for item in hist.get('Items', []):
-                    role, item_text = item.get('role'), item.get('text', '')
-                    if role in ('user', 'assistant') and item_text:
-                        history_messages.append({'role': role, 'content': [{'text': item_text}]})
-            except Exception as e:
-                print(f"History query failed: {e}")
-
-            # Deduplicate consecutive same-role messages
-            filtered = []
-            for msg in history_messages:
-                if not filtered or msg['role'] != filtered[-1]['role']:
-                    filtered.append(msg)
-            if filtered and filtered[0]['role'] == 'assistant':
-                filtered = filtered[1:]
-
-            state = _conv_state(filtered)
+            session  = _load_session(table, session_id)
+            state    = session.get('fsmState', 'fresh')
+            first_symptom = session.get('firstSymptom') or text
+            next_state    = 'fresh'
             text_lower = text.lower()
 
             # ── Priority 1: Emergency check ───────────────────────────────────
@@ -333,6 +339,8 @@ def lambda_handler(event, context):
                     intent = 'medication'
                 else:
                     response_text = f"{name_prefix}{_resp(language, 'ask_duration')}"
+                    next_state = 'asked_duration'
+                    first_symptom = text
 
             # ── Priority 3: Find nearby ───────────────────────────────────────
             elif any(k in text_lower for k in ['nearby', 'naazdiki', 'नजदीकी', 'पास में',
@@ -345,9 +353,6 @@ def lambda_handler(event, context):
             # ── Priority 4: Book appointment ──────────────────────────────────
             elif any(k in text_lower for k in ['book', 'appointment', 'apointment', 'बुक',
                                                 'doctor se milna', 'milna hai']):
-                first_symptom = next(
-                    (m['content'][0]['text'] for m in filtered if m['role'] == 'user'), text
-                )
                 doctor = _get_doctor(bedrock, first_symptom)
                 response_text = f"{name_prefix}{_resp(language, 'book', doctor=doctor)}"
                 intent = 'booking'
@@ -356,9 +361,12 @@ def lambda_handler(event, context):
             # ── Priority 5: State machine symptom flow ────────────────────────
             elif state == 'fresh':
                 response_text = f"{name_prefix}{_resp(language, 'ask_duration')}"
+                next_state = 'asked_duration'
+                first_symptom = text
 
             elif state == 'asked_duration':
                 response_text = f"{name_prefix}{_resp(language, 'ask_impact')}"
+                next_state = 'asked_impact'
 
             elif state == 'asked_impact':
                 impact_yes = _ask_model(bedrock,
@@ -367,9 +375,6 @@ def lambda_handler(event, context):
                     f'User said: "{text}"'
                 )
                 if impact_yes:
-                    first_symptom = next(
-                        (m['content'][0]['text'] for m in filtered if m['role'] == 'user'), text
-                    )
                     doctor = _get_doctor(bedrock, first_symptom)
                     response_text = f"{name_prefix}{_resp(language, 'book', doctor=doctor)}"
                     intent = 'booking'
@@ -380,17 +385,29 @@ def lambda_handler(event, context):
                     specialty = 'General Physician'
 
             else:
-                # Already routed — treat new message as a fresh symptom
+                # Unknown state — treat new message as a fresh symptom
                 response_text = f"{name_prefix}{_resp(language, 'ask_duration')}"
-
-        # ── DynamoDB save ─────────────────────────────────────────────────────
-        dynamodb = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME'])
-        table    = dynamodb.Table(os.environ['DYNAMODB_CONVERSATIONS_TABLE'])
-        now      = datetime.utcnow().isoformat()
-        table.put_item(Item={'sessionId': session_id, 'timestamp': now,
-                             'userId': user_id, 'role': 'user', 'text': text, 'intent': intent})
-        table.put_item(Item={'sessionId': session_id, 'timestamp': f"{now}_response",
-                             'userId': user_id, 'role': 'assistant', 'text': response_text})
+                next_state = 'asked_duration'
+                first_symptom = text
+
+            # One conditional write; the transcript is appended below
+            _save_session(table, session, session_id, fsmState=next_state,
+                          firstSymptom=first_symptom, language=language,
+                          lastIntent=intent, userId=user_id)
+
+        # ── Transcript append (background queue, one batch for both turns) ────
+        now = datetime.utcnow().isoformat()
+        work_queue.enqueue(
+            'ddb.put_items',
+            table=os.environ['DYNAMODB_CONVERSATIONS_TABLE'],
+            region=os.environ['AWS_REGION_NAME'],
+            items=[
+                {'sessionId': session_id, 'timestamp': now,
+                 'userId': user_id, 'role': 'user', 'text': text, 'intent': intent},
+                {'sessionId': session_id, 'timestamp': f"{now}_response",
+                 'userId': user_id, 'role': 'assistant', 'text': response_text},
+            ],
+        )
 
         # ── Google TTS ────────────────────────────────────────────────────────
         tts_text = response_text.replace('—', ',').replace('–', ',').replace('*', '')[:1000]
@@ -1,3 +1,67 @@
+"""
+voice_transcribe/lambda_function.py
+
+Speech → text with Amazon Transcribe, in two modes.
+
+  sync   POST /voice/transcribe            → waits for the job and returns the text
+                                             (polls every 2s, up to 40s)
+  async  POST /voice/transcribe {async}    → 202 {jobId} straight after the upload
+         GET  /voice/transcribe/{jobId}?wait=2
+                                           → the job record; while the job is still
+                                             IN_PROGRESS, with a Retry-After header
+                                             (short poll — see below)
+
+In async mode nothing waits on Transcribe. The job writes its transcript to
+S3 and Transcribe's "Transcribe Job State Change" event (EventBridge rule →
+this function) completes the job record: text, language and confidence, or
+the failure reason. The record is written before the job starts, so even a
+job that finishes at once finds it. GET reads the record and, with ?wait=,
+re-reads it every WAIT_POLL_S for at most TRANSCRIBE_WAIT_MAX_S — a short
+hold, since that time is billed; a job still running is answered with
+Retry-After: RETRY_AFTER_S and the client asks again. It never polls
+Transcribe itself.
+
+The contract is a short poll, not a long poll: a larger ?wait= is clamped
+to TRANSCRIBE_WAIT_MAX_S, so clients must follow Retry-After (or the
+`poll` link from the 202) rather than rely on one GET covering the job.
+Raising TRANSCRIBE_WAIT_MAX_S lengthens the hold, never past API
+Gateway's 29s integration timeout (the function's own deadline caps it).
+
+Before upload every clip goes through shared/audio.py (decode, mono, 16 kHz,
+silence trim, FLAC) — less to upload and less for Transcribe to process.
+The byte and duration ratios it achieved come back as `preprocess`.
+
+Session language memory: clients pass the voice_process sessionId. Once a
+session's language has been identified with LANG_STICKY_CONFIDENCE, later
+clips are submitted with that LanguageCode — no identification pass. Above
+LANG_NARROW_CONFIDENCE, identification only chooses between that language
+and hi-IN / en-IN (code-switching). Below it, all ten languages are tried. A
+pinned clip whose mean word confidence falls under LANG_NARROW_CONFIDENCE
+stores that lower score, so the next clip identifies again. Hints live in
+CACHE_TABLE (cacheKey translang#<sessionId>) for SESSION_LANG_TTL_S and are
+read with ConsistentRead on every clip — never from a container-local copy,
+so a downgrade written by the state-change handler in another container is
+seen by the very next clip.
+
+Job records live in CACHE_TABLE (cacheKey transcribe#<jobId>, expiring after
+JOB_TTL_S). Without it, an in-process dict stands in. Locally there is no
+EventBridge: pass job_event(name, status) to lambda_handler, or run
+`python lambda_function.py watch`. That polls Transcribe for finished
+bhasha- jobs and delivers the same events.
+
+Env vars:
+  AWS_REGION_NAME       — Transcribe region
+  S3_BUCKET             — audio + transcript bucket
+  S3_REGION             — optional, bucket region if different
+  CACHE_TABLE           — job records for async mode (BhashaAI_Cache)
+  TRANSCRIBE_MODE       — default mode when the request does not say: sync | async
+  TRANSCRIBE_WAIT_MAX_S — longest wait= a GET may hold (default 2)
+  LANG_STICKY_CONFIDENCE — pin the session language at or above (default 0.9)
+  LANG_NARROW_CONFIDENCE — narrow the candidates at or above (default 0.6)
+  SESSION_LANG_TTL_S     — how long a session's language is remembered (default 7200)
+  AUDIO_PREPROCESS / FFMPEG_PATH — see shared/audio.py
+"""
+
 import json
 import boto3
 import os
@@ -5,11 +69,27 @@ import uuid
 import time
 import base64
 
+from shared import audio
+from shared.deadline import Deadline, boto_config
+
+MODE         = os.environ.get('TRANSCRIBE_MODE', 'sync')
+JOBS_TABLE   = os.environ.get('CACHE_TABLE', '')
+WAIT_MAX_S   = float(os.environ.get('TRANSCRIBE_WAIT_MAX_S', '2'))
+WAIT_POLL_S  = 0.25
+RETRY_AFTER_S = 2
+JOB_TTL_S    = 3600
+JOB_PREFIX   = 'bhasha-'
+
+STICKY_CONFIDENCE = float(os.environ.get('LANG_STICKY_CONFIDENCE', '0.9'))
+NARROW_CONFIDENCE = float(os.environ.get('LANG_NARROW_CONFIDENCE', '0.6'))
+SESSION_LANG_TTL_S = float(os.environ.get('SESSION_LANG_TTL_S', '7200'))
+
 CORS = {
     'Content-Type': 'application/json',
     'Access-Control-Allow-Origin': '*',
     'Access-Control-Allow-Headers': 'Content-Type,Authorization',
     'Access-Control-Allow-Methods': 'GET,POST,OPTIONS',
+    'Access-Control-Expose-Headers': 'Retry-After',
 }
 
 # Amazon Transcribe language codes for Indian languages
@@ -26,6 +106,9 @@ INDIAN_LANGUAGES = [
     'pa-IN',   # Punjabi
 ]
 
+# Languages users commonly code-switch into — kept when the candidates are narrowed
+FALLBACK_LANGUAGES = ['hi-IN', 'en-IN']
+
 LANG_DISPLAY = {
     'hi-IN': 'Hindi (हिंदी)',
     'en-IN': 'English (India)',
@@ -44,8 +127,21 @@ def lambda_handler(event, context):
     if event.get('httpMethod') == 'OPTIONS':
         return {'statusCode': 200, 'headers': CORS, 'body': ''}
 
+    # Transcribe job state change, delivered by EventBridge (or job_event locally)
+    if event.get('source') == 'aws.transcribe':
+        return on_job_state_change(event)
+
     method = event.get('httpMethod', 'POST')
 
+    if method == 'GET':
+        params = event.get('queryStringParameters') or {}
+        job_id = (event.get('pathParameters') or {}).get('jobId') or params.get('jobId', '')
+        try:
+            wait_s = float(params.get('wait') or 0)
+        except ValueError:
+            wait_s = 0
+        return get_job(job_id, wait_s, Deadline.from_context(context))
+
     if method != 'POST':
         return {
             'statusCode': 405,
@@ -65,7 +161,10 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'audio field required (base64 encoded)'})
             }
 
-        return transcribe_audio(audio_b64, audio_format)
+        session_id = body.get('sessionId', '')
+        if body.get('async', MODE == 'async'):
+            return start_async(audio_b64, audio_format, Deadline.from_context(context), session_id)
+        return transcribe_audio(audio_b64, audio_format, Deadline.from_context(context), session_id)
 
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -76,61 +175,168 @@ def lambda_handler(event, context):
         }
 
 
-def transcribe_audio(audio_b64: str, audio_format: str):
-    region = os.environ['AWS_REGION_NAME']
-    s3_region = os.environ.get('S3_REGION', region)
-    bucket = os.environ['S3_BUCKET']
+MEDIA_FORMATS = {
+    'webm': 'webm',
+    'ogg': 'ogg',
+    'mp3': 'mp3',
+    'mp4': 'mp4',
+    'wav': 'wav',
+    'flac': 'flac',
+    'm4a': 'mp4',
+    'amr': 'amr',
+}
 
-    s3 = boto3.client('s3', region_name=s3_region)
-    transcribe = boto3.client('transcribe', region_name=region)
 
-    # Upload audio to S3
-    job_id = str(uuid.uuid4())
+# ── Session language memory ───────────────────────────────────────────────────
+
+_local_langs = {}   # stand-in for CACHE_TABLE in local runs
+
+
+def _lang_key(session_id: str) -> dict:
+    return {'cacheKey': f'translang#{session_id}'}
+
+
+def _get_session_lang(session_id: str):
+    if not JOBS_TABLE:
+        hint = _local_langs.get(session_id)
+        return hint[1] if hint and hint[0] > time.time() else None
+    try:
+        item = _table().get_item(Key=_lang_key(session_id), ConsistentRead=True).get('Item')
+    except Exception as e:
+        print(f'[transcribe] session language read failed: {e}')
+        return None
+    # TTL deletion is lazy, so expired items can still be returned
+    if item and float(item.get('expiresAt', 0)) > time.time():
+        return json.loads(item['value'])
+    return None
+
+
+def _put_session_lang(session_id: str, hint: dict):
+    expires_at = time.time() + SESSION_LANG_TTL_S
+    if not JOBS_TABLE:
+        _local_langs[session_id] = (expires_at, hint)
+        return
+    try:
+        _table().put_item(Item={**_lang_key(session_id), 'value': json.dumps(hint),
+                                'expiresAt': int(expires_at)})
+    except Exception as e:
+        print(f'[transcribe] session language write failed: {e}')
+
+
+def language_plan(session_id: str) -> tuple:
+    """(mode, start_transcription_job kwargs, hint) for the session's next clip."""
+    hint = _get_session_lang(session_id) if session_id else None
+    confidence = float(hint['confidence']) if hint else 0.0
+    if hint and confidence >= STICKY_CONFIDENCE:
+        return 'pinned', {'LanguageCode': hint['language']}, hint
+    if hint and confidence >= NARROW_CONFIDENCE:
+        options = [hint['language']] + [l for l in FALLBACK_LANGUAGES if l != hint['language']]
+        return 'narrowed', {'IdentifyLanguage': True, 'LanguageOptions': options}, hint
+    return 'identify', {'IdentifyLanguage': True, 'LanguageOptions': INDIAN_LANGUAGES}, hint
+
+
+def _word_confidence(data: dict):
+    scores = [float(item['alternatives'][0].get('confidence', 0))
+              for item in data.get('results', {}).get('items', [])
+              if item.get('type') == 'pronunciation' and item.get('alternatives')]
+    return sum(scores) / len(scores) if scores else None
+
+
+def settle_language(session_id: str, mode: str, hint, job: dict, data: dict) -> tuple:
+    """(language, confidence) of a finished clip; updates the session's memory."""
+    language = job.get('LanguageCode') or (hint or {}).get('language') or 'hi-IN'
+    if mode == 'pinned':
+        words = _word_confidence(data)
+        confidence = float(hint['confidence'])
+        if words is not None and words < NARROW_CONFIDENCE:
+            # Poor recognition in the pinned language — identify again next time
+            print(f'[transcribe] session {session_id}: word confidence {words:.2f}, re-identifying')
+            confidence = words
+    else:
+        confidence = float(job.get('IdentifiedLanguageScore', 0.0))
+    if session_id:
+        _put_session_lang(session_id, {'language': language, 'confidence': round(confidence, 3)})
+    return language, confidence
+
+
+def _upload(s3, job_id: str, audio_b64: str, audio_format: str, deadline: Deadline) -> tuple:
+    """Clean up and upload the clip; returns (s3_key, audio_format, report)."""
+    audio_bytes, audio_format, report = audio.preprocess(base64.b64decode(audio_b64),
+                                                         audio_format, deadline)
     s3_key = f'audio/transcriptions/{job_id}.{audio_format}'
 
-    audio_bytes = base64.b64decode(audio_b64)
     s3.put_object(
-        Bucket=bucket,
+        Bucket=os.environ['S3_BUCKET'],
         Key=s3_key,
         Body=audio_bytes,
         ContentType=f'audio/{audio_format}'
     )
+    return s3_key, audio_format, report
 
-    # Map format to Transcribe MediaFormat
-    media_format_map = {
-        'webm': 'webm',
-        'ogg': 'ogg',
-        'mp3': 'mp3',
-        'mp4': 'mp4',
-        'wav': 'wav',
-        'flac': 'flac',
-        'm4a': 'mp4',
-        'amr': 'amr',
-    }
-    media_format = media_format_map.get(audio_format, 'webm')
 
-    job_name = f'bhasha-{job_id}'
-    s3_uri = f's3://{bucket}/{s3_key}'
+def _start_job(transcribe, job_id: str, s3_key: str, audio_format: str,
+               output_key: str = '', language: dict = None) -> str:
+    """Start the clip's Transcribe job; returns the job name."""
+    bucket = os.environ['S3_BUCKET']
+    job_name = f'{JOB_PREFIX}{job_id}'
+    # Async jobs write the transcript into our bucket, read back with GetObject
+    output = {'OutputBucketName': bucket, 'OutputKey': output_key} if output_key else {}
 
-    # Start transcription job with language auto-detection
+    # Language auto-detection unless the session's language is already known
     transcribe.start_transcription_job(
         TranscriptionJobName=job_name,
-        Media={'MediaFileUri': s3_uri},
-        MediaFormat=media_format,
-        IdentifyLanguage=True,
-        LanguageOptions=INDIAN_LANGUAGES,
+        Media={'MediaFileUri': f's3://{bucket}/{s3_key}'},
+        MediaFormat=MEDIA_FORMATS.get(audio_format, 'webm'),
+        **(language or {'IdentifyLanguage': True, 'LanguageOptions': INDIAN_LANGUAGES}),
         Settings={
             'ShowSpeakerLabels': False,
             'ChannelIdentification': False,
-        }
+        },
+        **output,
     )
+    return job_name
+
+
+def _job_seconds(job: dict):
+    """Transcribe's own processing time for a finished job."""
+    start, end = job.get('CreationTime'), job.get('CompletionTime')
+    return round((end - start).total_seconds(), 1) if start and end else None
+
+
+def _s3():
+    region = os.environ['AWS_REGION_NAME']
+    return boto3.client('s3', region_name=os.environ.get('S3_REGION', region),
+                        config=boto_config(5))
+
+
+def _transcribe():
+    return boto3.client('transcribe', region_name=os.environ['AWS_REGION_NAME'],
+                        config=boto_config(5))
 
-    # Poll for completion (max 40 seconds for short clips)
+
+def transcribe_audio(audio_b64: str, audio_format: str, deadline: Deadline,
+                     session_id: str = ''):
+    region = os.environ['AWS_REGION_NAME']
+    s3_region = os.environ.get('S3_REGION', region)
+    bucket = os.environ['S3_BUCKET']
+
+    # Upload + job control calls are short; the poll loop gets whatever is left
+    s3 = boto3.client('s3', region_name=s3_region,
+                      config=boto_config(deadline.budget(0.3, cap=10) or 1))
+    transcribe = _transcribe()
+
+    mode, language, hint = language_plan(session_id)
+    job_id = str(uuid.uuid4())
+    s3_key, audio_format, report = _upload(s3, job_id, audio_b64, audio_format, deadline)
+    job_name = _start_job(transcribe, job_id, s3_key, audio_format, language=language)
+
+    # Poll for completion (max 40 seconds for short clips), stopping early
+    # enough to fetch the transcript and clean up before the Lambda deadline
     max_wait = 40
     poll_interval = 2
     elapsed = 0
 
-    while elapsed < max_wait:
+    while elapsed < max_wait and deadline.remaining() > poll_interval + 3:
         time.sleep(poll_interval)
         elapsed += poll_interval
 
@@ -141,15 +347,15 @@ def transcribe_audio(audio_b64: str, audio_format: str):
         if status == 'COMPLETED':
             # Fetch transcript text from S3 (Transcribe writes results to S3)
             transcript_uri = job['Transcript']['TranscriptFileUri']
-            detected_lang = job.get('LanguageCode', 'hi-IN')
-            lang_confidence = job.get('IdentifiedLanguageScore', 0.0)
 
             # Download transcript JSON from the URI
             import urllib.request
-            with urllib.request.urlopen(transcript_uri) as resp:
+            with urllib.request.urlopen(transcript_uri, timeout=max(1, deadline.remaining())) as resp:
                 transcript_data = json.loads(resp.read().decode('utf-8'))
 
             text = transcript_data['results']['transcripts'][0]['transcript']
+            detected_lang, lang_confidence = settle_language(session_id, mode, hint, job,
+                                                             transcript_data)
 
             # Cleanup S3 audio file
             try:
@@ -165,6 +371,9 @@ def transcribe_audio(audio_b64: str, audio_format: str):
                     'detectedLanguage': detected_lang,
                     'languageDisplay': LANG_DISPLAY.get(detected_lang, detected_lang),
                     'confidence': round(float(lang_confidence), 3),
+                    'languageMode': mode,
+                    'preprocess': report,
+                    'transcribeSeconds': _job_seconds(job),
                 })
             }
 
@@ -185,6 +394,7 @@ def transcribe_audio(audio_b64: str, audio_format: str):
         # Still IN_PROGRESS, keep polling
 
     # Timeout — cleanup and return error
+    deadline.degrade('transcribe', f'job still running after {elapsed}s')
     try:
         s3.delete_object(Bucket=bucket, Key=s3_key)
         transcribe.delete_transcription_job(TranscriptionJobName=job_name)
@@ -194,5 +404,209 @@ def transcribe_audio(audio_b64: str, audio_format: str):
     return {
         'statusCode': 504,
         'headers': CORS,
-        'body': json.dumps({'error': 'Transcription timed out after 40 seconds'})
+        'body': json.dumps({
+            'error': f'Transcription timed out after {elapsed} seconds',
+            'degraded': deadline.degraded,
+        })
     }
+
+
+# ── Async mode ────────────────────────────────────────────────────────────────
+
+_jobs_table  = None
+_local_jobs  = {}   # stand-in for CACHE_TABLE in local runs
+
+
+def _table():
+    global _jobs_table
+    if _jobs_table is None:
+        _jobs_table = boto3.resource('dynamodb', region_name=os.environ['AWS_REGION_NAME']).Table(JOBS_TABLE)
+    return _jobs_table
+
+
+def _job_key(job_id: str) -> dict:
+    return {'cacheKey': f'transcribe#{job_id}'}
+
+
+def _put_job(job_id: str, record: dict):
+    if not JOBS_TABLE:
+        _local_jobs[job_id] = dict(record)
+        return
+    _table().put_item(Item={**_job_key(job_id), **record,
+                            'expiresAt': int(time.time() + JOB_TTL_S)})
+
+
+def _complete_job(job_id: str, fields: dict) -> bool:
+    """Merge the result into a pending job record; False if there is none."""
+    if not JOBS_TABLE:
+        if job_id not in _local_jobs:
+            return False
+        _local_jobs[job_id].update(fields)
+        return True
+    names  = {f'#f{i}': k for i, k in enumerate(fields)}
+    values = {f':f{i}': v for i, v in enumerate(fields.values())}
+    try:
+        _table().update_item(
+            Key=_job_key(job_id),
+            UpdateExpression='SET ' + ', '.join(f'#f{i} = :f{i}' for i in range(len(fields))),
+            # The record may have expired in the meantime
+            ConditionExpression='attribute_exists(cacheKey)',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+        return True
+    except _table().meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+
+def _get_job(job_id: str):
+    if not JOBS_TABLE:
+        job = _local_jobs.get(job_id)
+        return dict(job) if job else None
+    return _table().get_item(Key=_job_key(job_id), ConsistentRead=True).get('Item')
+
+
+def start_async(audio_b64: str, audio_format: str, deadline: Deadline, session_id: str = ''):
+    """Upload, record the job, start it — and return without waiting."""
+    job_id = str(uuid.uuid4())
+    mode, language, hint = language_plan(session_id)
+    s3_key, audio_format, report = _upload(_s3(), job_id, audio_b64, audio_format, deadline)
+    # The record goes first: a short clip's state-change event can arrive
+    # before start_transcription_job has even returned
+    _put_job(job_id, {
+        'status':       'IN_PROGRESS',
+        'jobName':      f'{JOB_PREFIX}{job_id}',
+        'audioKey':     s3_key,
+        'createdAt':    int(time.time()),
+        'sessionId':    session_id,
+        'languageMode': mode,
+        'hint':         json.dumps(hint) if hint else '',
+        'preprocess':   json.dumps(report),
+    })
+    try:
+        _start_job(_transcribe(), job_id, s3_key, audio_format,
+                   output_key=f'audio/transcripts/{job_id}.json', language=language)
+    except Exception as e:
+        _complete_job(job_id, {'status': 'FAILED', 'error': f'Transcription failed to start: {e}'})
+        raise
+    return {
+        'statusCode': 202,
+        'headers': {**CORS, 'Retry-After': str(RETRY_AFTER_S)},
+        'body': json.dumps({
+            'jobId':  job_id,
+            'status': 'IN_PROGRESS',
+            'poll':   f'/voice/transcribe/{job_id}?wait={WAIT_MAX_S:g}',
+            'preprocess': report,
+        })
+    }
+
+
+def job_event(job_name: str, status: str) -> dict:
+    """The EventBridge event Transcribe emits when `job_name` reaches `status`."""
+    return {
+        'source': 'aws.transcribe',
+        'detail-type': 'Transcribe Job State Change',
+        'detail': {'TranscriptionJobName': job_name, 'TranscriptionJobStatus': status},
+    }
+
+
+def on_job_state_change(event: dict) -> dict:
+    detail   = event.get('detail') or {}
+    job_name = detail.get('TranscriptionJobName', '')
+    status   = detail.get('TranscriptionJobStatus', '')
+    if not job_name.startswith(JOB_PREFIX) or status not in ('COMPLETED', 'FAILED'):
+        return {'ignored': job_name}
+
+    job_id = job_name[len(JOB_PREFIX):]
+    pending = _get_job(job_id)
+    if not pending or pending.get('status') != 'IN_PROGRESS':
+        return {'ignored': job_name}    # a sync-mode job, or a redelivered event
+    bucket = os.environ['S3_BUCKET']
+    s3     = _s3()
+    job    = _transcribe().get_transcription_job(TranscriptionJobName=job_name)['TranscriptionJob']
+
+    if status == 'COMPLETED':
+        transcript_key = f'audio/transcripts/{job_id}.json'
+        data = json.loads(s3.get_object(Bucket=bucket, Key=transcript_key)['Body'].read())
+        detected_lang, confidence = settle_language(
+            pending.get('sessionId', ''), pending.get('languageMode', 'identify'),
+            json.loads(pending.get('hint') or 'null'), job, data,
+        )
+        fields = {
+            'status':           'COMPLETED',
+            'text':             data['results']['transcripts'][0]['transcript'],
+            'detectedLanguage': detected_lang,
+            'languageDisplay':  LANG_DISPLAY.get(detected_lang, detected_lang),
+            'confidence':       str(round(confidence, 3)),
+            'transcribeSeconds': str(_job_seconds(job)),
+        }
+        cleanup = [transcript_key]
+    else:
+        fields  = {'status': 'FAILED', 'error': f"Transcription failed: {job.get('FailureReason', 'Unknown error')}"}
+        cleanup = []
+
+    if not _complete_job(job_id, fields):
+        return {'ignored': job_name}
+    print(f'[transcribe] {job_name} {status} in {_job_seconds(job)}s')
+
+    media_uri = job.get('Media', {}).get('MediaFileUri', '')
+    if media_uri.startswith(f's3://{bucket}/'):
+        cleanup.append(media_uri[len(f's3://{bucket}/'):])
+    for key in cleanup:
+        try:
+            s3.delete_object(Bucket=bucket, Key=key)
+        except Exception:
+            pass  # Non-fatal — the lifecycle rule removes leftovers
+    return {'jobId': job_id, 'status': status}
+
+
+def get_job(job_id: str, wait_s: float, deadline: Deadline):
+    if not job_id:
+        return {'statusCode': 400, 'headers': CORS, 'body': json.dumps({'error': 'jobId required'})}
+
+    # Re-read the job record (never Transcribe) until it settles or wait_s passes
+    wait_s = max(0.0, min(wait_s, WAIT_MAX_S, deadline.remaining() - 1))
+    until  = time.time() + wait_s
+    while True:
+        job = _get_job(job_id)
+        if not job:
+            return {'statusCode': 404, 'headers': CORS, 'body': json.dumps({'error': 'Unknown job'})}
+        if job.get('status') != 'IN_PROGRESS' or time.time() >= until:
+            break
+        time.sleep(WAIT_POLL_S)
+
+    result = {'jobId': job_id, 'status': job['status']}
+    for field in ('text', 'detectedLanguage', 'languageDisplay', 'languageMode', 'error'):
+        if field in job:
+            result[field] = job[field]
+    if 'confidence' in job:
+        result['confidence'] = float(job['confidence'])
+    if job.get('transcribeSeconds') not in (None, 'None'):
+        result['transcribeSeconds'] = float(job['transcribeSeconds'])
+    if job.get('preprocess'):
+        result['preprocess'] = json.loads(job['preprocess'])
+    headers = {**CORS, 'Retry-After': str(RETRY_AFTER_S)} if job['status'] == 'IN_PROGRESS' else CORS
+    return {'statusCode': 200, 'headers': headers, 'body': json.dumps(result)}
+
+
+def watch(interval_s: float = 2.0):
+    """Local stand-in for the EventBridge rule: deliver finished jobs' events."""
+    transcribe, seen = _transcribe(), set()
+    print('[transcribe] watching for finished bhasha- jobs (Ctrl+C to stop)')
+    while True:
+        for status in ('COMPLETED', 'FAILED'):
+            summaries = transcribe.list_transcription_jobs(
+                Status=status, JobNameContains=JOB_PREFIX, MaxResults=100,
+            ).get('TranscriptionJobSummaries', [])
+            for summary in summaries:
+                name = summary['TranscriptionJobName']
+                if name not in seen:
+                    seen.add(name)
+                    print(f'[transcribe] {name}: {lambda_handler(job_event(name, status), None)}')
+        time.sleep(interval_s)
+
+
+if __name__ == '__main__':
+    import sys
+    if sys.argv[1:] == ['watch']:
+        watch()
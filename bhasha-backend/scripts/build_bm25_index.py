@@ -0,0 +1,65 @@
+"""
+build_bm25_index.py
+
+Builds the lexical BM25 index (shared/bm25.py) that shared/local_kb.py fuses
+with vector search. It indexes the same rows as the vector index: if --out
+already holds a chunks.jsonl (from build_vector_index.py) that is used as
+is; otherwise the chunk store is written from the prepare_kb_docs.py
+--local-only output first, and the index serves BM25 alone. The header
+records the chunk store's digest; rebuild after build_vector_index.py
+rewrites the chunks.
+
+Usage:
+  pip install numpy
+  python scripts/prepare_kb_docs.py --bucket unused --local-only
+  python scripts/build_vector_index.py --input kb_output --out kb_index   # optional
+  python scripts/build_bm25_index.py   --input kb_output --out kb_index
+  aws s3 sync kb_index s3://YOUR_BUCKET/kb-index/
+
+No network calls; a few seconds per 100k chunks.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+from shared import bm25                                              # noqa: E402
+from shared.local_kb import chunk_files, chunk_meta, iter_chunks, write_chunks   # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', default='kb_output', help='prepare_kb_docs.py --local-only output')
+    parser.add_argument('--out',   default='kb_index')
+    parser.add_argument('--limit', type=int, default=0, help='max chunks when writing the chunk store')
+    parser.add_argument('--k1',    type=float, default=bm25.K1)
+    parser.add_argument('--b',     type=float, default=bm25.B)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    if not os.path.exists(os.path.join(args.out, 'chunks.jsonl')):
+        files = chunk_files(args.input, args.limit)
+        if not files:
+            sys.exit(f'No .txt chunks under {args.input} — run prepare_kb_docs.py --local-only first')
+        print(f'Writing chunk store for {len(files):,} chunks → {args.out}')
+        write_chunks(files, args.input, args.out)
+
+    t0 = time.time()
+    docs = (f"{c['title']}\n{c['text']}" for c in iter_chunks(args.out))
+    n_docs, n_terms = bm25.write_index(args.out, docs, args.k1, args.b,
+                                       digest=chunk_meta(args.out)['digest'])
+    size = sum(os.path.getsize(os.path.join(args.out, p))
+               for p in os.listdir(args.out) if p.startswith('bm25.'))
+    print(f'✓ {args.out}: {n_docs:,} chunks, {n_terms:,} terms, {size / 1e6:.1f} MB '
+          f'({time.time() - t0:.1f}s)')
+
+    idx = bm25.BM25Index(args.out)
+    for query in ('metformin dose', 'dengue platelet count'):
+        print(f'  {query!r} → {idx.search(query, 3)}')
+
+
+if __name__ == '__main__':
+    main()
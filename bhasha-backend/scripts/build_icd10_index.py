@@ -0,0 +1,162 @@
+"""
+build_icd10_index.py
+
+Compiles the public CMS ICD-10-CM code set into the lookup index that
+shared/icd10.py memory-maps (lambdas/shared/data/icd10.idx). deploy.sh
+bundles everything under shared/, so rebuild and redeploy after each
+annual ICD-10-CM release.
+
+Inputs (from https://www.cms.gov/medicare/coding-billing/icd-10-codes — the
+"Code Descriptions in Tabular Order" and "Tabular" zips):
+  --order    icd10cm_order_2025.txt    fixed-width code list (required)
+  --tabular  icd10cm_tabular_2025.xml  adds inclusion terms as synonyms (optional)
+  --synonyms extra.tsv                 `term<TAB>code` lines (optional)
+
+Usage:
+  python scripts/build_icd10_index.py --order icd10cm_order_2025.txt \\
+      --tabular icd10cm_tabular_2025.xml
+
+When two codes normalise to the same key, the built-in / --synonyms lay
+terms win, then billable codes, then inclusion terms, then category
+headers; ties go to the shorter (less specific) code.
+"""
+
+import argparse
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+from shared.icd10 import Index, normalize, write_index   # noqa: E402
+from shared import gazetteer                              # noqa: E402
+
+# Lay / Indian-English terms → code. Covers every gazetteer condition and
+# symptom, so locally extracted entities always resolve.
+SYNONYMS = {
+    # symptoms
+    'fever': 'R50.9', 'cough': 'R05.9', 'headache': 'R51.9', 'vomiting': 'R11.10',
+    'nausea': 'R11.0', 'diarrhoea': 'R19.7', 'diarrhea': 'R19.7', 'loose motions': 'R19.7',
+    'stomach pain': 'R10.9', 'abdominal pain': 'R10.9', 'chest pain': 'R07.9',
+    'shortness of breath': 'R06.02', 'breathlessness': 'R06.02', 'dizziness': 'R42',
+    'vertigo': 'R42', 'fatigue': 'R53.83', 'weakness': 'R53.1', 'runny nose': 'J00',
+    'common cold': 'J00', 'cold': 'J00', 'sore throat': 'J02.9', 'body ache': 'M79.10',
+    'joint pain': 'M25.50', 'back pain': 'M54.9', 'toothache': 'K08.89', 'ear pain': 'H92.09',
+    'eye pain': 'H57.10', 'pain': 'R52', 'rash': 'R21', 'itching': 'L29.9',
+    'swelling': 'R60.9', 'burning urination': 'R30.0', 'frequent urination': 'R35.0',
+    'loss of appetite': 'R63.0', 'insomnia': 'G47.00', 'palpitations': 'R00.2',
+    'chills': 'R68.83', 'sweating': 'R61', 'constipation': 'K59.00', 'heartburn': 'R12',
+    'blurred vision': 'H53.8', 'fainting': 'R55', 'seizure': 'R56.9', 'bleeding': 'R58',
+    'numbness': 'R20.0',
+    # conditions
+    'diabetes': 'E11.9', 'sugar': 'E11.9', 'hypertension': 'I10', 'high blood pressure': 'I10',
+    'high bp': 'I10', 'asthma': 'J45.909', 'tuberculosis': 'A15.9', 'tb': 'A15.9',
+    'malaria': 'B54', 'dengue': 'A90', 'typhoid': 'A01.00', 'jaundice': 'R17',
+    'migraine': 'G43.909', 'anaemia': 'D64.9', 'anemia': 'D64.9', 'thyroid disorder': 'E07.9',
+    'pneumonia': 'J18.9', 'covid-19': 'U07.1', 'covid': 'U07.1', 'heart attack': 'I21.9',
+    'stroke': 'I63.9', 'arthritis': 'M19.90', 'kidney stone': 'N20.0', 'epilepsy': 'G40.909',
+    'chickenpox': 'B01.9', 'urinary tract infection': 'N39.0', 'uti': 'N39.0',
+    'food poisoning': 'A05.9', 'piles': 'K64.9', 'gastritis': 'K29.70', 'cancer': 'C80.1',
+    'depression': 'F32.A', 'flu': 'J11.1', 'viral fever': 'B34.9', 'acid reflux': 'K21.9',
+    'gerd': 'K21.9', 'high cholesterol': 'E78.00', 'obesity': 'E66.9', 'pcos': 'E28.2',
+    'pcod': 'E28.2', 'copd': 'J44.9', 'sinusitis': 'J32.9', 'conjunctivitis': 'H10.9',
+    'pink eye': 'H10.9', 'tonsillitis': 'J03.90', 'bronchitis': 'J40', 'hepatitis': 'K75.9',
+    'cholera': 'A00.9', 'chikungunya': 'A92.0', 'measles': 'B05.9', 'mumps': 'B26.9',
+    'scabies': 'B86', 'ringworm': 'B35.9', 'eczema': 'L30.9', 'psoriasis': 'L40.9',
+    'acne': 'L70.0', 'anxiety': 'F41.9', 'kidney failure': 'N19',
+    'chronic kidney disease': 'N18.9', 'heart failure': 'I50.9', 'angina': 'I20.9',
+}
+
+SYNONYM, BILLABLE, INCLUSION, HEADER = range(4)
+
+
+def dotted(code: str) -> str:
+    return code if len(code) <= 3 else f'{code[:3]}.{code[3:]}'
+
+
+def read_order(path: str):
+    """(code, billable, long description) per line of the CMS order file."""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if len(line) < 77:
+                continue
+            yield dotted(line[6:13].strip()), line[14] == '1', line[77:].strip()
+
+
+def read_inclusions(path: str):
+    """(code, inclusion term) pairs from the CMS tabular XML."""
+    for diag in ET.parse(path).getroot().iter('diag'):
+        code = diag.findtext('name', '').strip()
+        for inc in diag.findall('inclusionTerm'):
+            for note in inc.findall('note'):
+                if note.text:
+                    yield code, note.text.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--order',    required=True, help='icd10cm_order_<year>.txt')
+    parser.add_argument('--tabular',  help='icd10cm_tabular_<year>.xml (inclusion terms)')
+    parser.add_argument('--synonyms', help='extra `term<TAB>code` synonyms')
+    parser.add_argument('--out', default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas', 'shared', 'data', 'icd10.idx'))
+    args = parser.parse_args()
+
+    entries, entry_of = [], {}
+    keys = {}   # key → (priority, code length, entry)
+
+    def add(term: str, code: str, priority: int):
+        key = normalize(term)
+        if not key or code not in entry_of:
+            return
+        cand = (priority, len(code), entry_of[code])
+        if key not in keys or cand < keys[key]:
+            keys[key] = cand
+
+    print(f'Reading {args.order} ...')
+    codes = list(read_order(args.order))
+    for code, _, desc in codes:
+        entry_of[code] = len(entries)
+        entries.append((code, desc))
+    for code, billable, desc in codes:
+        add(desc, code, BILLABLE if billable else HEADER)
+    print(f'  {len(entries):,} codes')
+
+    if args.tabular:
+        n = 0
+        for code, term in read_inclusions(args.tabular):
+            add(term, code, INCLUSION)
+            n += 1
+        print(f'  {n:,} inclusion terms')
+
+    synonyms = dict(SYNONYMS)
+    if args.synonyms:
+        with open(args.synonyms, encoding='utf-8') as f:
+            for line in f:
+                if '\t' in line and not line.startswith('#'):
+                    term, code = line.rstrip('\n').split('\t', 1)
+                    synonyms[term.strip()] = code.strip()
+    missing = [t for t, c in synonyms.items() if c not in entry_of]
+    if missing:
+        print(f'  ⚠ {len(missing)} synonyms point at codes not in this release: {missing[:10]}')
+    for term, code in synonyms.items():
+        add(term, code, SYNONYM)
+
+    # Every gazetteer canonical term must resolve
+    unresolved = [t for t in list(gazetteer.CONDITIONS) + list(gazetteer.SYMPTOMS)
+                  if normalize(t) not in keys]
+    if unresolved:
+        print(f'  ⚠ gazetteer terms without a code: {unresolved}')
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    write_index(args.out, entries, {k: v[2] for k, v in keys.items()})
+    size = os.path.getsize(args.out)
+    print(f'✓ {args.out}: {len(keys):,} terms → {len(entries):,} codes, {size / 1e6:.1f} MB')
+
+    idx = Index(args.out)
+    for term in ('fever', 'high blood pressure', 'Type 2 diabetes mellitus without complications'):
+        print(f'  {term!r} → {idx.lookup(term)}')
+
+
+if __name__ == '__main__':
+    main()
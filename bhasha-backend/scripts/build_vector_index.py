@@ -0,0 +1,206 @@
+"""
+build_vector_index.py
+
+Embeds the chunks written by `prepare_kb_docs.py --local-only` (./kb_output/)
+into the index shared/local_kb.py serves: a memory-mapped float16 matrix
+plus the chunk texts, with optional IVF partitioning.
+
+Usage:
+  pip install boto3 numpy tqdm
+  python scripts/prepare_kb_docs.py --bucket unused --local-only
+  python scripts/build_vector_index.py --input kb_output --out kb_index
+  aws s3 sync kb_index s3://YOUR_BUCKET/kb-index/      # then LOCAL_KB_DIR=s3://YOUR_BUCKET/kb-index/
+
+Embeddings come from Titan Text Embeddings v2 (the model the Bedrock KB
+uses), `--workers` calls in parallel. Calls go straight to invoke_model,
+not through shared/local_kb.embed: its circuit breaker protects the request
+path and would open under build-time throttling, aborting the run. Throttled
+or unavailable calls are retried with backoff instead.
+
+Every row's vector is keyed by its chunk file and a hash of the text it was
+embedded from (vectors.keys, one `file<TAB>sha1` line per row). A re-run
+reuses any vector whose key is still present, wherever its row has moved
+to, and only embeds new or changed chunks. Work in progress goes to
+vectors.f16.partial, which the next run picks up after an interruption;
+the finished files replace the old ones at the end.
+
+The chunk store is rewritten on every run; when the chunks changed, re-run
+build_bm25_index.py too — shared/local_kb.py refuses to load indexes built
+from different chunks (meta.json and bm25.meta.json carry its digest).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import numpy as np
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+from shared.local_kb import EMBED_MODEL, chunk_files, chunk_meta, iter_chunks, write_chunks   # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--input',   default='kb_output', help='prepare_kb_docs.py --local-only output')
+parser.add_argument('--out',     default='kb_index')
+parser.add_argument('--dim',     type=int, default=256, choices=[256, 512, 1024])
+parser.add_argument('--ivf',     type=int, default=-1,
+                    help='IVF lists (-1 = ~sqrt(rows) above 10k rows, 0 = exact search only)')
+parser.add_argument('--workers', type=int, default=16, help='parallel embedding calls')
+parser.add_argument('--limit',   type=int, default=0, help='max chunks (0 = all)')
+parser.add_argument('--region',  default=os.environ.get('EMBED_REGION', 'ap-south-1'))
+args = parser.parse_args()
+
+
+EMBED_ATTEMPTS = 8
+RETRYABLE      = {'ThrottlingException', 'ServiceUnavailableException',
+                  'ModelTimeoutException', 'ModelNotReadyException'}
+
+
+def embed(client, text: str, dim: int) -> list:
+    """Unit-normalised Titan v2 embedding, retried with backoff while throttled."""
+    body = json.dumps({'inputText': text[:20000], 'dimensions': dim, 'normalize': True})
+    for attempt in range(EMBED_ATTEMPTS):
+        try:
+            resp = client.invoke_model(modelId=EMBED_MODEL, body=body)
+            return json.loads(resp['body'].read())['embedding']
+        except ClientError as e:
+            if e.response['Error']['Code'] not in RETRYABLE or attempt == EMBED_ATTEMPTS - 1:
+                raise
+            time.sleep(random.uniform(0, min(30, 0.5 * 2 ** attempt)))
+
+
+def kmeans(vectors, nlist: int, iters: int = 10, sample: int = 50000, seed: int = 0):
+    """Spherical k-means on a sample; returns unit-norm centroids."""
+    rng  = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), min(sample, len(vectors)), replace=False)
+    x    = np.asarray(vectors[np.sort(rows)], dtype=np.float32)
+    cent = x[rng.choice(len(x), nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ cent.T, axis=1)
+        for c in range(nlist):
+            members = x[assign == c]
+            if len(members):
+                cent[c] = members.sum(axis=0)
+        cent /= np.linalg.norm(cent, axis=1, keepdims=True) + 1e-9
+    return cent
+
+
+def row_key(chunk: dict, text: str) -> str:
+    return f"{chunk['file']}\t{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+
+def read_keys(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def open_vectors(vec_path: str, keys_path: str, dim: int):
+    """(memmap, keys) of an earlier run's matrix, or (None, []) when absent or inconsistent."""
+    keys = read_keys(keys_path)
+    if not keys or not os.path.exists(vec_path) or os.path.getsize(vec_path) != len(keys) * dim * 2:
+        return None, []
+    return np.memmap(vec_path, dtype=np.float16, mode='r', shape=(len(keys), dim)), keys
+
+
+def swap(vec_src: str, keys_src: str, vec_dst: str, keys_dst: str):
+    # Keys last: a matrix without its keys file is never reused
+    if os.path.exists(keys_dst):
+        os.remove(keys_dst)
+    os.replace(vec_src, vec_dst)
+    os.replace(keys_src, keys_dst)
+
+
+def main():
+    files = chunk_files(args.input, args.limit)
+    n, dim = len(files), args.dim
+    if not n:
+        sys.exit(f'No .txt chunks under {args.input} — run prepare_kb_docs.py --local-only first')
+    os.makedirs(args.out, exist_ok=True)
+    print(f'{n:,} chunks → {args.out} (dim {dim})')
+
+    # ── Chunk store (shared with build_bm25_index.py) ───────────────────────
+    write_chunks(files, args.input, args.out)
+    chunks = list(iter_chunks(args.out))
+    texts  = [f"{c['title']}\n{c['text']}".strip() for c in chunks]
+    keys   = [row_key(c, t) for c, t in zip(chunks, texts)]
+
+    # ── Embeddings (resumable, keyed by file + content hash) ─────────────────
+    vec_path, keys_path = os.path.join(args.out, 'vectors.f16'), os.path.join(args.out, 'vectors.keys')
+    partial, partial_keys = vec_path + '.partial', keys_path + '.partial'
+
+    # Vectors an interrupted run or the last finished build already paid for
+    sources = [open_vectors(vec_path, keys_path, dim), open_vectors(partial, partial_keys, dim)]
+    known   = {key: (old, row) for old, old_keys in sources
+               for row, key in enumerate(old_keys) if old[row].any()}
+
+    # Lay out this run's rows next to the sources, then swap it in as the partial
+    staging = np.memmap(partial + '.next', dtype=np.float16, mode='w+', shape=(n, dim))
+    todo = []
+    for i, key in enumerate(keys):
+        if key in known:
+            old, row = known[key]
+            staging[i] = old[row]
+        else:
+            todo.append(i)
+    staging.flush()
+    del staging, sources, known
+    with open(partial_keys + '.next', 'w', encoding='utf-8') as f:
+        f.write(''.join(f'{k}\n' for k in keys))
+    swap(partial + '.next', partial_keys + '.next', partial, partial_keys)
+    vectors = np.memmap(partial, dtype=np.float16, mode='r+', shape=(n, dim))
+    print(f'  embedding {len(todo):,} chunks ({n - len(todo):,} reused)')
+
+    client = boto3.client('bedrock-runtime', region_name=args.region, config=Config(
+        max_pool_connections=args.workers,
+        retries={'max_attempts': 3, 'mode': 'adaptive'},
+    ))
+
+    def work(i: int):
+        vectors[i] = np.asarray(embed(client, texts[i] or ' ', dim), dtype=np.float16)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for done, _ in enumerate(tqdm(pool.map(work, todo), total=len(todo), desc='Embeddings')):
+            if done % 5000 == 4999:
+                vectors.flush()
+    vectors.flush()
+    del vectors
+    swap(partial, partial_keys, vec_path, keys_path)
+    vectors = np.memmap(vec_path, dtype=np.float16, mode='r', shape=(n, dim))
+
+    # ── Optional IVF ─────────────────────────────────────────────────────────
+    nlist = min(args.ivf, n) if args.ivf >= 0 else (int(n ** 0.5) if n >= 10000 else 0)
+    if nlist:
+        print(f'  IVF: {nlist} lists')
+        cent   = kmeans(vectors, nlist)
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 32768):
+            block = np.asarray(vectors[start:start + 32768], dtype=np.float32)
+            assign[start:start + len(block)] = np.argmax(block @ cent.T, axis=1)
+        order = np.argsort(assign, kind='stable').astype(np.int32)
+        list_off = np.zeros(nlist + 1, dtype=np.int64)
+        list_off[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+        cent.astype(np.float16).tofile(os.path.join(args.out, 'ivf.centroids.f16'))
+        order.tofile(os.path.join(args.out, 'ivf.lists.i32'))
+        list_off.tofile(os.path.join(args.out, 'ivf.offsets.i64'))
+
+    with open(os.path.join(args.out, 'meta.json'), 'w') as f:
+        json.dump({'model': EMBED_MODEL, 'dim': dim, 'count': n, 'nlist': nlist,
+                   'digest': chunk_meta(args.out)['digest']}, f)
+
+    size = sum(os.path.getsize(os.path.join(args.out, p)) for p in os.listdir(args.out))
+    print(f'✓ {args.out}: {n:,} chunks, {size / 1e6:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
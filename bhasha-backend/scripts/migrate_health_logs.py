@@ -0,0 +1,97 @@
+"""
+migrate_health_logs.py
+
+One-off migration of health logs written before they were time-keyed.
+Old items sit under recordId log#<logId> (a random UUID), so they sort
+randomly and the since / until key condition in shared/records.py skips
+them. Each one is rewritten to log#<timestamp>#<logId> — the layout
+health_log writes today — with every other attribute unchanged.
+
+Usage:
+  python scripts/migrate_health_logs.py --dry-run     # count, write nothing
+  python scripts/migrate_health_logs.py
+
+Each item moves in one transaction (put new key + delete old key, both
+conditional), so a log is never duplicated or lost, and re-running is safe:
+items already migrated are not matched again. This is the one place that
+Scans the main table — acceptable for a single pass, never in a handler.
+Items without a timestamp are left in place and listed.
+
+Env vars:
+  DYNAMODB_MAIN_TABLE / AWS_REGION_NAME — as for the Lambdas (shared/records.py)
+"""
+
+import argparse
+import os
+import sys
+
+from boto3.dynamodb.conditions import Attr
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+from shared import records, writes   # noqa: E402
+
+PREFIX = records.PREFIX['health_log']
+
+
+def legacy_logs(table):
+    """Health logs still keyed log#<logId> — no '#' after the prefix."""
+    kwargs = {'FilterExpression': Attr('recordId').begins_with(PREFIX)}
+    while True:
+        resp = table.scan(**kwargs)
+        for item in resp.get('Items', []):
+            if '#' not in item['recordId'][len(PREFIX):]:
+                yield item
+        if 'LastEvaluatedKey' not in resp:
+            return
+        kwargs['ExclusiveStartKey'] = resp['LastEvaluatedKey']
+
+
+def migrate(table, item: dict):
+    log_id = item.get('logId') or item['recordId'][len(PREFIX):]
+    new = {**item, 'logId': log_id,
+           'recordId': records.record_id('health_log', item['timestamp'], log_id)}
+    writes.transact([
+        {'Put': {'TableName': table.name, 'Item': new,
+                 'ConditionExpression': 'attribute_not_exists(recordId)'}},
+        {'Delete': {'TableName': table.name,
+                    'Key': {'userId': item['userId'], 'recordId': item['recordId']},
+                    'ConditionExpression': 'attribute_exists(recordId)'}},
+    ], region=records.REGION)
+    return new['recordId']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--table',   default=records.TABLE_NAME)
+    parser.add_argument('--dry-run', action='store_true', help='only report what would move')
+    args = parser.parse_args()
+
+    table = records.table(args.table)
+    moved = skipped = 0
+    untimed = []
+    for item in legacy_logs(table):
+        if not item.get('timestamp'):
+            untimed.append(f"{item['userId']} {item['recordId']}")
+            continue
+        if args.dry_run:
+            moved += 1
+            continue
+        try:
+            new_id = migrate(table, item)
+        except writes.ConditionFailed:
+            skipped += 1          # already moved, or deleted meanwhile
+            continue
+        moved += 1
+        print(f"  {item['userId']}: {item['recordId']} → {new_id}")
+
+    verb = 'would move' if args.dry_run else 'moved'
+    print(f'✓ {args.table}: {verb} {moved:,} log(s), {skipped:,} skipped (already migrated)')
+    if untimed:
+        print(f'  {len(untimed)} log(s) have no timestamp and were left as they are:')
+        for line in untimed:
+            print(f'    {line}')
+
+
+if __name__ == '__main__':
+    main()
@@ -8,18 +8,67 @@ Usage:
   pip install datasets boto3 tqdm
   python prepare_kb_docs.py --bucket YOUR_S3_BUCKET --prefix kb-docs/
 
-The script creates files like:
-  s3://YOUR_BUCKET/kb-docs/textbooks/grays_anatomy_chunk_001.txt
-  s3://YOUR_BUCKET/kb-docs/pmc/pmc_chunk_00001.txt
+  # offline, from local exports (rows with content/text, title, source/id):
+  python prepare_kb_docs.py --bucket YOUR_S3_BUCKET \\
+      --textbooks-file textbooks.parquet --pmc --pmc-file pubmed.jsonl
+
+The script creates files like (<id> is the row's slugified `id`, or the
+first 12 hex digits of its content's SHA-1 for rows without one; a row
+split into several chunks adds _1, _2, …):
+  s3://YOUR_BUCKET/kb-docs/textbooks/anatomy_gray_anatomy_gray_123.txt
+  s3://YOUR_BUCKET/kb-docs/pmc/pmc_27856001_4.txt
+Keys never depend on a row's position, so inserting or dropping a row
+upstream only adds or deletes that row's documents.
+or, with --pack-kb, one file per group of chunks:
+  s3://YOUR_BUCKET/kb-docs/textbooks/anatomy_gray_part_3f9a1c02b7de.txt
 
 Then in AWS Console:
   Bedrock → Knowledge Bases → Create → point to s3://YOUR_BUCKET/kb-docs/
+
+Reruns are incremental. A manifest of SHA-1 → key for every document sits
+beside the corpus (s3://YOUR_BUCKET/kb-docs.manifest.tsv.gz, outside the
+KB data source); a rerun uploads only new or changed documents, deletes
+documents that disappeared, and prints a diff summary. Unchanged objects
+are never rewritten, so the next KB sync only re-embeds what changed.
+Documents a run stops producing (e.g. --pmc dropped, a lower limit) are
+deleted too, unless --keep-removed.
+
+Uploads run on a bounded thread pool (--workers) sharing one S3 client and
+its connection pool. During a run every completed key is also appended to
+a checkpoint journal, so an interrupted run resumes where it stopped;
+deletions and the manifest are only committed by a run that completes
+without failed writes. --pack-kb packs consecutive chunks of the same
+source into larger documents (far fewer PUTs; the Knowledge Base
+re-chunks them anyway). Part boundaries are content-defined, so packing
+stays incremental: adding, removing or editing a chunk changes only the
+part holding it. The run ends with a throughput report.
+
+Every source runs through the same streaming pipeline (read → clean →
+chunk → serialize → sink, see "Streaming pipeline" below); memory stays
+flat regardless of corpus size.
+
+--local-only writes ./kb_output/ — one file per chunk, never packed, since
+build_vector_index.py / build_bm25_index.py index one chunk per file —
+through the same pool and journal.
 """
 
 import argparse
+import atexit
+import gzip
+import hashlib
+import itertools
+import json
 import os
+import queue
 import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
+from botocore.config import Config
 from tqdm import tqdm
 
 # ── Args ──────────────────────────────────────────────────────────────────────
@@ -35,33 +84,388 @@ parser.add_argument('--pmc-limit',      type=int, default=50000,
                     help='Max PMC chunks to upload (default 50k ≈ ~200MB)')
 parser.add_argument('--textbook-limit', type=int, default=0,
                     help='Max textbook chunks (0 = all, ~180k chunks)')
+parser.add_argument('--textbooks-file', default=None,
+                    help='Read textbook rows from a local .jsonl/.parquet instead of Hugging Face')
+parser.add_argument('--pmc-file',       default=None,
+                    help='Read PMC rows from a local .jsonl/.parquet instead of Hugging Face')
+parser.add_argument('--chunk-chars',    type=int, default=4000,
+                    help='Split rows longer than this many characters (default 4000)')
 parser.add_argument('--local-only',     action='store_true',
                     help='Save to ./kb_output/ instead of uploading to S3')
+parser.add_argument('--workers',        type=int, default=32,
+                    help='Parallel uploads / file writes (default 32)')
+parser.add_argument('--pack-kb',        type=int, default=0,
+                    help='Pack chunks of one source into ~N KB documents (S3 only; 0 = one file per chunk)')
+parser.add_argument('--checkpoint',     default=None,
+                    help='Resume journal (default .kb_upload_<bucket>.log, kb_output/.written.log locally)')
+parser.add_argument('--restart',        action='store_true',
+                    help='Ignore the manifest and checkpoint and write everything again')
+parser.add_argument('--keep-removed',   action='store_true',
+                    help="Don't delete documents the last run wrote but this run did not produce")
 args = parser.parse_args()
 
+LOCAL_DIR = 'kb_output'
+if args.local_only:
+    args.pack_kb = 0
+
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
 def slugify(text: str) -> str:
     return re.sub(r'[^a-z0-9_]', '_', text.lower())[:60]
 
-def upload_or_save(content: str, key: str):
-    if args.local_only:
-        path = os.path.join('kb_output', key)
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(content)
-    else:
+
+class S3Store:
+    """The corpus under s3://bucket/prefix; the manifest sits beside it, outside the KB data source."""
+
+    def __init__(self):
+        self.manifest_key = args.prefix.rstrip('/') + '.manifest.tsv.gz'
+
+    def put(self, key: str, body: bytes):
         s3.put_object(
             Bucket=args.bucket,
             Key=f"{args.prefix}{key}",
-            Body=content.encode('utf-8'),
+            Body=body,
             ContentType='text/plain',
         )
 
+    def delete(self, keys: list):
+        for i in range(0, len(keys), 1000):
+            resp = s3.delete_objects(Bucket=args.bucket, Delete={
+                'Objects': [{'Key': f"{args.prefix}{k}"} for k in keys[i:i + 1000]],
+                'Quiet': True,
+            })
+            for err in resp.get('Errors', []):
+                print(f"  ⚠ delete {err.get('Key')}: {err.get('Message')}")
+
+    def read_manifest(self):
+        try:
+            obj = s3.get_object(Bucket=args.bucket, Key=self.manifest_key)
+        except s3.exceptions.NoSuchKey:
+            return None
+        return gzip.decompress(obj['Body'].read()).decode('utf-8')
+
+    def write_manifest(self, text: str):
+        s3.put_object(Bucket=args.bucket, Key=self.manifest_key,
+                      Body=gzip.compress(text.encode('utf-8')), ContentType='application/gzip')
+
+
+class LocalStore:
+    def __init__(self):
+        self.manifest_path = os.path.join(LOCAL_DIR, '.manifest.tsv')
+        self._made_dirs    = set()
+
+    def put(self, key: str, body: bytes):
+        path = os.path.join(LOCAL_DIR, key)
+        folder = os.path.dirname(path)
+        if folder not in self._made_dirs:
+            os.makedirs(folder, exist_ok=True)
+            self._made_dirs.add(folder)
+        with open(path, 'wb', buffering=len(body) + 1) as f:
+            f.write(body)
+
+    def delete(self, keys: list):
+        for key in keys:
+            try:
+                os.remove(os.path.join(LOCAL_DIR, key))
+            except FileNotFoundError:
+                pass
+
+    def read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, encoding='utf-8') as f:
+            return f.read()
+
+    def write_manifest(self, text: str):
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+class Sink:
+    """
+    Writes documents through a bounded thread pool. At most 4 × workers
+    writes are in flight, so reading the dataset never runs ahead of the
+    uploads.
+
+    Incremental by content: the store's manifest (SHA-1 → key, one line per
+    document) records what the last complete run wrote. A key whose hash is
+    unchanged is skipped, and finish() deletes keys the run no longer
+    produced, then writes the new manifest. While a run is in progress each
+    completed key is also appended to a local journal, so an interrupted
+    run resumes without re-uploading; the journal is dropped once the
+    manifest is written.
+    """
+
+    def __init__(self, store, journal_path: str, workers: int):
+        self.store    = store
+        self.journal  = journal_path
+        self.previous = parse_manifest(store.read_manifest() or '')
+        self.resumed  = read_journal(journal_path)
+        self.seen     = {}            # key → digest produced by this run
+        self.stats    = Counter()
+        self._pool    = ThreadPoolExecutor(max_workers=workers)
+        self._slots   = threading.BoundedSemaphore(workers * 4)
+        self._lock    = threading.Lock()
+        self._log     = open(journal_path, 'w' if args.restart else 'a', encoding='utf-8')
+        self._t0      = time.time()
+        print(f"  Manifest: {len(self.previous):,} documents from the last run"
+              + (f", {len(self.resumed):,} in the resume journal" if self.resumed else ''))
+
+    def put(self, key: str, content: str, chunks: int = 1):
+        body   = content.encode('utf-8')
+        digest = hashlib.sha1(body).hexdigest()
+        self.stats['chunks'] += chunks
+        self.seen[key] = digest
+        old = self.previous.get(key)
+        self.stats['added' if old is None else 'unchanged' if old == digest else 'changed'] += 1
+        if not args.restart and self.resumed.get(key, old) == digest:
+            self.stats['skipped'] += 1
+            return
+        self._slots.acquire()
+        future = self._pool.submit(self.store.put, key, body)
+        future.add_done_callback(lambda f: self._finished(f, key, digest, len(body)))
+
+    def _finished(self, future, key: str, digest: str, size: int):
+        self._slots.release()
+        error = future.exception()
+        with self._lock:
+            if error:
+                self.stats['failed'] += 1
+                if self.stats['failed'] <= 5:
+                    print(f"\n  ⚠ {key}: {error}")
+                return
+            self._log.write(f"{key}\t{digest}\n")
+            self.stats['written'] += 1
+            self.stats['bytes']   += size
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self._log.close()
+
+    def finish(self):
+        """Delete vanished documents and commit the manifest — only after a complete, clean run."""
+        self.close()
+        if self.stats['failed']:
+            print(f"  Manifest not updated — {self.stats['failed']:,} writes failed")
+            return
+        # Keys only in the journal were written by an interrupted run — they exist too
+        removed = sorted(k for k in {**self.previous, **self.resumed} if k not in self.seen)
+        if removed and not args.keep_removed:
+            self.store.delete(removed)
+        self.stats['deleted'] = 0 if args.keep_removed else len(removed)
+        self.store.write_manifest(''.join(f"{d}\t{k}\n" for k, d in sorted(self.seen.items())))
+        os.remove(self.journal)
+
+    def report(self):
+        elapsed = max(time.time() - self._t0, 1e-6)
+        st = self.stats
+        print(f"\n── Changes since the last run ──")
+        print(f"  added:     {st['added']:,}")
+        print(f"  changed:   {st['changed']:,}")
+        print(f"  deleted:   {st['deleted']:,}"
+              + (' (kept: --keep-removed)' if args.keep_removed else ''))
+        print(f"  unchanged: {st['unchanged']:,}")
+        print(f"\n── Throughput ──")
+        print(f"  chunks:    {st['chunks']:,} in {elapsed:.1f}s → {st['chunks'] / elapsed:,.0f} chunks/s")
+        print(f"  written:   {st['written']:,} documents, {st['bytes'] / 1e6:,.1f} MB "
+              f"→ {st['bytes'] / 1e6 / elapsed:,.2f} MB/s")
+        print(f"  skipped:   {st['skipped']:,} already written")
+        if st['failed']:
+            print(f"  ⚠ failed:  {st['failed']:,} — re-run to retry them")
+
+
+def parse_manifest(text: str) -> dict:
+    """key → digest from `digest<TAB>key` lines."""
+    out = {}
+    for line in text.splitlines():
+        digest, sep, key = line.partition('\t')
+        if sep:
+            out[key] = digest
+    return out
+
+
+def read_journal(path: str) -> dict:
+    done = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                key, sep, digest = line.rstrip('\n').partition('\t')
+                if sep:
+                    done[key] = digest
+    return done
+
+
+class Packer:
+    """
+    Groups consecutive chunks of one source into documents of about --pack-kb KB.
+
+    A part ends after a chunk whose content hash falls below that chunk's
+    share of the limit (len / limit) — on average every --pack-kb KB — or,
+    at the latest, at MAX_PACK × the limit. A boundary depends only on the
+    chunk it follows, never on a running size total, and a part is keyed by
+    the hash of its first chunk. Adding, removing or editing a chunk
+    therefore changes just the part holding it; every other part keeps its
+    key and bytes, and the manifest sees it as unchanged.
+    """
+
+    MAX_PACK = 4
+
+    def __init__(self, sink: Sink):
+        self.sink  = sink
+        self.limit = args.pack_kb * 1024
+        self.open  = {}   # prefix → [parts, size, chunks]
+        self.parts = Counter()
+
+    def add(self, prefix: str, chunk_id: str, content: str):
+        if not self.limit:
+            self.sink.put(f"{prefix}_{chunk_id}.txt", content)
+            return
+        buf = self.open.setdefault(prefix, [[], 0, 0])
+        buf[0].append(content)
+        buf[1] += len(content) + 2
+        buf[2] += 1
+        mark = int.from_bytes(hashlib.sha1(content.encode('utf-8')).digest()[:8], 'big')
+        if mark % self.limit < len(content) + 2 or buf[1] >= self.MAX_PACK * self.limit:
+            self._emit(prefix)
+
+    def _emit(self, prefix: str):
+        parts, _, chunks = self.open.pop(prefix)
+        key = f"{prefix}_part_{hashlib.sha1(parts[0].encode('utf-8')).hexdigest()[:12]}"
+        self.parts[key] += 1
+        # Identical first chunks (repeated boilerplate) get _2, _3, …
+        n = self.parts[key]
+        self.sink.put(f"{key}{f'_{n}' if n > 1 else ''}.txt", '\n\n'.join(parts), chunks)
+
+    def flush(self):
+        for prefix in list(self.open):
+            self._emit(prefix)
+
+# ── Streaming pipeline ────────────────────────────────────────────────────────
+# read → clean → chunk → serialize → sink, as generators: each stage pulls one
+# item at a time from the one before it, so nothing is materialised. The only
+# buffers are the reader's bounded read-ahead queue and the sink's in-flight
+# writes; when uploads fall behind, Sink.put blocks and the whole chain waits.
+# Memory stays flat whatever the corpus size (the manifest's key → hash map
+# is the one thing that grows with the number of documents).
+
+READ_AHEAD = 256   # rows buffered between the reader thread and the pipeline
+
+def read_rows(path, dataset: str, limit: int):
+    """Rows from a local .jsonl / .parquet file, or streamed from Hugging Face."""
+    if path:
+        rows = read_parquet(path) if path.endswith('.parquet') else read_jsonl(path)
+    else:
+        try:
+            from datasets import load_dataset
+        except ImportError:
+            print("Run: pip install datasets tqdm")
+            raise
+        # streaming → rows arrive as they download; nothing is cached in memory
+        rows = iter(load_dataset(dataset, split="train", trust_remote_code=True, streaming=True))
+    return read_ahead(itertools.islice(rows, limit or None), READ_AHEAD)
+
+def read_jsonl(path: str):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def read_parquet(path: str):
+    import pyarrow.parquet as pq   # pip install pyarrow
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=1024):
+        yield from batch.to_pylist()
+
+def read_ahead(rows, size: int):
+    """Pull `rows` on a background thread into a bounded queue — overlaps download with upload."""
+    q    = queue.Queue(maxsize=size)
+    done = object()
+
+    def pump():
+        try:
+            for row in rows:
+                q.put(row)
+        except BaseException as e:
+            q.put(e)
+        q.put(done)
+
+    threading.Thread(target=pump, daemon=True).start()
+    while True:
+        item = q.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+_CONTROL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+_SPACES  = re.compile(r'[ \t\u00a0]+')
+
+def clean(rows):
+    """NFC-normalise, strip control characters and runs of spaces; drop empty rows."""
+    for row in rows:
+        text = row.get('content') or row.get('text') or ''
+        text = unicodedata.normalize('NFC', _CONTROL.sub('', text))
+        text = re.sub(r'\n{3,}', '\n\n', _SPACES.sub(' ', text)).strip()
+        if text:
+            yield {**row, 'content': text}
+
+def chunk(rows, max_chars: int):
+    """Split rows longer than max_chars on paragraph / sentence boundaries (MedRAG rows already fit)."""
+    for row in rows:
+        text = row['content']
+        if len(text) <= max_chars:
+            yield row, 0, text
+            continue
+        part, n = '', 0
+        for piece in re.split(r'(?<=\n\n)|(?<=[.!?] )', text):
+            if part and len(part) + len(piece) > max_chars:
+                yield row, n, part.strip()
+                part, n = '', n + 1
+            part += piece
+            while len(part) > max_chars:        # one oversized sentence
+                yield row, n, part[:max_chars]
+                part, n = part[max_chars:], n + 1
+        if part.strip():
+            yield row, n, part.strip()
+
+def row_key(row: dict) -> str:
+    """A row's stable key — its slugified id, else a hash of its content; never its position."""
+    if row.get('id') not in (None, ''):
+        return slugify(str(row['id']))
+    return hashlib.sha1(row['content'].encode('utf-8')).hexdigest()[:12]
+
+def serialize(pieces, document):
+    """(key prefix, chunk id, file content) — `document(row)` gives the prefix and metadata header."""
+    seen = Counter()   # (prefix, key) → rows so far; only repeats get a suffix
+    for row, n, text in pieces:
+        prefix, header = document(row)
+        key = row_key(row)
+        if n == 0:        # a row's chunks arrive together, first one first
+            seen[prefix, key] += 1
+            dup = seen[prefix, key]
+        if dup > 1:
+            # Duplicate id (or identical content) — _r2, _r3, … keeps both
+            key += f"_r{dup}"
+        yield prefix, key + (f"_{n}" if n else ''), f"{header}---\n{text}"
+
+def run_pipeline(rows, document, desc: str, limit: int) -> int:
+    count = 0
+    docs = serialize(chunk(clean(rows), args.chunk_chars), document)
+    for prefix, chunk_id, content in tqdm(docs, desc=desc, total=limit or None):
+        packer.add(prefix, chunk_id, content)
+        count += 1
+    packer.flush()
+    return count
+
 # ── S3 client + auto-create bucket ───────────────────────────────────────────
 
 if not args.local_only:
-    s3 = boto3.client('s3')
+    # One client for every worker thread; the pool is sized so each worker
+    # keeps its own reusable connection.
+    s3 = boto3.client('s3', config=Config(
+        max_pool_connections=args.workers,
+        retries={'max_attempts': 10, 'mode': 'adaptive'},
+    ))
 
     # Check bucket exists; create it if not
     try:
@@ -80,42 +484,34 @@ if not args.local_only:
         print(f"  ✓ Bucket created.")
 
     print(f"Uploading to s3://{args.bucket}/{args.prefix}")
+    sink = Sink(S3Store(), args.checkpoint or f".kb_upload_{args.bucket}.log", args.workers)
 else:
     print("Local mode — saving to ./kb_output/")
+    os.makedirs(LOCAL_DIR, exist_ok=True)
+    sink = Sink(LocalStore(), args.checkpoint or os.path.join(LOCAL_DIR, '.written.log'), args.workers)
+
+packer = Packer(sink)
+atexit.register(sink.close)   # keep the journal on Ctrl-C / crashes
 
 # ── 1. MedRAG Textbooks ───────────────────────────────────────────────────────
 # HuggingFace: MedRAG/textbooks
 # Contains pre-chunked text from 18 classic medical textbooks.
 # Each row: { id, title, content, source (book name) }
 
-if args.textbooks:
-    print("\n── Loading MedRAG textbook chunks ──")
-    try:
-        from datasets import load_dataset
-    except ImportError:
-        print("Run: pip install datasets tqdm")
-        raise
-
-    ds = load_dataset("MedRAG/textbooks", split="train", trust_remote_code=True)
-    total = len(ds) if not args.textbook_limit else min(args.textbook_limit, len(ds))
-    print(f"  {len(ds):,} chunks available → uploading {total:,}")
-
-    # Group by source book so Bedrock can attribute sources cleanly
-    for i, row in enumerate(tqdm(ds.select(range(total)), desc="Textbooks")):
-        source  = slugify(row.get('source') or row.get('title') or 'textbook')
-        chunk_id = str(i).zfill(6)
-
-        # Build a clean text file with metadata header
-        content = (
-            f"Source: {row.get('source', 'Medical Textbook')}\n"
-            f"Section: {row.get('title', '')}\n"
-            f"---\n"
-            f"{row.get('content', row.get('text', ''))}"
-        )
-
-        upload_or_save(content, f"textbooks/{source}_{chunk_id}.txt")
+def textbook_doc(row: dict) -> tuple:
+    # Keyed by source book so Bedrock can attribute sources cleanly
+    source = slugify(row.get('source') or row.get('title') or 'textbook')
+    header = (
+        f"Source: {row.get('source', 'Medical Textbook')}\n"
+        f"Section: {row.get('title', '')}\n"
+    )
+    return f"textbooks/{source}", header
 
-    print(f"  ✓ Textbook chunks done ({total:,})")
+if args.textbooks:
+    print("\n── Streaming MedRAG textbook chunks ──")
+    rows = read_rows(args.textbooks_file, "MedRAG/textbooks", args.textbook_limit)
+    count = run_pipeline(rows, textbook_doc, "Textbooks", args.textbook_limit)
+    print(f"  ✓ Textbook chunks done ({count:,})")
 
 # ── 2. PMC Open Access Papers ─────────────────────────────────────────────────
 # HuggingFace: axiong/PMC_LLaMA_instructions  ← instruction pairs (smaller, practical)
@@ -124,33 +520,26 @@ if args.textbooks:
 # We use MedRAG/pubmed which has chunked PubMed abstracts + full-text snippets.
 # These are 100% open access (NIH PMC license).
 
-if args.pmc:
-    print("\n── Loading PMC open-access chunks ──")
-    ds_pmc = load_dataset("MedRAG/pubmed", split="train", trust_remote_code=True,
-                           streaming=True)   # streaming → no full download needed
-
-    count = 0
-    for row in tqdm(ds_pmc, desc="PMC papers", total=args.pmc_limit):
-        if count >= args.pmc_limit:
-            break
-
-        chunk_id = str(count).zfill(6)
-        pmid = row.get('id', chunk_id)
-
-        content = (
-            f"Source: PubMed Central (PMID: {pmid})\n"
-            f"Title: {row.get('title', '')}\n"
-            f"---\n"
-            f"{row.get('content', row.get('text', ''))}"
-        )
-
-        upload_or_save(content, f"pmc/pmc_{chunk_id}.txt")
-        count += 1
+def pmc_doc(row: dict) -> tuple:
+    header = (
+        f"Source: PubMed Central (PMID: {row.get('id') or 'n/a'})\n"
+        f"Title: {row.get('title', '')}\n"
+    )
+    return "pmc/pmc", header
 
+if args.pmc:
+    print("\n── Streaming PMC open-access chunks ──")
+    rows = read_rows(args.pmc_file, "MedRAG/pubmed", args.pmc_limit)
+    count = run_pipeline(rows, pmc_doc, "PMC papers", args.pmc_limit)
     print(f"  ✓ PMC chunks done ({count:,})")
 
 # ── Done ──────────────────────────────────────────────────────────────────────
 
+sink.finish()
+sink.report()
+if sink.stats['failed']:
+    raise SystemExit(1)
+
 print("\n✅ All done!")
 if not args.local_only:
     print(f"\nNext steps:")
@@ -36,7 +36,7 @@ echo ""
 
 # ── 1. IAM Role ───────────────────────────────────────────────────────────────
 
-echo "▶ Step 1/4 — IAM Role"
+echo "▶ Step 1/5 — IAM Role"
 
 if $SKIP_IAM; then
   echo "  ⏭  Skipping IAM (--skip-iam). Assuming role '$ROLE_NAME' already exists."
@@ -161,6 +161,18 @@ POLICY_JSON=$(cat <<EOF
       "Action": ["sns:Publish"],
       "Resource": "*"
     },
+    {
+      "Sid": "SQS",
+      "Effect": "Allow",
+      "Action": [
+        "sqs:SendMessage",
+        "sqs:ReceiveMessage",
+        "sqs:DeleteMessage",
+        "sqs:GetQueueAttributes",
+        "sqs:GetQueueUrl"
+      ],
+      "Resource": "arn:aws:sqs:$REGION:$ACCOUNT_ID:bhasha-*"
+    },
     {
       "Sid": "SageMaker",
       "Effect": "Allow",
@@ -198,7 +210,7 @@ fi  # end --skip-iam check
 # ── 2. DynamoDB Tables ────────────────────────────────────────────────────────
 
 echo ""
-echo "▶ Step 2/4 — DynamoDB Tables"
+echo "▶ Step 2/5 — DynamoDB Tables"
 
 create_table_if_missing() {
   local TABLE=$1
@@ -207,6 +219,14 @@ create_table_if_missing() {
 
   if aws dynamodb describe-table --table-name "$TABLE" --region "$REGION" > /dev/null 2>&1; then
     echo "  ✅ Table $TABLE already exists"
+    if [ -n "$SK" ]; then
+      local HAVE_SK
+      HAVE_SK=$(aws dynamodb describe-table --table-name "$TABLE" --region "$REGION" \
+        --query "Table.KeySchema[?KeyType=='RANGE'].AttributeName | [0]" --output text)
+      if [ "$HAVE_SK" != "$SK" ]; then
+        echo "  ⚠️  $TABLE has sort key '$HAVE_SK', the Lambdas need '$SK' — recreate it"
+      fi
+    fi
   else
     if [ -z "$SK" ]; then
       aws dynamodb create-table \
@@ -231,14 +251,21 @@ create_table_if_missing() {
   fi
 }
 
-create_table_if_missing "BhashaAI_Main"          "userId"    "recordType"
+create_table_if_missing "BhashaAI_Main"          "userId"    "recordId"
 create_table_if_missing "BhashaAI_Conversations"  "sessionId" "timestamp"
 create_table_if_missing "BhashaAI_CallStatus"     "callId"    ""
+create_table_if_missing "BhashaAI_Cache"          "cacheKey"  ""
+
+# Shared cache / coordination entries expire on their own
+aws dynamodb update-time-to-live \
+  --table-name "BhashaAI_Cache" \
+  --time-to-live-specification "Enabled=true,AttributeName=expiresAt" \
+  --region "$REGION" > /dev/null 2>&1 || true
 
 # ── 3. S3 Lifecycle Rule ──────────────────────────────────────────────────────
 
 echo ""
-echo "▶ Step 3/4 — S3 Lifecycle Rule (auto-delete temp audio after 1 day)"
+echo "▶ Step 3/5 — S3 Lifecycle Rule (auto-delete temp audio after 1 day)"
 
 LIFECYCLE_CONFIG='{
   "Rules": [
@@ -247,6 +274,12 @@ LIFECYCLE_CONFIG='{
       "Filter": { "Prefix": "audio/transcriptions/" },
       "Status": "Enabled",
       "Expiration": { "Days": 1 }
+    },
+    {
+      "ID": "delete-transcripts",
+      "Filter": { "Prefix": "audio/transcripts/" },
+      "Status": "Enabled",
+      "Expiration": { "Days": 1 }
     }
   ]
 }'
@@ -257,10 +290,32 @@ aws s3api put-bucket-lifecycle-configuration \
   echo "  ✅ Lifecycle rule set on $BUCKET" || \
   echo "  ⚠️  Lifecycle rule failed (check bucket permissions)"
 
-# ── 4. Write role ARN to file for deploy.sh ───────────────────────────────────
+# ── 4. SQS background work queue + dead-letter queue ─────────────────────────
+# Used by shared/work_queue.py. Failed tasks are retried by SQS and moved to
+# the DLQ after 5 receives. Visibility timeout must exceed the worker timeout.
+
+echo ""
+echo "▶ Step 4/5 — SQS work queue (bhasha-post-process + DLQ)"
+
+DLQ_URL=$(aws sqs create-queue \
+  --queue-name bhasha-post-process-dlq \
+  --attributes MessageRetentionPeriod=1209600 \
+  --region "$REGION" --query QueueUrl --output text)
+DLQ_ARN=$(aws sqs get-queue-attributes \
+  --queue-url "$DLQ_URL" --attribute-names QueueArn \
+  --region "$REGION" --query Attributes.QueueArn --output text)
+
+REDRIVE="{\\\"deadLetterTargetArn\\\":\\\"$DLQ_ARN\\\",\\\"maxReceiveCount\\\":\\\"5\\\"}"
+aws sqs create-queue \
+  --queue-name bhasha-post-process \
+  --attributes "{\"VisibilityTimeout\":\"60\",\"RedrivePolicy\":\"$REDRIVE\"}" \
+  --region "$REGION" > /dev/null
+echo "  ✅ Queue bhasha-post-process → DLQ bhasha-post-process-dlq"
+
+# ── 5. Write role ARN to file for deploy.sh ───────────────────────────────────
 
 echo ""
-echo "▶ Step 4/4 — Saving role ARN"
+echo "▶ Step 5/5 — Saving role ARN"
 echo "LAMBDA_ROLE_ARN=$ROLE_ARN" > scripts/.role_arn
 echo "  ✅ Saved to scripts/.role_arn"
 